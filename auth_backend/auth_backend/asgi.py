@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from common.uploads import limit_request_size  # noqa: E402
+
+# 超过上传大小上限的请求直接返回 413（按 Content-Length 或实际接收的字节数）
+application = limit_request_size(django_application)
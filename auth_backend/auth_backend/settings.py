@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'common',
     'users',
     'corsheaders',
     'interview',
@@ -161,6 +162,11 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',  # 简历条件请求
+]
+# 前端可读取的响应头
+CORS_EXPOSE_HEADERS = [
+    'etag',
 ]
 
 # 允许携带认证信息（如 cookies）
@@ -194,5 +200,165 @@ CACHES = {
     }
 }
 
-# 设置缓存超时时间（秒）
-CACHE_TTL = 60 * 60 * 2  # 2小时
+# 岗位推荐结果和简历指纹指针的缓存
+RECOMMENDATION_CACHE = {
+    "TTL": 60 * 60 * 2,  # 缓存时间（秒）
+}
+
+# 岗位目录（进程内缓存 jobs 集合）
+JOB_CATALOG = {
+    "USE_LISTENER": True,  # 使用 Firestore 快照监听实时同步
+    "POLL_INTERVAL": 300,  # 监听不可用时的轮询间隔（秒）
+    "INITIAL_LOAD_TIMEOUT": 30,  # 等待首次加载完成的超时时间（秒）
+    "FULL_RELOAD_INTERVAL": 3600,  # 轮询模式下目录版本未变化时，全量重新加载的最长间隔（秒）
+}
+
+# 岗位粗排：先本地打分，只把前 TOP_K 个岗位交给 DeepSeek
+JOB_RANKING = {
+    "TOP_K": 30,
+    "FAMILIAR_SKILL_WEIGHT": 0.6,  # “了解”技能相对“熟练”技能的权重
+    "WEIGHTS": {
+        "skills": 0.5,
+        "experience": 0.2,
+        "education": 0.2,
+        "location": 0.1,
+    },
+}
+
+# DeepSeek 共享 HTTP 客户端（长连接复用）
+LLM_CLIENT = {
+    "HTTP2": True,  # 需要安装 h2
+    "MAX_CONNECTIONS": 200,  # 每个进程的最大连接数（ASGI 下每个请求的同步视图在单独的线程中执行，同时等待 DeepSeek 的请求数受此限制）
+    "MAX_KEEPALIVE_CONNECTIONS": 10,  # 保持的空闲长连接数
+    "KEEPALIVE_EXPIRY": 60,  # 空闲连接保持时间（秒）
+    "CONNECT_TIMEOUT": 10,  # 建立连接超时（秒）
+    "TIMEOUT": 60,  # 默认读写超时（秒），调用方可单独指定
+}
+
+# DeepSeek 响应缓存（按请求体哈希）
+LLM_CACHE = {
+    "ENABLED": True,
+    "DEFAULT_TTL": 60 * 60,  # 未单独配置的接口（秒）
+    "TTLS": {
+        "jobs.recommend": 60 * 60 * 2,
+        "jobs.analyze": 60 * 60 * 24,
+        "resume.optimize": 60 * 60 * 6,
+        "interview.question": 60 * 60,
+    },
+}
+
+# 并发相同请求合并（single-flight）
+SINGLE_FLIGHT = {
+    "LOCK_TIMEOUT": 90,  # 锁超时（秒），需大于 DeepSeek 调用超时；持锁进程崩溃后自动释放
+    "WAIT_TIMEOUT": 90,  # 等待领头请求的最长时间（秒），超时后自行计算
+    "RESULT_TTL": 60,  # 结果保留时间（秒），供等待者读取
+    "POLL_INTERVAL": 0.2,  # 等待者轮询间隔（秒）
+}
+
+# 耗时 LLM 接口的异步任务模式（Redis 队列 + 进程内线程池）
+TASK_QUEUE = {
+    "WORKERS": 4,  # run_task_worker 进程的工作线程数
+    "MAX_RETRIES": 2,  # 异常或 5xx 结果的重试次数
+    "RETRY_BACKOFF": 2,  # 重试间隔基数（秒），按尝试次数线性增长
+    "RESULT_TTL": 60 * 60,  # 任务记录和结果保留时间（秒）
+    "POLL_TIMEOUT": 5,  # 工作线程阻塞等待队列的超时（秒）
+    "LEASE_TIMEOUT": 5 * 60,  # 任务租约时长（秒），需大于单个任务的最长执行时间，过期的任务被重新放回队列
+    "REAP_INTERVAL": 10,  # 回收过期租约、移回到期重试任务的间隔（秒）
+}
+
+# 面试对话历史的 token 预算（超出部分折叠为滚动摘要）
+INTERVIEW_CONTEXT = {
+    "HISTORY_TOKEN_BUDGET": 1500,  # 原样发送的对话历史的 token 上限（估算值）
+    "RECENT_MESSAGES": 6,  # 至少原样保留最近的消息条数
+    "SUMMARY_CHUNK_MESSAGES": 6,  # 每次折叠进摘要的消息条数
+    "SUMMARY_MAX_TOKENS": 300,  # 摘要的最大生成长度
+    "SUMMARY_TTL": 60 * 60 * 24,  # 摘要缓存时间（秒）
+}
+
+# 模拟面试的服务端会话（Redis）
+INTERVIEW_SESSION = {
+    "TTL": 60 * 60 * 2,  # 会话过期时间（秒），每轮对话后刷新
+    "LOCK_MARGIN": 10,  # 会话锁超时 = 本轮各 DeepSeek 调用的总超时与准入等待之和 + 该余量（秒）
+    "MAX_ANSWER_CHARS": 4000,  # 单条回答保存的最大字符数
+}
+
+# 简历 PDF 文本提取（pypdfium2 + pdfplumber 兜底，进程池并行）
+PDF_EXTRACT = {
+    "MAX_PAGES": 10,  # 每个文档最多提取的页数
+    "TIMEOUT": 20,  # 每个文档的提取时间上限（秒）
+    "WORKERS": 2,  # 每个 Web 进程的提取进程数
+    "PARALLEL_MIN_PAGES": 3,  # 页数达到该值时按页段拆分并行提取
+    "MIN_PAGE_CHARS": 20,  # pdfium 提取的字符数少于该值时改用 pdfplumber
+}
+
+# 简历 PDF 提取结果缓存（按文件内容 SHA-256，进程内 LRU + Redis）
+RESUME_TEXT_CACHE = {
+    "LOCAL_MAX_ENTRIES": 256,  # 每个进程内存中保留的条目数
+    "TTL": 60 * 60 * 24 * 7,  # 缓存时间（秒）
+}
+
+# 文件上传大小上限（流式写入临时文件，超限即停止接收）
+UPLOADS = {
+    "RESUME_PDF_MAX_BYTES": 10 * 1024 * 1024,  # 简历 PDF
+    "PHOTO_MAX_BYTES": 5 * 1024 * 1024,  # 简历照片
+    "MULTIPART_OVERHEAD_BYTES": 64 * 1024,  # multipart 边界和表单字段的额外开销
+}
+
+# 简历文档缓存（Redis 读穿透，写路径同步更新/失效）
+RESUME_CACHE = {
+    "ENABLED": True,
+    "TTL": 60 * 10,  # 简历文档缓存时间（秒），也是并发写入时缓存可能过期的最长时间
+    "MISSING_TTL": 60,  # 简历不存在时“空”标记的缓存时间（秒）
+}
+
+# 用户目录（user_emails 邮箱索引）
+USER_DIRECTORY = {
+    "LEGACY_FALLBACK": True,  # 找不到索引时退回按 email 字段查询；执行 backfill_email_index 补建完成后可关闭
+}
+
+# 用户资料缓存（批量读取，短期缓存）
+USER_PROFILE_CACHE = {
+    "TTL": 60,  # 用户资料缓存时间（秒）
+    "MISSING_TTL": 30,  # 不存在的用户的缓存时间（秒）
+    "MAX_BATCH": 100,  # 批量接口单次最多查询的用户数
+}
+
+# DeepSeek 出站调用的集群级准入控制（Redis 令牌桶 + 并发租约，按接口优先级分配）
+LLM_ADMISSION = {
+    "ENABLED": True,
+    "RATE": 5,  # 全集群每秒补充的调用令牌数
+    "BURST": 20,  # 令牌桶容量（允许的突发调用数）
+    "MAX_CONCURRENT": 40,  # 全集群同时进行的调用数上限
+    "LEASE_MARGIN": 30,  # 并发租约在调用超时之外的余量（秒），进程崩溃时租约到期自动释放
+    "POLL_INTERVAL": 0.25,  # 并发已满时的重试间隔（秒）
+    "DEFAULT_PRIORITY": "normal",
+    # SHARE：该优先级可使用的令牌/并发比例；MAX_WAIT：最长排队时间（秒），超时返回 429；MAX_QUEUE：排队请求数上限
+    "PRIORITIES": {
+        "high": {"SHARE": 1.0, "MAX_WAIT": 10, "MAX_QUEUE": 200},
+        "normal": {"SHARE": 0.8, "MAX_WAIT": 5, "MAX_QUEUE": 100},
+        "low": {"SHARE": 0.5, "MAX_WAIT": 0, "MAX_QUEUE": 0},
+    },
+    "ENDPOINTS": {
+        "interview.question": "high",  # 面试中的实时追问
+        "resume.optimize": "normal",
+        "jobs.recommend": "normal",
+        "jobs.analyze": "normal",
+        "interview.summary": "low",  # 对话摘要失败时退化为丢弃旧消息
+    },
+}
+
+# DeepSeek 调用的容错策略（进程内熔断器、带抖动的指数退避重试、对冲请求）
+LLM_RESILIENCE = {
+    "FAILURE_THRESHOLD": 5,  # 连续失败（网络错误、超时、429、5xx）多少次后熔断
+    "RESET_TIMEOUT": 30,  # 熔断持续时间（秒），之后放行试探调用
+    "HALF_OPEN_MAX_CALLS": 1,  # 半开状态同时放行的试探调用数
+    "MAX_ATTEMPTS": 3,  # 每次调用最多尝试次数（含首次）
+    "BACKOFF_BASE": 0.5,  # 退避基数（秒），第 n 次重试前随机等待 0 ~ min(BACKOFF_MAX, BACKOFF_BASE * 2^(n-1))
+    "BACKOFF_MAX": 8,  # 单次退避上限（秒）
+    "MIN_ATTEMPT_TIMEOUT": 5,  # 总超时剩余不足该值（秒）时不再重试
+    "HEDGE_ENDPOINTS": ["interview.question"],  # 启用对冲请求的接口（响应短、对延迟敏感）
+    "HEDGE_QUANTILE": 0.95,  # 超过该分位的耗时仍未返回时发起对冲请求
+    "HEDGE_MIN_SAMPLES": 20,  # 耗时样本少于该数时使用 HEDGE_DEFAULT_DELAY
+    "HEDGE_DEFAULT_DELAY": 5,  # 默认对冲延迟（秒）
+    "LATENCY_WINDOW": 200,  # 每个接口保留的耗时样本数
+}
@@ -17,11 +17,14 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import include, path
+from common.views import metrics, TaskStatusView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('api/resume/', include('resume.urls')),
     path('api/jobs/', include('jobcenter.urls')),
+    path('api/metrics', metrics, name='metrics'),
+    path('api/tasks/<str:task_id>', TaskStatusView.as_view(), name='task-status'),
     path('api/', include('interview.urls')),
 ]
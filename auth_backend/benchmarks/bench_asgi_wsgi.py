@@ -0,0 +1,162 @@
+"""
+WSGI / ASGI 入口对比：在本地启动一个带固定延迟的模拟 DeepSeek 服务，
+分别用 gunicorn（auth_backend.wsgi）和 uvicorn（auth_backend.asgi）启动本项目，
+并发请求 /api/generate-question，输出吞吐量和延迟分位数。
+
+ASGI 下每个请求的视图在单独的线程中执行，同时等待 DeepSeek 的请求数主要受 LLM_CLIENT["MAX_CONNECTIONS"] 限制；
+WSGI 下受 worker 数 × 线程数限制。
+
+请求带对话历史（追问不走 LLM 缓存），每次都会真正调用模拟的 DeepSeek。
+需要能正常启动项目的环境（Firebase 凭据等），以及 gunicorn、uvicorn。
+
+用法（在 auth_backend 目录下）:
+    python -m benchmarks.bench_asgi_wsgi --concurrency 200 --requests 1000 --server-delay-ms 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "Tell me about your last project."}}]
+}).encode('utf-8')
+
+ENDPOINT = "/api/generate-question"
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 默认监听队列只有 5，高并发下会出现连接被重置
+    request_queue_size = 1024
+
+
+def start_mock_deepseek(delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(COMPLETION)))
+            self.end_headers()
+            self.wfile.write(COMPLETION)
+
+        def log_message(self, *args):
+            pass
+
+    server = MockServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(entry, port, args):
+    if entry == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', args.wsgi_app, '--bind', f'127.0.0.1:{port}',
+                '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning']
+    return [sys.executable, '-m', 'uvicorn', args.asgi_app, '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log']
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+async def load(url, total, concurrency):
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        async def one(i):
+            nonlocal errors
+            body = {
+                "resume_text": "Backend engineer, 3 years of Python and Django.",
+                "conversation": [{"role": "user", "content": f"answer {i}"}],
+            }
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=body)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def report(label, latencies, errors, elapsed):
+    latencies.sort()
+    print(f"{label:<18} {len(latencies) / elapsed:8.1f} req/s | mean {statistics.mean(latencies):8.1f} ms"
+          f" | p50 {latencies[len(latencies) // 2]:8.1f} ms | p95 {latencies[int(len(latencies) * 0.95) - 1]:8.1f} ms"
+          f" | errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--server-delay-ms', type=float, default=500)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn 每个 worker 的线程数')
+    parser.add_argument('--wsgi-app', default='auth_backend.wsgi:application')
+    parser.add_argument('--asgi-app', default='auth_backend.asgi:application')
+    parser.add_argument('--entries', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    mock = start_mock_deepseek(args.server_delay_ms / 1000)
+    env = dict(os.environ, DEEPSEEK_API_URL=f"http://127.0.0.1:{mock.server_address[1]}/v1/chat/completions")
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, DeepSeek delay {args.server_delay_ms} ms, "
+          f"{args.workers} worker(s)")
+    for entry in args.entries.split(','):
+        port = free_port()
+        process = subprocess.Popen(server_command(entry, port, args), env=env)
+        try:
+            wait_until_ready(port, process)
+            latencies, errors, elapsed = asyncio.run(
+                load(f"http://127.0.0.1:{port}{ENDPOINT}", args.requests, args.concurrency)
+            )
+            report(entry, latencies, errors, elapsed)
+        finally:
+            process.terminate()
+            process.wait()
+    mock.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+共享 LLM 客户端基准测试：在本地启动一个模拟 DeepSeek 的 HTTPS 服务，
+对比“每次调用 requests.post（新建 TCP + TLS 连接）”与“共享连接池客户端”的延迟。
+
+用法（在 auth_backend 目录下）:
+    python -m benchmarks.bench_llm_client --requests 200 --server-delay-ms 0
+"""
+import argparse
+import datetime
+import json
+import os
+import socket
+import ssl
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import django
+import requests
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_backend.settings')
+django.setup()
+
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+
+from common.llm_client import build_client  # noqa: E402
+
+COMPLETION = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "Tell me about your last project."}}]
+}).encode('utf-8')
+
+
+def make_certificate(directory):
+    """生成 localhost 自签名证书"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'localhost')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName('localhost')]), critical=False)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(key, hashes.SHA256()))
+    cert_path = os.path.join(directory, 'cert.pem')
+    key_path = os.path.join(directory, 'key.pem')
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+def start_server(cert_path, key_path, delay):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            # 避免 Nagle + 延迟确认在回环地址上引入 40ms 的固定延迟
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(COMPLETION)))
+            self.end_headers()
+            self.wfile.write(COMPLETION)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(label, call, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"{label:<28} mean {statistics.mean(latencies):7.2f} ms | p50 {latencies[len(latencies) // 2]:7.2f} ms"
+          f" | p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--server-delay-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    payload = {"model": "deepseek-chat", "messages": [{"role": "user", "content": "hello"}]}
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = make_certificate(directory)
+        server = start_server(cert_path, key_path, args.server_delay_ms / 1000)
+        url = f"https://localhost:{server.server_address[1]}/v1/chat/completions"
+
+        def fresh_connection():
+            requests.post(url, json=payload, verify=cert_path, timeout=60).json()
+
+        client = build_client(verify=cert_path, http2=False)
+
+        def pooled_connection():
+            client.post(url, json=payload).json()
+
+        print(f"{args.requests} sequential calls, server delay {args.server_delay_ms} ms")
+        run("requests.post (new TLS)", fresh_connection, args.requests)
+        run("shared pooled client", pooled_connection, args.requests)
+        client.close()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+简历 PDF 文本提取基准测试：对比原先的 pdfplumber 逐页串行提取与 interview.pdf_extract
+（pypdfium2 + 进程池，pdfplumber 兜底）在一组样本 PDF 上的耗时。
+
+未指定 --corpus 时生成一组多页的合成简历 PDF。
+
+用法（在 auth_backend 目录下）:
+    python -m benchmarks.bench_pdf_extract --corpus /path/to/pdfs --rounds 3
+"""
+import argparse
+import glob
+import io
+import os
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_backend.settings')
+django.setup()
+
+import pdfplumber  # noqa: E402
+
+from interview.pdf_extract import extract_setting, extract_text, get_pool, page_count  # noqa: E402
+
+LINES = [
+    "Work Experience",
+    "Senior Backend Engineer, Example Tech Co., 2021 - Present",
+    "Designed and operated Django REST services handling 2M requests per day.",
+    "Migrated batch jobs to an event-driven pipeline with Redis and Celery.",
+    "Education: B.Sc. Computer Science, Example University, 2017",
+    "Skills: Python, Django, PostgreSQL, Redis, Docker, Kubernetes, AWS",
+]
+
+
+def make_pdf(pages, lines_per_page=45):
+    """生成一个只含 Helvetica 文本的多页 PDF"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(pages):
+        rows = [f"{LINES[i % len(LINES)]} ({number + 1}.{i + 1})" for i in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(
+            "(" + row.replace("(", "[").replace(")", "]") + ") '" for row in rows
+        ) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n{body}\nendobj\n".encode('latin-1'))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def pdfplumber_serial(data):
+    """原实现：请求线程内用 pdfplumber 逐页提取"""
+    text = ""
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text + "\n"
+    return text
+
+
+def run(label, extract, corpus, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for data in corpus:
+            start = time.perf_counter()
+            extract(data)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"{label:<30} mean {statistics.mean(latencies):8.1f} ms | p50 {latencies[len(latencies) // 2]:8.1f} ms"
+          f" | max {latencies[-1]:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', help='样本 PDF 所在目录')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, '*.pdf'))):
+            with open(path, 'rb') as f:
+                corpus.append(f.read())
+    else:
+        corpus = [make_pdf(pages) for pages in (1, 2, 3, 5, 8)]
+
+    pages = sum(page_count(data) for data in corpus)
+    print(f"{len(corpus)} documents, {pages} pages, {args.rounds} rounds")
+    # 预热进程池，避免把子进程启动时间计入结果
+    extract_text(corpus[0])
+    get_pool()
+    run("pdfplumber serial", pdfplumber_serial, corpus, args.rounds)
+    # 新实现只提取前 MAX_PAGES 页
+    run(f"pdfium + pool (<= {extract_setting('MAX_PAGES')} pages)", extract_text, corpus, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+岗位粗排基准测试：对比“全量岗位入提示词”与“粗排后前 K 个岗位入提示词”的提示词大小和耗时。
+
+加 --llm 时，两种提示词都实际调用 DeepSeek（不经过 LLM 响应缓存，需要 DEEPSEEK_API_KEY），
+记录端到端延迟的中位数和 usage 中的提示词 token 数；全量提示词超出模型上下文时记为失败。
+
+用法（在 auth_backend 目录下，需与服务相同的运行环境）:
+    python -m benchmarks.bench_prerank --sizes 150 1000 5000 20000 --top-k 30
+    python -m benchmarks.bench_prerank --sizes 150 1000 --llm --llm-repeat 3
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_backend.settings')
+django.setup()
+
+from common.job_catalog import CatalogSnapshot, _freeze_job  # noqa: E402
+from jobcenter.ranking import JobRanker, resume_skill_weights  # noqa: E402
+from common.llm_client import chat_completion  # noqa: E402
+from jobcenter.services import build_recommendation_payload, build_recommendation_prompt  # noqa: E402
+
+SKILLS = ['Java', 'Spring', 'SpringCloud', 'MySQL', 'Redis', 'Kafka', 'MyBatis', 'C#', '.NET', 'ASP.NET',
+          'C++', 'QT', 'PHP', 'Laravel', 'Python', 'Django', 'Golang', 'Linux', 'Docker', 'Kubernetes',
+          'Elasticsearch', 'Oracle', 'SQL Server', 'MongoDB', 'Dubbo', 'JVM', '多线程', '分布式经验', '微服务经验']
+EXPERIENCE = ['经验不限', '在校/应届', '1年以内', '1-3年', '3-5年', '5-10年', '10年以上']
+EDUCATION = ['学历不限', '大专', '本科', '硕士', '博士']
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '成都', '西安', '武汉', '南京']
+
+RESUME = {
+    "personal": {"degree": "Bachelor"},
+    "skills": {"proficient": ["Java", "Spring", "MySQL", "Redis"], "familiar": ["Kafka", "Docker"]},
+    "education": [{"school": "XX University", "major": "Computer Science", "degree": "Bachelor", "score": "3.6"}],
+    "experiences": [{"type": "work", "name": "Backend Engineer", "company": "ACME", "period": "2021-2024",
+                     "content": "Built order services", "result": "Cut latency by 30%"}],
+    "honors": [],
+    "selfEvaluation": "",
+    "preferred_location": "上海",
+}
+
+
+def make_catalog(size, seed=0):
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(1, size + 1):
+        city = rng.choice(CITIES)
+        jobs.append(_freeze_job(str(i), {
+            "title": f"后端开发工程师 #{i}",
+            "company": f"公司{i % 500}",
+            "location": f"{city}/某区/某街道",
+            "salary": "15-30K",
+            "description": f"后端开发工程师 #{i} at 公司{i % 500}",
+            "experience": rng.choice(EXPERIENCE),
+            "education": rng.choice(EDUCATION),
+            "skills": rng.sample(SKILLS, rng.randint(3, 7)),
+        }))
+    return CatalogSnapshot(version=str(size), jobs=tuple(jobs), by_id={}, loaded_at=time.time())
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def llm_latency(prompt, repeat):
+    """实际调用 DeepSeek，返回 (延迟中位数 ms, 提示词 token 数)，请求失败时返回错误描述"""
+    latencies, prompt_tokens = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            response = chat_completion(build_recommendation_payload(prompt), timeout=120)
+        except Exception as e:
+            return f"failed: {type(e).__name__}", None
+        latencies.append((time.perf_counter() - start) * 1000)
+        prompt_tokens = response.get("usage", {}).get("prompt_tokens")
+    return statistics.median(latencies), prompt_tokens
+
+
+def format_llm(result):
+    latency, tokens = result
+    if isinstance(latency, str):
+        return f"{latency:>24}"
+    return f"{latency:>10.0f} ms {tokens or '-':>9} tok"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[150, 1000, 5000, 20000])
+    parser.add_argument('--top-k', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--llm', action='store_true', help='实际调用 DeepSeek，测量端到端延迟')
+    parser.add_argument('--llm-repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    header = f"{'jobs':>7} | {'full prompt chars':>17} | {'top-k prompt chars':>18} | " \
+             f"{'index build ms':>14} | {'match ms':>8} | {'rank ms':>8} | " \
+             f"{'full prompt ms':>14} | {'top-k prompt ms':>15}"
+    if args.llm:
+        header += f" | {'full prompt LLM':>24} | {'top-k prompt LLM':>24}"
+    print(header)
+    print('-' * len(header))
+    for size in args.sizes:
+        catalog = make_catalog(size)
+        ranker, build_ms = timed(lambda: JobRanker(catalog.jobs), 1)
+        skill_weights = resume_skill_weights(RESUME)
+        _, match_ms = timed(lambda: ranker.index.weighted_matches(skill_weights), args.repeat)
+        candidates, rank_ms = timed(lambda: ranker.top_k(RESUME, args.top_k), args.repeat)
+        full_prompt, full_ms = timed(lambda: build_recommendation_prompt(RESUME, catalog.jobs), args.repeat)
+        top_prompt, top_ms = timed(lambda: build_recommendation_prompt(RESUME, candidates), args.repeat)
+        row = (f"{size:>7} | {len(full_prompt):>17} | {len(top_prompt):>18} | "
+               f"{build_ms:>14.2f} | {match_ms:>8.3f} | {rank_ms:>8.2f} | {full_ms:>14.2f} | {top_ms:>15.2f}")
+        if args.llm:
+            row += (f" | {format_llm(llm_latency(full_prompt, args.llm_repeat))}"
+                    f" | {format_llm(llm_latency(top_prompt, args.llm_repeat))}")
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
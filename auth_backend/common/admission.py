@@ -0,0 +1,267 @@
+"""
+DeepSeek 出站调用的准入控制（集群级，基于 Redis）。
+
+所有 Web 进程和任务线程共用同一组 Redis 键：
+- 令牌桶限制调用速率：每秒补充 RATE 个令牌，最多积累 BURST 个；
+- 租约集合（有序集合，分值为到期时间）限制同时进行的调用数，持有进程崩溃时租约随调用超时自动过期；
+- 每个接口对应一个优先级（settings.LLM_ADMISSION["ENDPOINTS"]），优先级的 SHARE 是它可以使用的
+  令牌和并发的比例，低优先级用不到的余量留给交互式的高优先级请求；
+- 暂时无法准入的请求进入所属优先级的等待队列，最多等待 MAX_WAIT 秒；队列已满（MAX_QUEUE）或
+  等待超时时抛出 AdmissionRejected，视图返回 429 + Retry-After，不会无限排队；
+- 同一优先级按到达顺序准入：队列非空时只有队首可以准入，新到的请求排到队尾，不会插队。
+  队列是有序集合，分值为等待截止时间（同一优先级的 MAX_WAIT 相同，分值顺序即入队顺序），
+  崩溃进程留下的队首最多阻塞队列 MAX_WAIT 秒。
+
+令牌桶、队首和租约的检查在同一个 Lua 脚本中原子完成，时间取 Redis 服务器时间，不受各主机时钟偏差影响。
+缓存后端不是 Redis 或 Redis 不可用时直接放行（与缓存的 IGNORE_EXCEPTIONS 一致）。
+"""
+import logging
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from common.counters import incr_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADMISSION_SETTINGS = {
+    "ENABLED": True,
+    "RATE": 5,
+    "BURST": 20,
+    "MAX_CONCURRENT": 40,
+    "LEASE_MARGIN": 30,
+    "POLL_INTERVAL": 0.25,
+    "DEFAULT_PRIORITY": "normal",
+    "PRIORITIES": {
+        "high": {"SHARE": 1.0, "MAX_WAIT": 10, "MAX_QUEUE": 200},
+        "normal": {"SHARE": 0.8, "MAX_WAIT": 5, "MAX_QUEUE": 100},
+        "low": {"SHARE": 0.5, "MAX_WAIT": 0, "MAX_QUEUE": 0},
+    },
+    "ENDPOINTS": {},
+}
+
+# KEYS: 令牌桶, 租约集合, 所属优先级的等待队列；ARGV: RATE, BURST, MAX_CONCURRENT, SHARE, 租约时长, 轮询间隔, 租约 ID
+# 返回 {1, '0'} 表示准入；{0, 建议等待秒数} 表示暂时无法准入（浮点数以字符串返回，避免被截断为整数）
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local share = tonumber(ARGV[4])
+local lease_ttl = tonumber(ARGV[5])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+local head = redis.call('ZRANGE', KEYS[3], 0, 0)[1]
+local slots = math.max(1, math.floor(tonumber(ARGV[3]) * share))
+local floor = burst * (1 - share)
+local wait = 0
+if head and head ~= ARGV[7] then
+    wait = tonumber(ARGV[6])
+elseif redis.call('ZCARD', KEYS[2]) >= slots then
+    wait = tonumber(ARGV[6])
+elseif tokens - 1 < floor then
+    wait = (floor + 1 - tokens) / rate
+else
+    tokens = tokens - 1
+    redis.call('ZADD', KEYS[2], now + lease_ttl, ARGV[7])
+    redis.call('EXPIRE', KEYS[2], math.ceil(lease_ttl) + 60)
+    redis.call('ZREM', KEYS[3], ARGV[7])
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+return {1, '0'}
+"""
+
+# KEYS: 等待队列；ARGV: 队列上限, 最长等待秒数, 等待者 ID；返回 1 表示已入队，0 表示队列已满
+ENQUEUE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2])) + 60)
+return 1
+"""
+
+
+class AdmissionRejected(Exception):
+    """DeepSeek 调用额度已用尽，retry_after 秒后再试"""
+
+    status_code = 429
+
+    def __init__(self, endpoint, retry_after):
+        self.endpoint = endpoint
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"DeepSeek capacity exhausted for {endpoint}, retry after {self.retry_after}s")
+
+    def response_data(self):
+        return {'error': 'AI service is busy, please retry later', 'retry_after': self.retry_after}
+
+    def headers(self):
+        return {'Retry-After': str(self.retry_after)}
+
+
+def admission_setting(name):
+    return getattr(settings, 'LLM_ADMISSION', {}).get(name, DEFAULT_ADMISSION_SETTINGS[name])
+
+
+def endpoint_priority(endpoint):
+    return admission_setting("ENDPOINTS").get(endpoint, admission_setting("DEFAULT_PRIORITY"))
+
+
+def _bucket_key():
+    # 原生 Redis 命令不会自动加 KEY_PREFIX，这里与缓存键保持同一前缀
+    return cache.make_key("llm_admission_bucket")
+
+
+def _leases_key():
+    return cache.make_key("llm_admission_leases")
+
+
+def _queue_key(priority):
+    return cache.make_key(f"llm_admission_queue_{priority}")
+
+
+def _rejected_key(endpoint):
+    return f"llm_admission_rejected_{endpoint}"
+
+
+_scripts = {}
+
+
+def _script(client, source):
+    """Lua 脚本只注册一次（Script 对象按 SHA 调用，缺失时自动重新加载）"""
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = client.register_script(source)
+    return script
+
+
+class Ticket:
+    """一次调用的准入请求；准入后持有租约，调用结束时 release()"""
+
+    def __init__(self, endpoint, timeout):
+        self.endpoint = endpoint
+        self.priority = endpoint_priority(endpoint)
+        limits = admission_setting("PRIORITIES")[self.priority]
+        self.share = limits["SHARE"]
+        self.max_wait = limits["MAX_WAIT"]
+        self.max_queue = limits["MAX_QUEUE"]
+        self.lease_ttl = timeout + admission_setting("LEASE_MARGIN")
+        self.id = uuid.uuid4().hex
+        self.client = get_redis_connection("default")
+
+    def try_acquire(self):
+        """尝试准入，返回 (是否准入, 建议等待秒数)"""
+        admitted, wait = _script(self.client, ACQUIRE_SCRIPT)(
+            keys=[_bucket_key(), _leases_key(), _queue_key(self.priority)],
+            args=[
+                admission_setting("RATE"),
+                admission_setting("BURST"),
+                admission_setting("MAX_CONCURRENT"),
+                self.share,
+                self.lease_ttl,
+                admission_setting("POLL_INTERVAL"),
+                self.id,
+            ],
+            client=self.client,
+        )
+        return bool(admitted), float(wait)
+
+    def enqueue(self):
+        """进入等待队列；不允许等待或队列已满时返回 False"""
+        if self.max_wait <= 0:
+            return False
+        script = _script(self.client, ENQUEUE_SCRIPT)
+        return bool(script(keys=[_queue_key(self.priority)], args=[self.max_queue, self.max_wait, self.id],
+                           client=self.client))
+
+    def dequeue(self):
+        try:
+            self.client.zrem(_queue_key(self.priority), self.id)
+        except RedisError:
+            pass
+
+    def reject(self, wait):
+        incr_counter(_rejected_key(self.endpoint))
+        return AdmissionRejected(self.endpoint, wait)
+
+    def release(self):
+        try:
+            self.client.zrem(_leases_key(), self.id)
+        except RedisError as e:
+            logger.warning("释放 DeepSeek 准入租约失败，将在租约到期后自动释放: %s", e)
+
+
+def acquire(endpoint, timeout):
+    """
+    获取一次 DeepSeek 调用的准入，timeout 为本次调用的超时（决定租约时长）。
+
+    返回 Ticket，调用结束后需 release()；未启用或 Redis 不可用时返回 None。
+    无法在该优先级的 MAX_WAIT 内准入时抛出 AdmissionRejected。
+    """
+    if not admission_setting("ENABLED"):
+        return None
+    try:
+        ticket = Ticket(endpoint, timeout)
+        admitted, wait = ticket.try_acquire()
+        if admitted:
+            return ticket
+        if not ticket.enqueue():
+            raise ticket.reject(wait)
+        deadline = time.monotonic() + ticket.max_wait
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ticket.reject(wait)
+                time.sleep(min(wait, remaining))
+                admitted, wait = ticket.try_acquire()
+                if admitted:
+                    return ticket
+        finally:
+            ticket.dequeue()
+    except (NotImplementedError, RedisError) as e:
+        logger.warning("DeepSeek 准入控制不可用，直接放行: %s", e)
+        return None
+
+
+def release(ticket):
+    if ticket is not None:
+        ticket.release()
+
+
+def admission_stats():
+    """当前占用的并发、各优先级的排队数和各接口的拒绝次数"""
+    endpoints = sorted(admission_setting("ENDPOINTS"))
+    values = cache.get_many([_rejected_key(endpoint) for endpoint in endpoints])
+    stats = {"rejected": {endpoint: values.get(_rejected_key(endpoint), 0) for endpoint in endpoints}}
+    try:
+        client = get_redis_connection("default")
+        seconds, microseconds = client.time()
+        now = seconds + microseconds / 1e6
+        stats["active"] = client.zcount(_leases_key(), now, '+inf')
+        stats["waiting"] = {
+            priority: client.zcount(_queue_key(priority), now, '+inf')
+            for priority in admission_setting("PRIORITIES")
+        }
+    except (NotImplementedError, RedisError):
+        stats["active"] = stats["waiting"] = None
+    return stats
@@ -0,0 +1,15 @@
+"""
+缓存中的永久计数器（命中/未命中、拒绝次数等），由 /api/metrics 暴露。
+
+计数直接用 cache.incr，Redis 上是原子的 INCR，多进程共享同一组计数。
+"""
+from django.core.cache import cache
+
+
+def incr_counter(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # 计数键不存在（首次计数或被清理）；add 不会覆盖其他进程刚创建的键
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
@@ -18,6 +18,15 @@ def get_users_collection():
     """获取用户集合的引用"""
     return db.collection('users')
 
+def get_user_emails_collection():
+    """获取邮箱索引集合的引用（文档 ID 为规范化邮箱的哈希）"""
+    return db.collection('user_emails')
+
 def get_jobs_collection():
     """获取岗位集合的引用"""
-    return db.collection('jobs')
\ No newline at end of file
+    return db.collection('jobs')
+
+def get_catalog_meta_doc():
+    """获取岗位目录版本文档的引用（由导入脚本的同步模式维护）"""
+    return db.collection('catalog_meta').document('jobs')
+
@@ -0,0 +1,261 @@
+"""
+岗位目录：在进程内缓存整个 jobs 集合，避免每次推荐请求都全量读取 Firestore。
+
+首次访问时挂载 Firestore 快照监听（on_snapshot），之后由监听线程增量维护；
+监听不可用或中断时退化为定时轮询。对外只暴露不可变的 CatalogSnapshot。
+
+岗位都带有内容哈希（导入脚本的同步模式写入）时，目录版本由内容哈希计算，与 catalog_meta/jobs
+中的版本一致：内容没有变化的重新导入不会改变版本。轮询时先读取该版本文档，版本未变化时跳过全量加载
+（每隔 FULL_RELOAD_INTERVAL 仍全量加载一次，兜底不经过导入脚本的修改）。
+"""
+import hashlib
+import logging
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from django.conf import settings
+
+from common.firebase_utils import get_catalog_meta_doc, get_jobs_collection
+from common.job_hashing import catalog_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_SETTINGS = {
+    "USE_LISTENER": True,
+    "POLL_INTERVAL": 300,
+    "INITIAL_LOAD_TIMEOUT": 30,
+    "FULL_RELOAD_INTERVAL": 3600,
+}
+
+
+def _catalog_setting(name):
+    return getattr(settings, 'JOB_CATALOG', {}).get(name, DEFAULT_CATALOG_SETTINGS[name])
+
+
+def _freeze(value):
+    """将列表/字典转换为只读结构，防止调用方修改共享的岗位数据"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _freeze_job(doc_id, data):
+    job = dict(data or {})
+    # 确保ID是字符串（Firestore文档ID）
+    job['id'] = doc_id
+    return _freeze(job)
+
+
+class CatalogSnapshot(NamedTuple):
+    """某一版本的岗位目录（只读）"""
+    version: str
+    jobs: tuple
+    by_id: MappingProxyType
+    loaded_at: float
+
+    def get(self, job_id):
+        return self.by_id.get(job_id)
+
+    def __len__(self):
+        return len(self.jobs)
+
+
+EMPTY_SNAPSHOT = CatalogSnapshot(version='', jobs=(), by_id=MappingProxyType({}), loaded_at=0.0)
+
+
+class JobCatalog:
+    """进程级岗位目录，线程安全"""
+
+    def __init__(self, collection_factory=get_jobs_collection, meta_factory=get_catalog_meta_doc):
+        self._collection_factory = collection_factory
+        self._meta_factory = meta_factory
+        self._lock = threading.RLock()
+        self._start_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        # doc_id -> (只读岗位, update_time)
+        self._docs = {}
+        self._snapshot = EMPTY_SNAPSHOT
+        self._started = False
+        self._mode = None
+        self._watch = None
+        self._poll_thread = None
+        self._last_sync = None
+        self._last_full_load = None
+        self._last_error = None
+
+    # ---------- 对外接口 ----------
+
+    def snapshot(self):
+        """返回当前版本的岗位目录，首次调用时加载"""
+        self.ensure_started()
+        if self._mode == 'listener' and not self._watch_active():
+            self._switch_to_polling('snapshot listener stopped')
+        return self._snapshot
+
+    @property
+    def version(self):
+        return self._snapshot.version
+
+    def staleness(self):
+        """距上次确认与 Firestore 同步的秒数；监听在线时为 0"""
+        if self._last_sync is None:
+            return None
+        if self._mode == 'listener' and self._watch_active():
+            return 0.0
+        return max(0.0, time.time() - self._last_sync)
+
+    def status(self):
+        """供监控使用的目录状态"""
+        snapshot = self._snapshot
+        staleness = self.staleness()
+        return {
+            "started": self._started,
+            "mode": self._mode,
+            "version": snapshot.version,
+            "size": len(snapshot),
+            "loaded_at": snapshot.loaded_at or None,
+            "last_sync": self._last_sync,
+            "staleness_seconds": round(staleness, 3) if staleness is not None else None,
+            "last_error": self._last_error,
+        }
+
+    def ensure_started(self):
+        if self._started:
+            return
+        # 等待首个快照时不能持有 _lock，否则监听回调无法写入
+        with self._start_lock:
+            if self._started:
+                return
+            if _catalog_setting("USE_LISTENER"):
+                self._start_listener()
+            if self._mode != 'listener':
+                self._switch_to_polling('snapshot listener disabled or unavailable')
+            elif not self._ready.wait(_catalog_setting("INITIAL_LOAD_TIMEOUT")):
+                self._switch_to_polling('initial snapshot not received')
+            self._started = True
+
+    def refresh(self):
+        """立即从 Firestore 全量重新加载"""
+        docs = {}
+        for doc in self._collection_factory().stream():
+            docs[doc.id] = (_freeze_job(doc.id, doc.to_dict()), doc.update_time)
+        with self._lock:
+            self._docs = docs
+            self._publish()
+            self._last_full_load = self._last_sync
+
+    def close(self):
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    # ---------- 同步实现 ----------
+
+    def _start_listener(self):
+        try:
+            self._watch = self._collection_factory().on_snapshot(self._on_snapshot)
+            self._mode = 'listener'
+        except Exception as e:
+            self._last_error = f"listener: {e}"
+            logger.warning("岗位目录监听启动失败，改用轮询: %s", e)
+            self._watch = None
+
+    def _watch_active(self):
+        watch = self._watch
+        return watch is not None and watch.is_active
+
+    def _on_snapshot(self, docs, changes, read_time):
+        """Firestore 监听回调（在后台线程中执行），按变更增量更新"""
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == 'REMOVED':
+                    self._docs.pop(doc.id, None)
+                else:
+                    self._docs[doc.id] = (_freeze_job(doc.id, doc.to_dict()), doc.update_time)
+            self._publish()
+        self._ready.set()
+
+    def _switch_to_polling(self, reason):
+        with self._lock:
+            if self._mode == 'polling':
+                return
+            logger.warning("岗位目录切换为轮询模式: %s", reason)
+            if self._watch is not None:
+                try:
+                    self._watch.unsubscribe()
+                except Exception:
+                    pass
+                self._watch = None
+            if not self._ready.is_set():
+                self.refresh()
+                self._ready.set()
+            self._mode = 'polling'
+            self._poll_thread = threading.Thread(target=self._poll_loop, name='job-catalog-poller', daemon=True)
+            self._poll_thread.start()
+
+    def _meta_version(self):
+        """catalog_meta/jobs 中记录的目录版本（不存在时返回 None）"""
+        doc = self._meta_factory().get()
+        return (doc.to_dict() or {}).get('version') if doc.exists else None
+
+    def _poll_once(self):
+        """目录版本未变化且未到全量加载间隔时只确认同步时间，否则全量加载"""
+        full_reload_due = (
+            self._last_full_load is None
+            or time.time() - self._last_full_load >= _catalog_setting("FULL_RELOAD_INTERVAL")
+        )
+        if not full_reload_due and self._meta_version() == self._snapshot.version:
+            self._last_sync = time.time()
+            return
+        self.refresh()
+
+    def _poll_loop(self):
+        interval = _catalog_setting("POLL_INTERVAL")
+        while not self._stop.wait(interval):
+            try:
+                self._poll_once()
+            except Exception as e:
+                self._last_error = f"poll: {e}"
+                logger.warning("岗位目录轮询失败: %s", e)
+
+    def _publish(self):
+        """根据当前文档生成新的只读快照；调用方需持有锁"""
+        ordered = sorted(self._docs.items())
+        hashes = [(doc_id, job.get('content_hash')) for doc_id, (job, _) in ordered]
+        if hashes and all(content_hash for _, content_hash in hashes):
+            version = catalog_version(hashes)
+        else:
+            # 旧数据没有内容哈希，按文档更新时间计算
+            digest = hashlib.sha1()
+            for doc_id, (_, update_time) in ordered:
+                digest.update(f"{doc_id}:{update_time}\n".encode('utf-8'))
+            version = digest.hexdigest()[:16]
+        jobs = tuple(job for _, (job, _) in ordered)
+        self._snapshot = CatalogSnapshot(
+            version=version,
+            jobs=jobs,
+            by_id=MappingProxyType({job['id']: job for job in jobs}),
+            loaded_at=time.time(),
+        )
+        self._last_sync = self._snapshot.loaded_at
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_job_catalog():
+    """获取进程级岗位目录单例"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = JobCatalog()
+    return _catalog
@@ -0,0 +1,37 @@
+"""
+岗位的稳定 ID、内容哈希和目录版本。
+
+导入脚本（不加载 Django）和进程内的岗位目录共用这里的计算方式，两边得到的目录版本一致，
+因此本模块不能依赖 Django 或 Firebase。
+"""
+import hashlib
+import json
+import re
+
+# 不参与内容哈希的字段
+UNHASHED_FIELDS = ('id', 'content_hash')
+
+
+def _normalize(value):
+    return re.sub(r'\s+', ' ', str(value or '')).strip().casefold()
+
+
+def job_natural_id(job):
+    """由公司、职位名称和工作地点得到的稳定文档 ID（与 CSV 中的行顺序无关）"""
+    key = '\x1f'.join(_normalize(job.get(field)) for field in ('company', 'title', 'location'))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def job_content_hash(job):
+    """岗位内容的哈希（规范化 JSON 的 SHA-256）"""
+    content = {k: v for k, v in job.items() if k not in UNHASHED_FIELDS}
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def catalog_version(hashes):
+    """由 (文档 ID, 内容哈希) 计算目录版本；内容不变时版本不变"""
+    digest = hashlib.sha1()
+    for doc_id, content_hash in sorted(hashes):
+        digest.update(f"{doc_id}:{content_hash}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
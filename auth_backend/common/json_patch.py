@@ -0,0 +1,118 @@
+"""
+JSON Patch（RFC 6902）的应用：add / remove / replace / move / copy / test，
+路径为 JSON Pointer（RFC 6901）。
+
+apply_operation 原地修改文档；调用方先复制文档，任一操作失败时整体放弃，保证补丁的原子性。
+"""
+import copy
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class JSONPatchError(ValueError):
+    """补丁格式错误，或路径在文档中不存在"""
+
+
+class JSONPatchTestFailed(JSONPatchError):
+    """test 操作的值与文档不一致"""
+
+
+def parse_pointer(pointer):
+    """把 JSON Pointer 拆成路径片段（'' 表示整个文档）"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise JSONPatchError(f"invalid JSON pointer: {pointer!r}")
+    if not pointer:
+        return []
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def list_index(items, token, allow_end=False):
+    """数组下标；allow_end 时允许 '-' 和 len(items)（追加到末尾）"""
+    if allow_end and token == '-':
+        return len(items)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise JSONPatchError(f"invalid array index: {token!r}")
+    index = int(token)
+    if index > len(items) or (index == len(items) and not allow_end):
+        raise JSONPatchError(f"array index out of range: {index}")
+    return index
+
+
+def json_equal(a, b):
+    """test 操作的相等判断：类型必须相同（true 与 1 不相等），数值按大小比较（1 与 1.0 相等）"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, (int, float)) or isinstance(b, (int, float)):
+        return isinstance(a, (int, float)) and isinstance(b, (int, float)) and a == b
+    if isinstance(a, dict) or isinstance(b, dict):
+        return (isinstance(a, dict) and isinstance(b, dict) and a.keys() == b.keys()
+                and all(json_equal(a[key], b[key]) for key in a))
+    if isinstance(a, list) or isinstance(b, list):
+        return isinstance(a, list) and isinstance(b, list) and len(a) == len(b) and all(map(json_equal, a, b))
+    return a == b
+
+
+def resolve(document, tokens):
+    """读取路径指向的值"""
+    value = document
+    for token in tokens:
+        if isinstance(value, list):
+            value = value[list_index(value, token)]
+        elif isinstance(value, dict) and token in value:
+            value = value[token]
+        else:
+            raise JSONPatchError(f"path not found: {token!r}")
+    return value
+
+
+def _parent(document, tokens):
+    if not tokens:
+        raise JSONPatchError("operations on the whole document are not supported")
+    parent = resolve(document, tokens[:-1])
+    if not isinstance(parent, (list, dict)):
+        raise JSONPatchError(f"path not found: {tokens[-1]!r}")
+    return parent, tokens[-1]
+
+
+def _add(document, tokens, value):
+    parent, key = _parent(document, tokens)
+    if isinstance(parent, list):
+        parent.insert(list_index(parent, key, allow_end=True), value)
+    else:
+        parent[key] = value
+
+
+def _remove(document, tokens):
+    parent, key = _parent(document, tokens)
+    if isinstance(parent, list):
+        return parent.pop(list_index(parent, key))
+    if key not in parent:
+        raise JSONPatchError(f"path not found: {key!r}")
+    return parent.pop(key)
+
+
+def apply_operation(document, operation):
+    """在 document 上原地执行一个补丁操作"""
+    if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+        raise JSONPatchError(f"op must be one of {', '.join(OPERATIONS)}")
+    op = operation['op']
+    tokens = parse_pointer(operation.get('path'))
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise JSONPatchError(f"'{op}' requires a value")
+
+    if op == 'add':
+        _add(document, tokens, operation['value'])
+    elif op == 'remove':
+        _remove(document, tokens)
+    elif op == 'replace':
+        _remove(document, tokens)
+        _add(document, tokens, operation['value'])
+    elif op == 'move':
+        from_tokens = parse_pointer(operation.get('from'))
+        if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+            raise JSONPatchError("cannot move a value into one of its children")
+        _add(document, tokens, _remove(document, from_tokens))
+    elif op == 'copy':
+        _add(document, tokens, copy.deepcopy(resolve(document, parse_pointer(operation.get('from')))))
+    elif not json_equal(resolve(document, tokens), operation['value']):
+        raise JSONPatchTestFailed(f"test failed at {operation['path']}")
@@ -0,0 +1,77 @@
+"""
+增量 JSON 解析：从大模型的流式输出中逐个取出顶层对象的成员。
+
+大模型按 token 输出 {"personal": {...}, "skills": {...}, ...}，
+每当一个顶层成员（键值对）完整出现，就立即解析并产出，而不必等待整个对象结束。
+顶层对象之前/之后的内容（例如 ```json 代码块标记）会被忽略。
+"""
+import json
+
+
+class TopLevelMemberParser:
+    """逐块喂入文本，产出已完成的 (key, value)"""
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member = []
+        self._member_done = False
+        self.finished = False
+
+    def feed(self, chunk):
+        """喂入一段文本，返回本段中完成的成员列表"""
+        completed = []
+        for char in chunk:
+            if self.finished:
+                break
+            if self._depth == 0:
+                # 等待顶层对象开始
+                if char == '{':
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                self._member.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    # 顶层对象结束
+                    self._emit(completed)
+                    self.finished = True
+                    continue
+                if self._depth == 1:
+                    # 容器类型的值刚好闭合，立即产出
+                    self._member.append(char)
+                    self._emit(completed)
+                    self._member_done = True
+                    continue
+            elif char == ',' and self._depth == 1:
+                self._emit(completed)
+                self._member_done = False
+                continue
+            self._member.append(char)
+        return completed
+
+    def _emit(self, completed):
+        text = ''.join(self._member).strip()
+        self._member = []
+        if self._member_done or not text:
+            return
+        try:
+            member = json.loads('{' + text + '}')
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON member: {e}") from e
+        completed.extend(member.items())
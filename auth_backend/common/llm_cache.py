@@ -0,0 +1,119 @@
+"""
+DeepSeek 响应缓存：以请求体（模型、消息、采样参数）的哈希为键，存放在 CACHES["default"]（Redis）中。
+
+- 各接口的缓存时间见 settings.LLM_CACHE["TTLS"]；
+- 非确定性的调用（如面试追问）传 bypass=True 跳过缓存；
+- 未命中时经 single-flight 合并并发的相同请求，只调用一次 DeepSeek；
+- 每个接口的命中/未命中/跳过次数记录在缓存计数器中，由 /api/metrics 暴露。
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.counters import incr_counter
+from common.llm_client import chat_content, stream_chat_content
+from common.single_flight import single_flight
+
+DEFAULT_LLM_CACHE_SETTINGS = {
+    "ENABLED": True,
+    "DEFAULT_TTL": 60 * 60,
+    "TTLS": {},
+}
+
+COUNTER_EVENTS = ('hits', 'misses', 'bypass')
+
+
+def llm_cache_setting(name):
+    return getattr(settings, 'LLM_CACHE', {}).get(name, DEFAULT_LLM_CACHE_SETTINGS[name])
+
+
+def endpoint_ttl(endpoint):
+    return llm_cache_setting("TTLS").get(endpoint, llm_cache_setting("DEFAULT_TTL"))
+
+
+def prompt_hash(payload):
+    """请求体的规范化哈希（stream 标志不影响结果，不参与计算）"""
+    canonical = {k: v for k, v in payload.items() if k != 'stream'}
+    encoded = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def response_key(payload):
+    return f"llm_response_{prompt_hash(payload)}"
+
+
+def _counter_key(event, endpoint):
+    return f"llm_cache_{event}_{endpoint}"
+
+
+def _count(event, endpoint):
+    incr_counter(_counter_key(event, endpoint))
+
+
+def _use_cache(endpoint, bypass):
+    if bypass or not llm_cache_setting("ENABLED"):
+        _count('bypass', endpoint)
+        return False
+    return True
+
+
+def cached_chat_content(payload, endpoint, timeout=None, bypass=False):
+    """带缓存的 chat_content"""
+    if not _use_cache(endpoint, bypass):
+        return chat_content(payload, timeout, endpoint)
+
+    key = response_key(payload)
+    content = cache.get(key)
+    if content is not None:
+        _count('hits', endpoint)
+        return content
+
+    _count('misses', endpoint)
+
+    def compute():
+        result = chat_content(payload, timeout, endpoint)
+        cache.set(key, result, timeout=endpoint_ttl(endpoint))
+        return result
+
+    return single_flight(key, compute)
+
+
+def cached_stream_chat_content(payload, endpoint, timeout=None, bypass=False):
+    """带缓存的 stream_chat_content：命中时一次性产出完整内容，未命中时边流式输出边累积，完整结束后写入缓存"""
+    if not _use_cache(endpoint, bypass):
+        yield from stream_chat_content(payload, timeout, endpoint)
+        return
+
+    key = response_key(payload)
+    content = cache.get(key)
+    if content is not None:
+        _count('hits', endpoint)
+        yield content
+        return
+
+    _count('misses', endpoint)
+    parts = []
+    deltas = stream_chat_content(payload, timeout, endpoint)
+    try:
+        for delta in deltas:
+            parts.append(delta)
+            yield delta
+    finally:
+        deltas.close()
+    cache.set(key, ''.join(parts), timeout=endpoint_ttl(endpoint))
+
+
+def cache_stats():
+    """各接口的缓存命中统计"""
+    endpoints = sorted(llm_cache_setting("TTLS"))
+    keys = [_counter_key(event, endpoint) for endpoint in endpoints for event in COUNTER_EVENTS]
+    values = cache.get_many(keys)
+    stats = {}
+    for endpoint in endpoints:
+        counts = {event: values.get(_counter_key(event, endpoint), 0) for event in COUNTER_EVENTS}
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / lookups, 4) if lookups else None
+        stats[endpoint] = counts
+    return stats
@@ -0,0 +1,240 @@
+"""
+DeepSeek 调用的共享 HTTP 客户端。
+
+所有大模型调用都走同一个进程级 httpx.Client：保持长连接复用，
+避免每次调用都重新进行 TCP + TLS 握手；可选启用 HTTP/2。
+连接池大小、超时时间见 settings.LLM_CLIENT。
+
+每次调用前经 common.admission 获取集群级准入（endpoint 决定优先级），额度用尽时抛出 AdmissionRejected；
+调用经过 common.resilience 的熔断器，失败时带抖动退避重试，可选对冲请求（见 settings.LLM_RESILIENCE）。
+"""
+import json
+import os
+import threading
+import time
+
+import httpx
+from django.conf import settings
+
+from common.admission import acquire, release
+from common.resilience import CircuitBreaker, HedgeCancelled, hedge_delay, hedged, latencies, retry, retry_delay
+
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-3f843c1b731642809c76190689ba9892")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+
+DEFAULT_CLIENT_SETTINGS = {
+    "HTTP2": True,
+    "MAX_CONNECTIONS": 20,
+    "MAX_KEEPALIVE_CONNECTIONS": 10,
+    "KEEPALIVE_EXPIRY": 60,
+    "CONNECT_TIMEOUT": 10,
+    "TIMEOUT": 60,
+}
+
+
+class LLMAPIError(ValueError):
+    """DeepSeek 返回非 2xx 状态码"""
+
+    def __init__(self, status_code, message):
+        self.status_code = status_code
+        self.message = message
+        super().__init__(f"DeepSeek API error: {status_code} - {message}")
+
+
+def client_setting(name):
+    return getattr(settings, 'LLM_CLIENT', {}).get(name, DEFAULT_CLIENT_SETTINGS[name])
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_timeout(timeout=None):
+    """单次调用的超时：connect 固定，读写/池等待使用 timeout"""
+    return httpx.Timeout(timeout or client_setting("TIMEOUT"), connect=client_setting("CONNECT_TIMEOUT"))
+
+
+def build_client(**overrides):
+    """按配置创建 httpx.Client（基准测试也用它创建独立客户端）"""
+    options = {
+        "http2": client_setting("HTTP2") and _http2_available(),
+        "limits": httpx.Limits(
+            max_connections=client_setting("MAX_CONNECTIONS"),
+            max_keepalive_connections=client_setting("MAX_KEEPALIVE_CONNECTIONS"),
+            keepalive_expiry=client_setting("KEEPALIVE_EXPIRY"),
+        ),
+        "timeout": build_timeout(),
+        "headers": {
+            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+            "Content-Type": "application/json"
+        },
+    }
+    options.update(overrides)
+    return httpx.Client(**options)
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """获取进程级共享客户端（fork 后的子进程会重新创建）"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = build_client()
+                _client_pid = pid
+    return _client
+
+
+def _error_message(response):
+    try:
+        return response.json().get("error", {}).get("message", response.text)
+    except ValueError:
+        return response.text
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """包括重试和排队在内的总超时已用完，不再发起调用"""
+
+
+def is_upstream_failure(exc):
+    """网络错误、超时、429 和 5xx 视为上游失败：计入熔断器，调用可以重试"""
+    if isinstance(exc, DeadlineExceeded):
+        return False
+    if isinstance(exc, LLMAPIError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+breaker = CircuitBreaker("deepseek", is_failure=is_upstream_failure)
+
+
+def _deadline(timeout):
+    return time.monotonic() + (timeout or client_setting("TIMEOUT"))
+
+
+def _remaining(deadline):
+    """总超时的剩余秒数；已用完时抛出 DeadlineExceeded"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("DeepSeek call deadline exceeded")
+    return remaining
+
+
+def _post(payload, deadline, endpoint, cancelled=None):
+    """
+    一次上游调用：经过熔断器和准入控制，成功时记录耗时。
+
+    cancelled（对冲调用的另一方已成功）被设置后停止读取响应、关闭连接并抛出 HedgeCancelled；
+    被放弃的调用之后的超时或错误也转为 HedgeCancelled，不计入熔断器。
+    """
+    with breaker.guard():
+        ticket = acquire(endpoint, _remaining(deadline))
+        try:
+            started = time.monotonic()
+            # 准入排队也消耗总超时，发起请求前重新计算剩余时间
+            timeout = build_timeout(_remaining(deadline))
+            with get_client().stream("POST", DEEPSEEK_API_URL, json=payload, timeout=timeout) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise LLMAPIError(response.status_code, _error_message(response))
+                data = _read_json(response, cancelled)
+        except Exception as e:
+            if cancelled is not None and cancelled.is_set() and not isinstance(e, HedgeCancelled):
+                raise HedgeCancelled() from e
+            raise
+        finally:
+            release(ticket)
+    latencies.record(endpoint, time.monotonic() - started)
+    return data
+
+
+def _read_json(response, cancelled):
+    """读取非流式回复；DeepSeek 生成回复期间持续发送空行保活，每收到一段数据检查一次 cancelled"""
+    chunks = []
+    for chunk in response.iter_bytes():
+        if cancelled is not None and cancelled.is_set():
+            raise HedgeCancelled()
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def chat_completion(payload, timeout=None, endpoint=None):
+    """
+    调用 DeepSeek chat/completions，返回解析后的 JSON。
+
+    timeout 是包括重试和准入排队在内的总超时，用完后抛出 DeadlineExceeded（httpx.TimeoutException）；
+    启用对冲的接口（LLM_RESILIENCE["HEDGE_ENDPOINTS"]）慢于 p95 时会再发一次请求。
+    网络错误抛出 httpx.HTTPError，非 2xx 状态码抛出 LLMAPIError，准入被拒绝或熔断时抛出 AdmissionRejected。
+    """
+    deadline = _deadline(timeout)
+
+    def attempt():
+        delay = hedge_delay(endpoint)
+        if delay is None:
+            return _post(payload, deadline, endpoint)
+        return hedged(lambda cancelled: _post(payload, deadline, endpoint, cancelled), delay)
+
+    # chat/completions 没有副作用，失败后可以安全地重试
+    return retry(attempt, is_upstream_failure, deadline)
+
+
+def chat_content(payload, timeout=None, endpoint=None):
+    """调用 DeepSeek 并返回第一条回复的文本内容"""
+    return chat_completion(payload, timeout, endpoint)["choices"][0]["message"]["content"]
+
+
+def stream_chat_content(payload, timeout=None, endpoint=None):
+    """
+    以 stream=True 调用 DeepSeek，逐个产出回复文本增量。
+
+    生成器被关闭（如客户端断开）时，上游连接随之关闭，DeepSeek 侧停止生成。
+    准入租约一直持有到流结束；只有在产出第一个增量之前失败才会重试。
+    """
+    payload = dict(payload, stream=True)
+    deadline = _deadline(timeout)
+    attempt = 1
+    while True:
+        started = False
+        try:
+            with breaker.guard():
+                ticket = acquire(endpoint, _remaining(deadline))
+                try:
+                    for delta in _stream_deltas(payload, _remaining(deadline)):
+                        started = True
+                        yield delta
+                finally:
+                    release(ticket)
+            return
+        except Exception as e:
+            delay = None if started or not is_upstream_failure(e) else retry_delay(attempt, deadline)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+def _stream_deltas(payload, timeout):
+    with get_client().stream("POST", DEEPSEEK_API_URL, json=payload, timeout=build_timeout(timeout)) as response:
+        if response.status_code != 200:
+            response.read()
+            raise LLMAPIError(response.status_code, _error_message(response))
+        for line in response.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            choices = chunk.get("choices") or [{}]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
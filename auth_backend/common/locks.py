@@ -0,0 +1,54 @@
+"""
+带持有者标识的缓存锁（CACHES["default"]）。
+
+cache.add（SET NX EX）抢占锁，值为持有者的随机整数标识（django-redis 原样存储整数，Lua 脚本可以直接比较）；
+释放时用 Lua 脚本原子地比较并删除，锁已过期并被其他请求抢占时不会误删。
+缓存后端不是 Redis 时（本地开发、测试）退化为先读后删。
+"""
+import logging
+import uuid
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# KEYS: 锁；ARGV: 持有者标识；返回 1 表示已释放，0 表示锁已不属于该持有者
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_script = None
+
+
+def new_token():
+    """锁持有者的随机标识"""
+    return uuid.uuid4().int >> 66
+
+
+def acquire_lock(key, token, timeout):
+    """抢占锁，成功返回 True"""
+    return cache.add(key, token, timeout=timeout)
+
+
+def release_lock(key, token):
+    """只在锁仍由 token 持有时释放，返回是否释放"""
+    global _release_script
+    try:
+        client = get_redis_connection("default")
+    except NotImplementedError:
+        if cache.get(key) != token:
+            return False
+        cache.delete(key)
+        return True
+    try:
+        if _release_script is None:
+            _release_script = client.register_script(RELEASE_SCRIPT)
+        return bool(_release_script(keys=[cache.make_key(key)], args=[token], client=client))
+    except RedisError as e:
+        logger.warning("释放锁失败，将在超时后自动释放: %s", e)
+        return False
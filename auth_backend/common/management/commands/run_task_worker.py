@@ -0,0 +1,43 @@
+"""
+运行异步任务 worker：执行 ?async=1 提交的 LLM 任务（见 common.tasks）。
+
+与 Web 进程分开部署，可以在多台主机上运行多个实例，共用同一个 Redis 队列。
+收到 SIGTERM / SIGINT 后不再认领新任务，等正在执行的任务完成后退出；
+被强制终止时，未完成任务的租约过期后由其他 worker 重新执行。
+
+用法:
+    python manage.py run_task_worker
+    python manage.py run_task_worker --workers 8
+"""
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from common.tasks import run_workers, task_setting
+
+
+class Command(BaseCommand):
+    help = '运行异步任务 worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='工作线程数（默认 TASK_QUEUE["WORKERS"]）')
+
+    def handle(self, *args, **options):
+        count = options['workers'] or task_setting("WORKERS")
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("正在停止：等待执行中的任务完成")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        workers = run_workers(count, stop_event)
+        self.stdout.write(self.style.SUCCESS(f"已启动 {count} 个任务工作线程"))
+        # 主线程需要留在前台接收信号
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(timeout=1)
+        self.stdout.write(self.style.SUCCESS("任务 worker 已停止"))
@@ -1,6 +1,6 @@
 # 在适当的位置创建文件，例如 common/parsers.py
 import json
-from rest_framework.parsers import BaseParser
+from rest_framework.parsers import BaseParser, JSONParser
 from rest_framework.exceptions import ParseError
 
 class PlainTextJSONParser(BaseParser):
@@ -26,4 +26,10 @@ class PlainTextJSONParser(BaseParser):
         except UnicodeDecodeError:
             raise ParseError('Invalid text encoding')
         except Exception as e:
-            raise ParseError(f'Parse error: {str(e)}')
\ No newline at end of file
+            raise ParseError(f'Parse error: {str(e)}')
+
+class JSONPatchParser(JSONParser):
+    """
+    JSON Patch 请求体（application/json-patch+json）
+    """
+    media_type = 'application/json-patch+json'
@@ -0,0 +1,86 @@
+"""
+岗位推荐结果缓存：以“简历指纹 + 岗位目录版本”为键做内容寻址。
+
+- 简历指纹只取进入推荐提示词和岗位粗排的字段，内容相同的简历共享同一条缓存；
+- 岗位目录版本变化后旧键自然失效，无需手动清理；
+- 另存一份 user_id -> 指纹 的指针，命中时无需读取 Firestore 中的简历。
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from jobcenter.ranking import ranking_profile
+
+DEFAULT_RECOMMENDATION_CACHE_SETTINGS = {
+    "TTL": 60 * 60 * 2,
+}
+
+
+def recommendation_cache_setting(name):
+    return getattr(settings, 'RECOMMENDATION_CACHE', {}).get(name, DEFAULT_RECOMMENDATION_CACHE_SETTINGS[name])
+
+
+def build_resume_info(resume_data):
+    """提取进入推荐提示词的简历字段"""
+    resume_data = resume_data or {}
+    return {
+        "skills": resume_data.get("skills", []),
+        "experience": resume_data.get("experience", "Not specified"),
+        "education": resume_data.get("education", "Not specified"),
+        "honors": resume_data.get("honors", "Not specified"),
+        "preferred_location": resume_data.get("preferred_location", "Not specified"),
+        "expected_salary": resume_data.get("expected_salary", "Not specified")
+    }
+
+
+def resume_fingerprint(resume_data):
+    """计算简历指纹（规范化 JSON 的 SHA-256）"""
+    canonical = json.dumps(
+        {"prompt": build_resume_info(resume_data), "ranking": ranking_profile(resume_data)},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(',', ':'),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def recommendation_key(fingerprint, catalog_version):
+    return f"job_recommendations_{fingerprint}_{catalog_version}"
+
+
+def _pointer_key(user_id):
+    return f"resume_fingerprint_{user_id}"
+
+
+def get_user_fingerprint(user_id):
+    """读取用户当前简历的指纹（未知时返回 None）"""
+    return cache.get(_pointer_key(user_id))
+
+
+def remember_resume(user_id, resume_data):
+    """简历写入后更新指纹指针，返回新指纹"""
+    fingerprint = resume_fingerprint(resume_data)
+    cache.set(_pointer_key(user_id), fingerprint, timeout=recommendation_cache_setting("TTL"))
+    return fingerprint
+
+
+def forget_resume(user_id):
+    """简历删除后移除指纹指针"""
+    cache.delete(_pointer_key(user_id))
+
+
+def get_recommendations(fingerprint, catalog_version):
+    if not fingerprint or not catalog_version:
+        return None
+    return cache.get(recommendation_key(fingerprint, catalog_version))
+
+
+def set_recommendations(fingerprint, catalog_version, recommended_jobs):
+    cache.set(
+        recommendation_key(fingerprint, catalog_version),
+        recommended_jobs,
+        timeout=recommendation_cache_setting("TTL")
+    )
@@ -0,0 +1,265 @@
+"""
+上游调用的容错：熔断器、带抖动的重试退避和对冲请求。
+
+- 熔断器（进程内）：连续 FAILURE_THRESHOLD 次上游失败后打开，RESET_TIMEOUT 秒内的调用直接抛出 CircuitOpen，
+  不再等待超时；之后进入半开状态，放行 HALF_OPEN_MAX_CALLS 个试探调用，成功则关闭，失败则重新打开；
+- 重试：幂等调用遇到可重试的错误时按 min(BACKOFF_MAX, BACKOFF_BASE * 2^n) 的上限随机退避（full jitter），
+  所有尝试共用调用方给出的总超时，剩余时间不足 MIN_ATTEMPT_TIMEOUT 时不再重试；
+- 对冲：调用在该接口最近成功耗时的 HEDGE_QUANTILE 分位（样本不足时为 HEDGE_DEFAULT_DELAY）内没有返回时，
+  再发起一次相同的调用，采用先成功的结果。两次调用都在各自的后台线程中执行，调用方拿到结果立即返回，
+  落后的一方收到取消信号后停止读取并关闭连接，不计入熔断器。
+
+配置见 settings.LLM_RESILIENCE。各熔断器的状态由 breaker_states() 汇总，在 /api/health 中暴露。
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from common.admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESILIENCE_SETTINGS = {
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30,
+    "HALF_OPEN_MAX_CALLS": 1,
+    "MAX_ATTEMPTS": 3,
+    "BACKOFF_BASE": 0.5,
+    "BACKOFF_MAX": 8,
+    "MIN_ATTEMPT_TIMEOUT": 5,
+    "HEDGE_ENDPOINTS": [],
+    "HEDGE_QUANTILE": 0.95,
+    "HEDGE_MIN_SAMPLES": 20,
+    "HEDGE_DEFAULT_DELAY": 5,
+    "LATENCY_WINDOW": 200,
+}
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+def resilience_setting(name):
+    return getattr(settings, 'LLM_RESILIENCE', {}).get(name, DEFAULT_RESILIENCE_SETTINGS[name])
+
+
+class CircuitOpen(AdmissionRejected):
+    """熔断器打开，调用直接失败，retry_after 秒后再试"""
+
+    status_code = 503
+
+    def __str__(self):
+        return f"Circuit breaker '{self.endpoint}' is open, retry after {self.retry_after}s"
+
+    def response_data(self):
+        return {'error': 'AI service is temporarily unavailable, please retry later', 'retry_after': self.retry_after}
+
+
+_breakers = {}
+
+
+class CircuitBreaker:
+    """
+    进程内的熔断器。
+
+    is_failure(exc) 判断异常是否算作上游失败；其他异常（如 4xx、准入被拒绝、客户端断开）不影响状态。
+    """
+
+    def __init__(self, name, is_failure):
+        self.name = name
+        self.is_failure = is_failure
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trials = 0
+        self._counts = Counter()
+        _breakers[name] = self
+
+    def _current_state(self):
+        # 调用方持有 self._lock
+        if self._state == OPEN and time.monotonic() - self._opened_at >= resilience_setting("RESET_TIMEOUT"):
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+    def _retry_after(self):
+        if self._state != OPEN:
+            return 1
+        return resilience_setting("RESET_TIMEOUT") - (time.monotonic() - self._opened_at)
+
+    def _admit(self):
+        """放行一次调用，返回是否为半开状态的试探调用；熔断时抛出 CircuitOpen"""
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._trials >= resilience_setting("HALF_OPEN_MAX_CALLS")):
+                self._counts['rejected'] += 1
+                raise CircuitOpen(self.name, self._retry_after())
+            if state == HALF_OPEN:
+                self._trials += 1
+                return True
+            return False
+
+    def _finish(self, trial, succeeded):
+        """记录调用结果：succeeded 为 None 表示不计入"""
+        with self._lock:
+            if trial:
+                self._trials -= 1
+            if succeeded is None:
+                return
+            if succeeded:
+                self._counts['successes'] += 1
+                self._failures = 0
+                if self._state == HALF_OPEN:
+                    self._state = CLOSED
+                    logger.info("熔断器 %s 已恢复", self.name)
+                return
+            self._counts['failures'] += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= resilience_setting("FAILURE_THRESHOLD"):
+                if self._state != OPEN:
+                    logger.warning("熔断器 %s 打开：连续失败 %d 次", self.name, self._failures)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self):
+        """包裹一次上游调用（可跨越生成器的 yield）"""
+        trial = self._admit()
+        succeeded = None
+        try:
+            yield
+            succeeded = True
+        except Exception as e:
+            if self.is_failure(e):
+                succeeded = False
+            raise
+        finally:
+            self._finish(trial, succeeded)
+
+    def status(self):
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_after": round(max(0, self._retry_after()), 1) if state == OPEN else None,
+                **{event: self._counts[event] for event in ('successes', 'failures', 'rejected')},
+            }
+
+
+def breaker_states():
+    """本进程各熔断器的状态"""
+    return {name: breaker.status() for name, breaker in sorted(_breakers.items())}
+
+
+def retry_delay(attempt, deadline):
+    """第 attempt 次尝试失败后的退避时间；不应再重试时返回 None"""
+    if attempt >= resilience_setting("MAX_ATTEMPTS"):
+        return None
+    cap = min(resilience_setting("BACKOFF_MAX"), resilience_setting("BACKOFF_BASE") * 2 ** (attempt - 1))
+    delay = random.uniform(0, cap)
+    if deadline - time.monotonic() - delay < resilience_setting("MIN_ATTEMPT_TIMEOUT"):
+        return None
+    return delay
+
+
+def retry(call, is_retryable, deadline):
+    """执行 call()，可重试的错误按带抖动的指数退避重试，直到成功、次数用完或剩余时间不足"""
+    attempt = 1
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            delay = retry_delay(attempt, deadline) if is_retryable(e) else None
+            if delay is None:
+                raise
+            logger.info("上游调用失败，%.2f 秒后第 %d 次重试: %s", delay, attempt + 1, e)
+        time.sleep(delay)
+        attempt += 1
+
+
+class LatencyTracker:
+    """各接口最近 LATENCY_WINDOW 次成功调用的耗时（进程内），用于估算对冲延迟"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=resilience_setting("LATENCY_WINDOW")))
+
+    def record(self, key, seconds):
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def quantile(self, key, q):
+        """耗时的 q 分位；样本少于 HEDGE_MIN_SAMPLES 时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples[key])
+        if len(samples) < resilience_setting("HEDGE_MIN_SAMPLES"):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+latencies = LatencyTracker()
+
+
+def hedge_delay(endpoint):
+    """对冲延迟；该接口未启用对冲时返回 None"""
+    if endpoint not in resilience_setting("HEDGE_ENDPOINTS"):
+        return None
+    delay = latencies.quantile(endpoint, resilience_setting("HEDGE_QUANTILE"))
+    return delay if delay is not None else resilience_setting("HEDGE_DEFAULT_DELAY")
+
+
+class HedgeCancelled(Exception):
+    """对冲调用的另一方已经成功，本次调用被放弃"""
+
+
+def _start(call, cancelled):
+    """在新的后台线程中执行 call(cancelled)，返回对应的 Future"""
+    future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(call(cancelled))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="llm-hedge", daemon=True).start()
+    return future
+
+
+def hedged(call, delay):
+    """
+    在后台线程中执行 call(cancelled)，delay 秒内未完成时再并发执行一次，返回先成功的结果；
+    两次都失败时抛出后失败的异常。
+
+    cancelled 是 threading.Event，调用方返回时设置所有未结束调用的事件：call 应在读取响应的间隙检查它，
+    关闭连接并抛出 HedgeCancelled。调用方不等待落后的一方，它最晚在自身超时后结束。
+    """
+    events = {}
+
+    def launch():
+        cancelled = threading.Event()
+        future = _start(call, cancelled)
+        events[future] = cancelled
+        return future
+
+    done, pending = wait({launch()}, timeout=delay)
+    if not done:
+        pending.add(launch())
+    try:
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+            if not pending:
+                raise future.exception()
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    finally:
+        for future in pending:
+            events[future].set()
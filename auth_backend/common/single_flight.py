@@ -0,0 +1,92 @@
+"""
+跨进程的 single-flight：同一个键同时只有一个请求真正执行计算，其余请求等待并复用其结果。
+
+基于 CACHES["default"]（Redis）实现：
+- cache.add（SET NX EX）抢占锁，锁带超时，持锁进程崩溃后锁会自动过期；释放时原子地比较持有者（common.locks），
+  不会删除过期后被其他请求抢占的锁；
+- 领头请求算完后把结果写入短期结果键，等待者轮询该键；
+- 锁被释放/过期却没有结果（领头请求失败或进程退出）时，等待者接手重新计算；
+- 等待超过 WAIT_TIMEOUT 或缓存不可用时，直接自行计算，保证不会无限等待。
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.locks import acquire_lock, new_token, release_lock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SINGLE_FLIGHT_SETTINGS = {
+    "LOCK_TIMEOUT": 90,
+    "WAIT_TIMEOUT": 90,
+    "RESULT_TTL": 60,
+    "POLL_INTERVAL": 0.2,
+}
+
+# 连续多少次既抢不到锁、又看不到锁时，视为缓存不可用
+MAX_LOCK_ATTEMPTS = 3
+
+
+def single_flight_setting(name):
+    return getattr(settings, 'SINGLE_FLIGHT', {}).get(name, DEFAULT_SINGLE_FLIGHT_SETTINGS[name])
+
+
+def _lock_key(key):
+    return f"single_flight_lock_{key}"
+
+
+def _result_key(key):
+    return f"single_flight_result_{key}"
+
+
+def single_flight(key, compute):
+    """对 key 执行去重计算，返回 compute() 的结果（可能来自并发的其他请求）"""
+    lock_key, result_key = _lock_key(key), _result_key(key)
+    deadline = time.monotonic() + single_flight_setting("WAIT_TIMEOUT")
+    poll_interval = single_flight_setting("POLL_INTERVAL")
+    attempts = 0
+
+    while True:
+        token = new_token()
+        if acquire_lock(lock_key, token, single_flight_setting("LOCK_TIMEOUT")):
+            return _lead(lock_key, result_key, token, compute)
+
+        if cache.get(lock_key) is None:
+            # 锁刚被释放，或缓存不可用（IGNORE_EXCEPTIONS 下 add/get 都返回空）
+            attempts += 1
+            stored = cache.get(result_key)
+            if stored is not None:
+                return stored[0]
+            if attempts >= MAX_LOCK_ATTEMPTS:
+                return compute()
+            continue
+
+        # 等待领头请求
+        while time.monotonic() < deadline:
+            stored = cache.get(result_key)
+            if stored is not None:
+                return stored[0]
+            if cache.get(lock_key) is None:
+                break
+            time.sleep(poll_interval)
+        else:
+            logger.warning("single-flight 等待超时，自行计算: %s", key)
+            return compute()
+
+        stored = cache.get(result_key)
+        if stored is not None:
+            return stored[0]
+        # 锁已释放但没有结果：领头请求失败，接手重新计算
+
+
+def _lead(lock_key, result_key, token, compute):
+    try:
+        result = compute()
+        # 包一层元组，以便区分“结果为 None”和“尚无结果”
+        cache.set(result_key, (result,), timeout=single_flight_setting("RESULT_TTL"))
+        return result
+    finally:
+        # 只释放自己持有的锁（锁可能已过期并被其他请求抢占）
+        release_lock(lock_key, token)
@@ -0,0 +1,86 @@
+"""
+Server-Sent Events 响应工具。
+
+WSGI 下直接返回同步生成器，每个事件写出后立即刷新；
+ASGI 下包装为异步迭代器（Django 对同步迭代器会先整体缓冲再发送）。
+客户端断开时服务器关闭响应，生成器随之被关闭，调用方可在 finally 中释放上游连接。
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+def sse_event(data, event=None):
+    """编码单个 SSE 事件"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+    lines.extend(f"data: {line}" for line in payload.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def wants_event_stream(request):
+    """请求是否要求流式返回（stream=true 参数或 Accept: text/event-stream）"""
+    flag = request.query_params.get('stream') or request.data.get('stream')
+    if str(flag).lower() in ('1', 'true', 'yes'):
+        return True
+    return 'text/event-stream' in request.META.get('HTTP_ACCEPT', '')
+
+
+async def _aiterate(iterator):
+    """在线程池中逐个拉取同步迭代器，转为异步迭代器"""
+    sentinel = object()
+    pull = sync_to_async(lambda: next(iterator, sentinel), thread_sensitive=False)
+    try:
+        while True:
+            item = await pull()
+            if item is sentinel:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=False)()
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """响应关闭时执行 on_close（只执行一次）；客户端在第一个事件之前断开、生成器从未启动时同样会执行"""
+
+    def __init__(self, *args, on_close=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            on_close, self.on_close = self.on_close, None
+            if on_close is not None:
+                on_close()
+
+
+def event_stream_response(request, events, on_close=None):
+    """
+    将事件迭代器包装为 text/event-stream 响应。
+
+    request 为 DRF Request 或 Django HttpRequest；events 产出已编码的 SSE 字符串。
+    需要在流结束后释放的资源（如锁）通过 on_close 释放，不要放在生成器的 finally 中：
+    未启动的生成器被关闭时不会执行 finally。
+    """
+    django_request = getattr(request, '_request', request)
+    # 先发送一条注释，让客户端和代理立即收到响应头
+    events = _prepend(": stream-start\n\n", events)
+    content = _aiterate(events) if isinstance(django_request, ASGIRequest) else events
+    response = EventStreamResponse(content, content_type='text/event-stream; charset=utf-8', on_close=on_close)
+    response['Cache-Control'] = 'no-cache'
+    # 关闭 Nginx 等反向代理的响应缓冲
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _prepend(first, iterator):
+    yield first
+    yield from iterator
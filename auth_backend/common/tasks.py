@@ -0,0 +1,350 @@
+"""
+耗时 LLM 接口的异步任务模式。
+
+请求带 ?async=1（或请求体 "async": true、请求头 Prefer: respond-async）时，
+视图只把任务放入 Redis 队列并立即返回 202 + task_id，
+客户端通过 GET /api/tasks/<task_id> 轮询状态和结果。
+
+任务由独立的 worker 进程执行（python manage.py run_task_worker），不占用 Web 进程。
+任务执行的是与同步模式相同的业务函数 service(user_id, data)，返回的响应数据和状态码原样作为结果；
+视图在入队前已完成认证、限流和请求解析，worker 不再经过视图。
+
+队列的可靠性（均为 Redis 原生键，时间取 Redis 服务器时间）：
+- worker 用 BLMOVE 把待执行队列（列表）中的任务原子地移入处理中列表，随后登记租约（有序集合，分值为到期时间）；
+- 执行结束（成功、失败或安排重试）后确认，从处理中列表和租约中移除；
+- worker 崩溃或卡死时租约过期，回收（reap）后任务回到待执行队列，由其他 worker 重新执行；
+- 异常、5xx 或 429（DeepSeek 准入被拒绝）结果按 MAX_RETRIES 重试：任务放入延迟集合（分值为到期时间），
+  到期后再移回待执行队列，worker 线程不会因退避而等待。
+
+任务记录（状态、结果）存放在缓存中，RESULT_TTL 后过期。
+"""
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TASK_SETTINGS = {
+    "WORKERS": 4,
+    "MAX_RETRIES": 2,
+    "RETRY_BACKOFF": 2,
+    "RESULT_TTL": 60 * 60,
+    "POLL_TIMEOUT": 5,
+    "LEASE_TIMEOUT": 5 * 60,
+    "REAP_INTERVAL": 10,
+}
+
+QUEUED, RUNNING, RETRYING, SUCCEEDED, FAILED = 'queued', 'running', 'retrying', 'succeeded', 'failed'
+
+# KEYS: 处理中列表, 租约集合, 租约持有者；ARGV: 任务 ID, 租约时长, worker 标识
+LEASE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[3])
+return 1
+"""
+
+# KEYS: 处理中列表, 租约集合, 租约持有者, 延迟集合；ARGV: 任务 ID, worker 标识, 重试延迟（秒，空表示不重试）
+# 租约已被回收并交给其他 worker 时返回 0，不做任何修改
+ACK_SCRIPT = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if ARGV[3] ~= '' then
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    redis.call('ZADD', KEYS[4], now + tonumber(ARGV[3]), ARGV[1])
+end
+return 1
+"""
+
+# KEYS: 待执行队列, 处理中列表, 租约集合, 租约持有者, 延迟集合；ARGV: 租约时长（秒）, 单次处理上限
+# 把到期的延迟任务和租约过期的任务移回待执行队列，返回被回收的任务 ID。
+# 已移入处理中列表、但 worker 还没来得及登记租约的任务先补登一个租约，
+# worker 随后登记的租约会覆盖它；worker 在这之间崩溃时，任务在补登的租约到期后被回收。
+REAP_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local limit = tonumber(ARGV[2])
+
+local due = redis.call('ZRANGEBYSCORE', KEYS[5], '-inf', now, 'LIMIT', 0, limit)
+for _, id in ipairs(due) do
+    redis.call('ZREM', KEYS[5], id)
+    redis.call('RPUSH', KEYS[1], id)
+end
+
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, limit)
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[3], id)
+    redis.call('HDEL', KEYS[4], id)
+    if redis.call('LREM', KEYS[2], 1, id) > 0 then
+        redis.call('RPUSH', KEYS[1], id)
+    end
+end
+
+for _, id in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+    if not redis.call('ZSCORE', KEYS[3], id) then
+        redis.call('ZADD', KEYS[3], now + tonumber(ARGV[1]), id)
+    end
+end
+return expired
+"""
+
+
+def task_setting(name):
+    return getattr(settings, 'TASK_QUEUE', {}).get(name, DEFAULT_TASK_SETTINGS[name])
+
+
+def _record_key(task_id):
+    return f"task_{task_id}"
+
+
+# 原生 Redis 命令不会自动加 KEY_PREFIX，这里与缓存键保持同一前缀
+def _queue_key():
+    return cache.make_key("task_queue")
+
+
+def _processing_key():
+    return cache.make_key("task_processing")
+
+
+def _leases_key():
+    return cache.make_key("task_leases")
+
+
+def _owners_key():
+    return cache.make_key("task_lease_owners")
+
+
+def _delayed_key():
+    return cache.make_key("task_delayed")
+
+
+def get_task(task_id):
+    return cache.get(_record_key(task_id))
+
+
+def _save(record):
+    cache.set(_record_key(record['id']), record, timeout=task_setting("RESULT_TTL"))
+
+
+def wants_async(request):
+    """请求是否要求以异步任务方式执行"""
+    flag = request.query_params.get('async') or request.data.get('async')
+    if str(flag).lower() in ('1', 'true', 'yes'):
+        return True
+    return 'respond-async' in request.META.get('HTTP_PREFER', '')
+
+
+def enqueue(service_path, user_id, data):
+    """创建任务记录并放入队列，返回任务记录"""
+    record = {
+        "id": uuid.uuid4().hex,
+        "service": service_path,
+        "owner": user_id,
+        "data": data,
+        "status": QUEUED,
+        "attempts": 0,
+        "created_at": time.time(),
+        "finished_at": None,
+        "result": None,
+        "result_status": None,
+        "error": None,
+    }
+    _save(record)
+    get_redis_connection("default").rpush(_queue_key(), record['id'])
+    return record
+
+
+def run_task(record):
+    """执行任务对应的业务函数，返回 (响应数据, 状态码)"""
+    service = import_string(record['service'])
+    response = service(record['owner'], record['data'])
+    return response.data, response.status_code
+
+
+class TaskWorker:
+    """从队列认领并执行任务（一个实例对应一个 worker 线程）"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.client = get_redis_connection("default")
+        self.lease_script = self.client.register_script(LEASE_SCRIPT)
+        self.ack_script = self.client.register_script(ACK_SCRIPT)
+        self.reap_script = self.client.register_script(REAP_SCRIPT)
+        self.last_reaped = 0
+
+    def claim(self):
+        """阻塞等待并认领一个任务，返回任务 ID；超时返回 None"""
+        task_id = self.client.blmove(_queue_key(), _processing_key(), task_setting("POLL_TIMEOUT"), "LEFT", "RIGHT")
+        if task_id is None:
+            return None
+        task_id = task_id.decode('utf-8') if isinstance(task_id, bytes) else task_id
+        self.lease_script(
+            keys=[_processing_key(), _leases_key(), _owners_key()],
+            args=[task_id, task_setting("LEASE_TIMEOUT"), self.id],
+        )
+        return task_id
+
+    def ack(self, task_id, retry_delay=None):
+        """确认任务已处理；retry_delay 不为 None 时在该延迟后重新执行。租约已被回收时返回 False"""
+        acked = self.ack_script(
+            keys=[_processing_key(), _leases_key(), _owners_key(), _delayed_key()],
+            args=[task_id, self.id, '' if retry_delay is None else retry_delay],
+        )
+        if not acked:
+            logger.warning("任务 %s 的租约已过期并被回收，本次结果可能被重新执行的结果覆盖", task_id)
+        return bool(acked)
+
+    def reap(self):
+        """把到期的重试任务和租约过期的任务移回待执行队列（每 REAP_INTERVAL 秒最多一次）"""
+        if time.monotonic() - self.last_reaped < task_setting("REAP_INTERVAL"):
+            return
+        self.last_reaped = time.monotonic()
+        expired = self.reap_script(
+            keys=[_queue_key(), _processing_key(), _leases_key(), _owners_key(), _delayed_key()],
+            args=[task_setting("LEASE_TIMEOUT"), 100],
+        )
+        for task_id in expired:
+            task_id = task_id.decode('utf-8') if isinstance(task_id, bytes) else task_id
+            logger.warning("任务 %s 的租约已过期（worker 崩溃或超时），重新放回队列", task_id)
+            record = get_task(task_id)
+            if record is not None and record['status'] == RUNNING:
+                record['status'] = QUEUED
+                _save(record)
+
+    def process(self, task_id):
+        record = get_task(task_id)
+        if record is None:
+            # 任务记录已过期
+            self.ack(task_id)
+            return
+        if record['status'] in (SUCCEEDED, FAILED):
+            # 租约过期后被重复投递，而原 worker 已经完成
+            self.ack(task_id)
+            return
+        if record['attempts'] > task_setting("MAX_RETRIES"):
+            # 已用完重试次数的任务又被回收（worker 多次在执行中途崩溃）
+            record.update({"status": FAILED, "error": record['error'] or 'Task worker lost', "finished_at": time.time()})
+            _save(record)
+            self.ack(task_id)
+            return
+
+        record['status'] = RUNNING
+        record['attempts'] += 1
+        _save(record)
+        backoff = task_setting("RETRY_BACKOFF") * record['attempts']
+        try:
+            data, status_code = run_task(record)
+            error = None
+            if status_code >= 500 or status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+                error = data.get('error', 'Server error') if isinstance(data, dict) else 'Server error'
+            if error is not None and isinstance(data, dict):
+                # 429（准入被拒绝）和 503（熔断）响应带有 retry_after
+                backoff = max(backoff, data.get('retry_after', 0))
+        except Exception as e:
+            logger.exception("任务 %s 执行出错", task_id)
+            data, status_code, error = None, status.HTTP_500_INTERNAL_SERVER_ERROR, str(e)
+
+        if error is not None and record['attempts'] <= task_setting("MAX_RETRIES"):
+            record['status'] = RETRYING
+            record['error'] = error
+            _save(record)
+            self.ack(task_id, retry_delay=backoff)
+            return
+
+        record.update({
+            "status": FAILED if error is not None else SUCCEEDED,
+            "result": data,
+            "result_status": status_code,
+            "error": error,
+            "finished_at": time.time(),
+        })
+        _save(record)
+        self.ack(task_id)
+
+    def run(self, stop_event=None):
+        """循环认领并执行任务，直到 stop_event 被设置"""
+        while stop_event is None or not stop_event.is_set():
+            try:
+                self.reap()
+                task_id = self.claim()
+                if task_id is not None:
+                    self.process(task_id)
+            except RedisError as e:
+                logger.warning("任务队列不可用，稍后重试: %s", e)
+                time.sleep(1)
+            except Exception as e:
+                logger.exception("任务执行线程出错: %s", e)
+                time.sleep(1)
+
+
+def run_workers(count, stop_event):
+    """在当前进程中启动 count 个 worker 线程，返回线程列表"""
+    workers = []
+    for i in range(count):
+        worker = threading.Thread(target=TaskWorker().run, args=(stop_event,), name=f"llm-task-worker-{i}")
+        worker.start()
+        workers.append(worker)
+    return workers
+
+
+class AsyncTaskMixin:
+    """为视图（同步或异步）增加异步任务模式：post() 中调用 run_or_enqueue()"""
+
+    def should_enqueue(self, request):
+        """请求是否可以入队；参数明显不合法的请求直接同步返回错误"""
+        return True
+
+    def run_or_enqueue(self, request, service, /, **kwargs):
+        """请求要求异步执行时入队并返回 202 响应，否则直接返回 service(user_id, data, **kwargs)"""
+        enqueued = self.maybe_enqueue(request, service)
+        if enqueued is not None:
+            return enqueued
+        return service(self.user_id, request.data, **kwargs)
+
+    def maybe_enqueue(self, request, service):
+        """请求要求异步执行时把 service(user_id, data) 入队并返回 202 响应，否则返回 None"""
+        if not wants_async(request) or not self.should_enqueue(request):
+            return None
+        data = {k: v for k, v in request.data.items() if k not in ('async', 'stream')}
+        try:
+            record = enqueue(f"{service.__module__}.{service.__name__}", self.user_id, data)
+        except RedisError as e:
+            logger.warning("任务入队失败: %s", e)
+            return Response({'error': 'Task queue is unavailable, please retry later'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        response = Response({
+            "task_id": record['id'],
+            "status": record['status'],
+            "status_url": f"/api/tasks/{record['id']}",
+        }, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = f"/api/tasks/{record['id']}"
+        return response
+
+
+def task_status(record):
+    """任务状态的对外表示"""
+    return {
+        "task_id": record['id'],
+        "status": record['status'],
+        "attempts": record['attempts'],
+        "created_at": record['created_at'],
+        "finished_at": record['finished_at'],
+        "result": record['result'],
+        "result_status": record['result_status'],
+        "error": record['error'],
+    }
@@ -0,0 +1,425 @@
+import os
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django_redis import get_redis_connection
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from resume.views import SimpleUser
+from . import resilience, tasks
+from .locks import acquire_lock, new_token, release_lock
+from .resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, HedgeCancelled, hedged, retry
+from .tasks import FAILED, QUEUED, RETRYING, RUNNING, SUCCEEDED, TaskWorker, enqueue, get_task
+from .views import TaskStatusView
+
+
+try:
+    import fakeredis
+except ImportError:  # 开发依赖 fakeredis[lua]；也可以用 REDIS_TEST_URL 指定本地 Redis
+    fakeredis = None
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL")
+_fake_server = fakeredis.FakeServer() if fakeredis else None
+
+
+def redis_caches():
+    """测试用的 Redis 缓存配置：REDIS_TEST_URL 指定的本地 Redis，否则为 fakeredis（支持 Lua 脚本）"""
+    options = {}
+    if not REDIS_TEST_URL:
+        options["CONNECTION_POOL_KWARGS"] = {"connection_class": fakeredis.FakeConnection, "server": _fake_server}
+    return {"default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": REDIS_TEST_URL or "redis://fakeredis:6379/0",
+        "KEY_PREFIX": "test",
+        "OPTIONS": options,
+    }}
+
+
+@skipUnless(REDIS_TEST_URL or fakeredis, "需要 fakeredis[lua] 或 REDIS_TEST_URL")
+class RedisTestCase(SimpleTestCase):
+    """使用 Redis 缓存后端的测试（Lua 脚本、阻塞命令等）"""
+
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(CACHES=redis_caches())
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.redis = get_redis_connection("default")
+        self.redis.flushdb()
+
+
+class LockTests(RedisTestCase):
+    """锁只能由持有者释放"""
+
+    def test_owner_releases_the_lock(self):
+        token = new_token()
+        self.assertTrue(acquire_lock("lock", token, 10))
+        self.assertFalse(acquire_lock("lock", new_token(), 10))
+        self.assertTrue(release_lock("lock", token))
+        self.assertIsNone(cache.get("lock"))
+
+    def test_expired_lock_taken_by_another_owner_is_kept(self):
+        first, second = new_token(), new_token()
+        acquire_lock("lock", first, 10)
+        # 模拟锁过期后被其他请求抢占
+        cache.delete("lock")
+        acquire_lock("lock", second, 10)
+        self.assertFalse(release_lock("lock", first))
+        self.assertEqual(cache.get("lock"), second)
+
+    def test_missing_lock(self):
+        self.assertFalse(release_lock("lock", new_token()))
+
+
+def echo_service(user_id, data):
+    """任务测试用的业务函数"""
+    return Response({"user": user_id, **data}, status=data.get("status", 200))
+
+
+ECHO_SERVICE = f"{__name__}.echo_service"
+
+
+@override_settings(TASK_QUEUE={"MAX_RETRIES": 1, "RETRY_BACKOFF": 0, "POLL_TIMEOUT": 1,
+                               "LEASE_TIMEOUT": 60, "REAP_INTERVAL": 0})
+class TaskQueueTests(RedisTestCase):
+    """任务队列：认领、完成、失败重试和回收过期租约"""
+
+    def setUp(self):
+        super().setUp()
+        self.worker = TaskWorker()
+
+    def members(self, key_func):
+        return [m.decode() for m in self.redis.lrange(key_func(), 0, -1)]
+
+    def assert_settled(self):
+        """任务已确认：不在处理中列表，也没有租约"""
+        self.assertEqual(self.members(tasks._processing_key), [])
+        self.assertEqual(self.redis.zcard(tasks._leases_key()), 0)
+        self.assertEqual(self.redis.hlen(tasks._owners_key()), 0)
+
+    def test_claim_moves_the_task_and_takes_a_lease(self):
+        record = enqueue(ECHO_SERVICE, "u1", {"q": 1})
+        self.assertEqual(get_task(record["id"])["status"], QUEUED)
+        self.assertEqual(self.worker.claim(), record["id"])
+        self.assertEqual(self.members(tasks._queue_key), [])
+        self.assertEqual(self.members(tasks._processing_key), [record["id"]])
+        now = float(self.redis.time()[0])
+        self.assertAlmostEqual(self.redis.zscore(tasks._leases_key(), record["id"]), now + 60, delta=2)
+        self.assertEqual(self.redis.hget(tasks._owners_key(), record["id"]).decode(), self.worker.id)
+
+    def test_claim_times_out_on_an_empty_queue(self):
+        self.assertIsNone(self.worker.claim())
+
+    def test_completed_task_stores_the_result_and_is_acked(self):
+        record = enqueue(ECHO_SERVICE, "u1", {"q": 1})
+        self.worker.process(self.worker.claim())
+        record = get_task(record["id"])
+        self.assertEqual(record["status"], SUCCEEDED)
+        self.assertEqual((record["result"], record["result_status"]), ({"user": "u1", "q": 1}, 200))
+        self.assertEqual(record["attempts"], 1)
+        self.assert_settled()
+
+    def test_failure_is_retried_after_the_backoff(self):
+        record = enqueue(ECHO_SERVICE, "u1", {})
+        with mock.patch("common.tasks.run_task", side_effect=[RuntimeError("boom"), ({"ok": True}, 200)]):
+            with self.assertLogs("common.tasks", "ERROR"):
+                self.worker.process(self.worker.claim())
+            retrying = get_task(record["id"])
+            self.assertEqual((retrying["status"], retrying["error"]), (RETRYING, "boom"))
+            self.assertEqual(self.redis.zrange(tasks._delayed_key(), 0, -1), [record["id"].encode()])
+            self.assert_settled()
+
+            # 到期的重试任务被移回待执行队列
+            self.worker.reap()
+            self.assertEqual(self.members(tasks._queue_key), [record["id"]])
+            self.worker.process(self.worker.claim())
+
+        record = get_task(record["id"])
+        self.assertEqual((record["status"], record["attempts"], record["result"]), (SUCCEEDED, 2, {"ok": True}))
+        self.assertEqual(self.redis.zcard(tasks._delayed_key()), 0)
+
+    def test_server_errors_fail_after_max_retries(self):
+        record = enqueue(ECHO_SERVICE, "u1", {"status": 503, "retry_after": 0})
+        for _ in range(2):
+            self.worker.reap()
+            self.worker.process(self.worker.claim())
+        record = get_task(record["id"])
+        self.assertEqual((record["status"], record["attempts"], record["result_status"]), (FAILED, 2, 503))
+        self.assert_settled()
+        self.assertEqual(self.redis.zcard(tasks._delayed_key()), 0)
+
+    def test_expired_lease_is_reaped_and_redelivered(self):
+        record = enqueue(ECHO_SERVICE, "u1", {"q": 1})
+        crashed = self.worker
+        task_id = crashed.claim()
+        # 原 worker 开始执行后卡死，租约过期
+        running = get_task(task_id)
+        running["status"] = RUNNING
+        tasks._save(running)
+        self.redis.zadd(tasks._leases_key(), {task_id: 0})
+
+        other = TaskWorker()
+        with self.assertLogs("common.tasks", "WARNING") as logs:
+            other.reap()
+        self.assertIn(task_id, logs.output[0])
+        self.assertEqual(self.members(tasks._queue_key), [task_id])
+        self.assertEqual(get_task(task_id)["status"], QUEUED)
+        self.assertEqual(other.claim(), task_id)
+
+        # 原 worker 恢复后不能确认已交给其他 worker 的任务
+        with self.assertLogs("common.tasks", "WARNING"):
+            self.assertFalse(crashed.ack(task_id))
+        self.assertEqual(self.members(tasks._processing_key), [task_id])
+        other.process(task_id)
+        self.assertEqual(get_task(record["id"])["status"], SUCCEEDED)
+        self.assert_settled()
+
+    def test_claimed_task_without_a_lease_gets_one(self):
+        # worker 在 BLMOVE 之后、登记租约之前崩溃
+        record = enqueue(ECHO_SERVICE, "u1", {})
+        self.redis.lmove(tasks._queue_key(), tasks._processing_key(), "LEFT", "RIGHT")
+        self.worker.reap()
+        self.assertIsNotNone(self.redis.zscore(tasks._leases_key(), record["id"]))
+        self.assertEqual(self.members(tasks._queue_key), [])
+
+
+class TaskStatusViewTests(RedisTestCase):
+    """任务状态查询只对任务的创建者可见"""
+
+    def get(self, task_id, user_id):
+        request = APIRequestFactory().get(f"/api/tasks/{task_id}")
+        force_authenticate(request, user=SimpleUser(user_id))
+        return TaskStatusView.as_view()(request, task_id=task_id)
+
+    def test_owner_sees_the_status(self):
+        record = enqueue(ECHO_SERVICE, "u1", {})
+        response = self.get(record["id"], "u1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["task_id"], record["id"])
+        self.assertEqual(response.data["status"], QUEUED)
+        self.assertNotIn("owner", response.data)
+
+    def test_other_users_and_unknown_tasks_are_not_found(self):
+        record = enqueue(ECHO_SERVICE, "u1", {})
+        self.assertEqual(self.get(record["id"], "u2").status_code, 404)
+        self.assertEqual(self.get("missing", "u1").status_code, 404)
+
+
+class UpstreamError(Exception):
+    pass
+
+
+def fail():
+    raise UpstreamError()
+
+
+@override_settings(LLM_RESILIENCE={"FAILURE_THRESHOLD": 3, "RESET_TIMEOUT": 30, "HALF_OPEN_MAX_CALLS": 1})
+class CircuitBreakerTests(SimpleTestCase):
+    """熔断器状态转换：连续失败后打开，冷却后半开试探，试探结果决定关闭或重新打开"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(resilience, 'time', mock.Mock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("test", is_failure=lambda e: isinstance(e, UpstreamError))
+
+    def call(self, func=lambda: None):
+        with self.breaker.guard():
+            return func()
+
+    def trip(self):
+        for _ in range(3):
+            with self.assertRaises(UpstreamError):
+                self.call(fail)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                self.call(fail)
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+        with self.assertRaises(UpstreamError):
+            self.call(fail)
+        status = self.breaker.status()
+        self.assertEqual(status["state"], OPEN)
+        self.assertEqual(status["retry_after"], 30)
+
+    def test_success_resets_the_failure_count(self):
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                self.call(fail)
+        self.call()
+        with self.assertRaises(UpstreamError):
+            self.call(fail)
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+        self.assertEqual(self.breaker.status()["consecutive_failures"], 1)
+
+    def test_open_breaker_rejects_without_calling(self):
+        self.trip()
+        func = mock.Mock()
+        with self.assertRaises(CircuitOpen) as ctx:
+            self.call(func)
+        func.assert_not_called()
+        self.assertEqual(ctx.exception.status_code, 503)
+        self.assertEqual(ctx.exception.retry_after, 30)
+        self.assertEqual(self.breaker.status()["rejected"], 1)
+
+    def test_non_failures_do_not_count(self):
+        for _ in range(5):
+            with self.assertRaises(ValueError):
+                self.call(mock.Mock(side_effect=ValueError))
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+
+    def test_half_open_trial_success_closes(self):
+        self.trip()
+        self.now += 30
+        self.assertEqual(self.breaker.status()["state"], HALF_OPEN)
+        self.call()
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+
+    def test_half_open_trial_failure_reopens(self):
+        self.trip()
+        self.now += 30
+        with self.assertRaises(UpstreamError):
+            self.call(fail)
+        self.assertEqual(self.breaker.status()["state"], OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.call()
+
+    def test_half_open_allows_limited_trials(self):
+        self.trip()
+        self.now += 30
+        with self.breaker.guard():
+            # 试探调用进行中，其他调用仍被拒绝
+            with self.assertRaises(CircuitOpen):
+                self.call()
+        self.assertEqual(self.breaker.status()["state"], CLOSED)
+
+
+@override_settings(LLM_RESILIENCE={"MAX_ATTEMPTS": 4, "BACKOFF_BASE": 0.5, "BACKOFF_MAX": 1, "MIN_ATTEMPT_TIMEOUT": 5})
+class RetryTests(SimpleTestCase):
+    """可重试的错误按 full jitter 退避重试，次数和总超时都有上限"""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.sleeps = []
+        self.uniform_calls = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        def uniform(low, high):
+            self.uniform_calls.append((low, high))
+            return high
+
+        for name, module in (('time', mock.Mock(monotonic=lambda: self.now, sleep=sleep)),
+                             ('random', mock.Mock(uniform=uniform))):
+            patcher = mock.patch.object(resilience, name, module)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_backoff_is_jittered_below_a_capped_exponential(self):
+        call = mock.Mock(side_effect=[UpstreamError(), UpstreamError(), UpstreamError(), 'ok'])
+        self.assertEqual(retry(call, lambda e: True, self.now + 60), 'ok')
+        self.assertEqual(call.call_count, 4)
+        # 每次退避都在 [0, min(BACKOFF_MAX, BACKOFF_BASE * 2^(n-1))] 内随机取值
+        self.assertEqual(self.uniform_calls, [(0, 0.5), (0, 1), (0, 1)])
+        self.assertEqual(self.sleeps, [0.5, 1, 1])
+
+    def test_gives_up_after_max_attempts(self):
+        call = mock.Mock(side_effect=UpstreamError)
+        with self.assertRaises(UpstreamError):
+            retry(call, lambda e: True, self.now + 60)
+        self.assertEqual(call.call_count, 4)
+
+    def test_non_retryable_errors_are_raised_immediately(self):
+        call = mock.Mock(side_effect=UpstreamError)
+        with self.assertRaises(UpstreamError):
+            retry(call, lambda e: False, self.now + 60)
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual(self.sleeps, [])
+
+    def test_stops_when_the_deadline_leaves_too_little_time(self):
+        call = mock.Mock(side_effect=UpstreamError)
+        with self.assertRaises(UpstreamError):
+            retry(call, lambda e: True, self.now + 6)
+        # 第一次退避后只剩 5.5 秒，第二次退避后不足 MIN_ATTEMPT_TIMEOUT
+        self.assertEqual(call.call_count, 2)
+
+
+class HedgedTests(SimpleTestCase):
+    """对冲请求：返回先成功的结果，落后的一方收到取消信号"""
+
+    def test_fast_call_is_not_hedged(self):
+        call = mock.Mock(return_value='ok')
+        self.assertEqual(hedged(call, 1), 'ok')
+        self.assertEqual(call.call_count, 1)
+
+    def test_hedge_wins_and_the_slow_call_is_cancelled(self):
+        events = []
+        release = threading.Event()
+
+        def call(cancelled):
+            events.append(cancelled)
+            if len(events) == 1:
+                # 第一次调用卡住（例如等待响应头），直到收到取消信号
+                release.wait(5)
+                cancelled.wait(5)
+                raise HedgeCancelled()
+            return 'hedge'
+
+        started = time.monotonic()
+        self.assertEqual(hedged(call, 0.05), 'hedge')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(events), 2)
+        self.assertTrue(events[0].is_set())
+        self.assertFalse(events[1].is_set())
+        release.set()
+
+    def test_primary_wins_after_the_hedge_started(self):
+        events = []
+        hedge_started = threading.Event()
+
+        def call(cancelled):
+            events.append(cancelled)
+            if len(events) == 1:
+                hedge_started.wait(5)
+                return 'primary'
+            hedge_started.set()
+            cancelled.wait(5)
+            raise HedgeCancelled()
+
+        self.assertEqual(hedged(call, 0.05), 'primary')
+        self.assertTrue(events[1].is_set())
+
+    def test_failed_call_falls_back_to_the_other(self):
+        calls = []
+
+        def call(cancelled):
+            calls.append(cancelled)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                raise UpstreamError()
+            time.sleep(0.2)
+            return 'hedge'
+
+        self.assertEqual(hedged(call, 0.05), 'hedge')
+
+    def test_both_failures_raise(self):
+        def call(cancelled):
+            time.sleep(0.1)
+            raise UpstreamError()
+
+        with self.assertRaises(UpstreamError):
+            hedged(call, 0.05)
+
+    def test_failure_before_the_delay_is_not_hedged(self):
+        call = mock.Mock(side_effect=UpstreamError)
+        with self.assertRaises(UpstreamError):
+            hedged(call, 1)
+        self.assertEqual(call.call_count, 1)
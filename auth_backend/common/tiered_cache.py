@@ -0,0 +1,107 @@
+"""
+两级缓存：进程内 LRU + CACHES["default"]（Redis）。
+
+读取时先查本进程的 LRU，未命中再查 Redis 并回填 LRU；写入时两级同时写。
+适合体积不大、计算代价高、内容不可变（键里带内容哈希）的数据。
+命中统计按进程累计，由 /api/metrics 暴露。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+
+class LocalLRU:
+    """线程安全的进程内 LRU，条目带过期时间"""
+
+    def __init__(self, max_entries, timeout=None):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """进程内 LRU + Redis 的两级缓存"""
+
+    def __init__(self, prefix, max_entries=256, timeout=None):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.local = LocalLRU(max_entries, timeout)
+        self._stats = {"local_hits": 0, "remote_hits": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    def _key(self, key):
+        return f"{self.prefix}_{key}"
+
+    def _count(self, event):
+        with self._stats_lock:
+            self._stats[event] += 1
+
+    def get(self, key):
+        full_key = self._key(key)
+        value = self.local.get(full_key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        value = cache.get(full_key)
+        if value is not None:
+            self._count("remote_hits")
+            self.local.set(full_key, value)
+            return value
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        full_key = self._key(key)
+        self.local.set(full_key, value)
+        cache.set(full_key, value, timeout=self.timeout)
+
+    def delete(self, key):
+        full_key = self._key(key)
+        self.local.delete(full_key)
+        cache.delete(full_key)
+
+    def get_or_set(self, key, compute):
+        """命中时直接返回，否则调用 compute() 并写入两级缓存"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = sum(stats.values())
+        stats["hit_rate"] = round((stats["local_hits"] + stats["remote_hits"]) / lookups, 4) if lookups else None
+        stats["local_entries"] = len(self.local)
+        return stats
@@ -0,0 +1,180 @@
+"""
+有界内存的文件上传处理。
+
+- 按 Content-Length 预先拒绝超限请求，不读取请求体（ASGI 下没有 Content-Length 的请求按实际接收的字节数拒绝）；
+- 上传内容边接收边写入临时文件（不在内存中缓存），同时计算 SHA-256；
+- 实际接收字节数超过上限时立即停止接收并删除已写入的部分；
+- 处理方通过 mapped_file() 以内存映射方式读取临时文件。
+
+各类上传的大小上限见 settings.UPLOADS。
+"""
+import hashlib
+import json
+import mmap
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+DEFAULT_UPLOAD_SETTINGS = {
+    "RESUME_PDF_MAX_BYTES": 10 * 1024 * 1024,
+    "PHOTO_MAX_BYTES": 5 * 1024 * 1024,
+    # multipart 边界、表单字段等额外开销
+    "MULTIPART_OVERHEAD_BYTES": 64 * 1024,
+}
+
+
+class UploadTooLarge(Exception):
+    """上传内容超过大小上限"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        super().__init__(f"File too large (limit {max_bytes // 1024} KB)")
+
+
+def upload_setting(name):
+    return getattr(settings, 'UPLOADS', {}).get(name, DEFAULT_UPLOAD_SETTINGS[name])
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """流式写入临时文件并计算 SHA-256，超过上限时停止接收"""
+
+    def __init__(self, request=None, max_bytes=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.exceeded = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.max_bytes is not None and self.received > self.max_bytes:
+            self.exceeded = True
+            # 删除已写入的部分，并断开读取（不再消费剩余的请求体）
+            self.upload_interrupted()
+            raise StopUpload(connection_reset=True)
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+
+def limit_uploads(request, max_bytes):
+    """
+    为请求安装有上限的上传处理器，必须在访问 request.data / FILES 之前调用。
+
+    Content-Length 已超过上限时直接抛出 UploadTooLarge。
+    """
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if content_length > max_bytes + upload_setting("MULTIPART_OVERHEAD_BYTES"):
+        raise UploadTooLarge(max_bytes)
+    handler = HashingTemporaryFileUploadHandler(request, max_bytes=max_bytes)
+    request.upload_handlers = [handler]
+    return handler
+
+
+def get_uploaded_file(request, handler, field='file'):
+    """取出上传的文件（接收过程中超限时抛出 UploadTooLarge）"""
+    uploaded = request.FILES.get(field)
+    if handler.exceeded:
+        raise UploadTooLarge(handler.max_bytes)
+    return uploaded
+
+
+@contextmanager
+def mapped_file(uploaded):
+    """以只读内存映射方式打开上传的临时文件（空文件返回 b''）"""
+    if not uploaded.size:
+        yield b''
+        return
+    with open(uploaded.temporary_file_path(), 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+
+
+def sniff_image_type(header):
+    """按文件头判断图片类型，不是支持的图片时返回 None"""
+    header = bytes(header[:16])
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, content_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return content_type
+    return None
+
+
+def max_request_bytes():
+    return (max(upload_setting("RESUME_PDF_MAX_BYTES"), upload_setting("PHOTO_MAX_BYTES"))
+            + upload_setting("MULTIPART_OVERHEAD_BYTES"))
+
+
+def limit_request_size(application):
+    """
+    ASGI 入口的请求体大小限制。
+
+    Django 的 ASGI 处理器会先读完整个请求体再调用视图，超大的上传在这里直接返回 413：
+    声明了 Content-Length 的请求不读取请求体即拒绝；没有 Content-Length 的请求（分块传输）
+    边接收边计数，超过上限时停止读取。
+    """
+    async def reject(send):
+        body = json.dumps({'error': 'Request body too large'}).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def guarded(scope, receive, send):
+        if scope['type'] != 'http':
+            await application(scope, receive, send)
+            return
+
+        max_bytes = max_request_bytes()
+        headers = dict(scope.get('headers') or [])
+        content_length = headers.get(b'content-length')
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            await reject(send)
+            return
+
+        received = 0
+        started = False
+
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        try:
+            await application(scope, counted_receive, tracked_send)
+        except UploadTooLarge:
+            if started:
+                raise
+            await reject(send)
+    return guarded
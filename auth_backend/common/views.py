@@ -0,0 +1,32 @@
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.response import Response
+
+from common.admission import admission_stats
+from common.job_catalog import get_job_catalog
+from common.llm_cache import cache_stats
+from interview.pdf_extract import get_text_cache
+from common.tasks import get_task, task_status
+from resume.repository import resume_cache_stats
+from resume.views import ResumeBaseView
+
+
+def metrics(request):
+    """运行状态指标（供监控采集）"""
+    return JsonResponse({
+        "job_catalog": get_job_catalog().status(),
+        "llm_cache": cache_stats(),
+        "resume_text_cache": get_text_cache().stats(),
+        "resume_cache": resume_cache_stats(),
+        "llm_admission": admission_stats(),
+    })
+
+
+class TaskStatusView(ResumeBaseView):
+    """查询异步任务的状态和结果（只能查询自己的任务）"""
+
+    def get(self, request, task_id):
+        record = get_task(task_id)
+        if record is None or record['owner'] != self.user_id:
+            return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(task_status(record))
@@ -1,50 +1,356 @@
 # import_jobs_to_firebase.py
+"""
+把岗位 CSV 批量导入 Firestore 的 jobs 集合。
+
+- 只读取文件开头的一段样本检测编码；
+- 每批最多 --batch-size 条写入（Firestore 单批上限 500），多个批次并发提交；
+- 已连续提交完成的行数记录在检查点文件中，导入中断后重新运行会从该处继续，全部完成后删除检查点；
+- 定期输出进度和吞吐量（行/秒）。
+
+--sync 为增量同步模式：文档 ID 由公司、职位名称和工作地点得出（与行顺序无关），每个岗位保存内容哈希；
+只写入新增和内容变化的岗位，删除 CSV 中已不存在的岗位，最后更新目录版本文档 catalog_meta/jobs。
+同步模式是幂等的，中断后重新运行即可（已写入的岗位哈希一致，会被跳过），不使用检查点。
+
+用法:
+    python import_jobs_to_firebase.py job_info.csv --workers 8
+    python import_jobs_to_firebase.py job_info.csv --restart   # 忽略检查点，从头导入
+    python import_jobs_to_firebase.py job_info.csv --sync      # 增量同步
+"""
+import argparse
 import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions, retry
 import chardet  # 用于检测文件编码
 
-def detect_encoding(file_path):
-    """检测文件的编码格式"""
+from common.job_hashing import catalog_version, job_content_hash, job_natural_id
+
+# Firestore 单个批量写入最多 500 个操作
+MAX_BATCH_SIZE = 500
+# 编码检测读取的样本大小
+ENCODING_SAMPLE_BYTES = 64 * 1024
+# 进度输出间隔（秒）
+REPORT_INTERVAL = 5
+
+# 批次提交遇到临时错误时重试（set 是幂等的，重复提交没有副作用）
+COMMIT_RETRY = retry.Retry(
+    predicate=retry.if_exception_type(
+        exceptions.ServiceUnavailable,
+        exceptions.DeadlineExceeded,
+        exceptions.InternalServerError,
+        exceptions.ResourceExhausted,
+        exceptions.Aborted,
+    ),
+    initial=1.0,
+    maximum=30.0,
+    multiplier=2.0,
+    timeout=300.0,
+)
+
+
+def detect_encoding(file_path, sample_bytes=ENCODING_SAMPLE_BYTES):
+    """按文件开头的样本检测编码格式"""
     with open(file_path, 'rb') as f:
-        result = chardet.detect(f.read())
-    return result['encoding']
+        sample = f.read(sample_bytes)
+    encoding = (chardet.detect(sample)['encoding'] or 'utf-8').lower()
+    # GB2312/GBK 的检测结果按超集 GB18030 解码；样本全是 ASCII 时按 UTF-8 读取后文
+    return {'gb2312': 'gb18030', 'gbk': 'gb18030', 'ascii': 'utf-8'}.get(encoding, encoding)
+
+
+def file_fingerprint(file_path):
+    """文件大小 + 开头 1MB 的哈希，用于确认检查点属于同一个文件"""
+    with open(file_path, 'rb') as f:
+        head = f.read(1024 * 1024)
+    return f"{os.path.getsize(file_path)}-{hashlib.sha256(head).hexdigest()}"
+
+
+def build_job(row):
+    """清理和转换一行 CSV 数据（不含 ID）"""
+    return {
+        'title': row['job_title'],
+        'company': row['job_company'],
+        'location': row['job_location'].replace('?', '/'),
+        'salary': row['job_salary_range'].replace('?', '-'),
+        'description': f"{row['job_title']} at {row['job_company']}",
+        'category': row['category'],
+        'experience': row['job_experience'],
+        'education': row['job_education'],
+        'skills': [s.strip() for s in row['job_skills'].split(',') if s.strip()],
+        'industry': row['job_industry'],
+        'welfare': row['job_welfare'],
+        'scale': row['job_scale'],
+        'create_time': row['create_time']
+    }
+
+
+def iter_batches(csv_file_path, encoding, batch_size, skip_rows=0):
+    """按批产出 (起始行号, 岗位列表)，跳过检查点之前的行"""
+    with open(csv_file_path, 'r', encoding=encoding, errors='replace', newline='') as file:
+        reader = csv.DictReader(file)
+        start, jobs = skip_rows, []
+        for index, row in enumerate(reader):
+            if index < skip_rows:
+                continue
+            jobs.append({'id': index + 1, **build_job(row)})  # 生成自增ID
+            if len(jobs) == batch_size:
+                yield start, jobs
+                start, jobs = index + 1, []
+        if jobs:
+            yield start, jobs
+
+
+class Checkpoint:
+    """
+    导入进度检查点。
+
+    批次并发提交、乱序完成，只记录从第 0 行起连续提交完成的行数；
+    恢复时之后已完成的批次会被重新写入（结果相同）。
+    """
+
+    def __init__(self, path, fingerprint, committed_rows=0):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.committed_rows = committed_rows
+        self._finished = {}  # 已完成但尚未连续的批次：起始行 -> 结束行
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, fingerprint, restart=False):
+        if restart or not os.path.exists(path):
+            return cls(path, fingerprint)
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('fingerprint') != fingerprint:
+            raise SystemExit(f"检查点 {path} 与当前文件不匹配，请使用 --restart 重新导入")
+        return cls(path, fingerprint, data['committed_rows'])
+
+    def mark_done(self, start, end):
+        with self._lock:
+            self._finished[start] = end
+            advanced = False
+            while self.committed_rows in self._finished:
+                self.committed_rows = self._finished.pop(self.committed_rows)
+                advanced = True
+            if advanced:
+                self._save()
+
+    def _save(self):
+        # 先写临时文件再替换，中途崩溃不会留下损坏的检查点
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'committed_rows': self.committed_rows}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Progress:
+    """累计已提交的行数，定期输出吞吐量"""
+
+    def __init__(self, skipped_rows=0):
+        self.rows = 0
+        self.skipped_rows = skipped_rows
+        self.started_at = time.monotonic()
+        self._reported_at = self.started_at
+        self._lock = threading.Lock()
+
+    def add(self, rows):
+        with self._lock:
+            self.rows += rows
+            now = time.monotonic()
+            if now - self._reported_at >= REPORT_INTERVAL:
+                self._reported_at = now
+                print(f"已导入 {self.rows + self.skipped_rows} 行，{self.rate():.0f} 行/秒")
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started_at
+        return self.rows / elapsed if elapsed > 0 else 0.0
 
-def import_jobs_from_csv(csv_file_path):
+    def summary(self):
+        elapsed = time.monotonic() - self.started_at
+        return f"本次导入 {self.rows} 行，耗时 {elapsed:.1f} 秒，平均 {self.rate():.0f} 行/秒"
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def commit_batch(db, collection, writes):
+    """提交一批写入；writes 为 (文档 ID, 数据) 列表，数据为 None 表示删除"""
+    batch = db.batch()
+    for doc_id, data in writes:
+        if data is None:
+            batch.delete(collection.document(doc_id))
+        else:
+            batch.set(collection.document(doc_id), data)
+    batch.commit(retry=COMMIT_RETRY)
+
+
+def commit_concurrently(db, collection, batches, workers, on_committed):
+    """
+    并发提交 (标识, 写入列表) 形式的批次，成功后调用 on_committed(标识, 写入列表)。
+    某个批次失败后不再提交新的批次，返回 [(标识, 异常)]。
+    """
+    # 限制排队中的批次数，内存占用与文件大小无关
+    in_flight = threading.BoundedSemaphore(workers * 2)
+    failures = []
+
+    def on_done(key, writes, future):
+        in_flight.release()
+        error = future.exception()
+        if error is not None:
+            failures.append((key, error))
+            return
+        on_committed(key, writes)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for key, writes in batches:
+            if failures:
+                break
+            in_flight.acquire()
+            future = pool.submit(commit_batch, db, collection, writes)
+            future.add_done_callback(lambda f, key=key, writes=writes: on_done(key, writes, f))
+    return failures
+
+
+def init_firestore():
     # 初始化Firebase应用
     cred = credentials.Certificate("/etc/secrets/jobfind-53c9b-firebase-adminsdk-fbsvc-e6bb9f2f45.json")
     firebase_admin.initialize_app(cred)
-    db = firestore.client()
+    return firestore.client()
+
+
+def import_jobs_from_csv(csv_file_path, batch_size=400, workers=8, checkpoint_path=None, restart=False):
+    db = init_firestore()
+    collection = db.collection('jobs')
+
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    checkpoint = Checkpoint.load(
+        checkpoint_path or f"{csv_file_path}.checkpoint.json", file_fingerprint(csv_file_path), restart
+    )
+    if checkpoint.committed_rows:
+        print(f"从检查点继续：跳过已导入的前 {checkpoint.committed_rows} 行")
 
     # 检测文件编码
     encoding = detect_encoding(csv_file_path)
     print(f"检测到文件编码: {encoding}")
 
-    # 读取CSV文件
-    with open(csv_file_path, 'r', encoding=encoding, errors='replace') as file:
-        reader = csv.DictReader(file)
-        for index, row in enumerate(reader):
-            # 清理和转换数据
-            job_data = {
-                'id': index + 1,  # 生成自增ID
-                'title': row['job_title'],
-                'company': row['job_company'],
-                'location': row['job_location'].replace('?', '/'),
-                'salary': row['job_salary_range'].replace('?', '-'),
-                'description': f"{row['job_title']} at {row['job_company']}",
-                'category': row['category'],
-                'experience': row['job_experience'],
-                'education': row['job_education'],
-                'skills': [s.strip() for s in row['job_skills'].split(',') if s.strip()],
-                'industry': row['job_industry'],
-                'welfare': row['job_welfare'],
-                'scale': row['job_scale'],
-                'create_time': row['create_time']
-            }
-            # 添加到Firestore
-            db.collection('jobs').document(str(job_data['id'])).set(job_data)
-            print(f"导入职位 #{job_data['id']}: {job_data['title']}")
+    progress = Progress(skipped_rows=checkpoint.committed_rows)
+
+    def on_committed(start, writes):
+        checkpoint.mark_done(start, start + len(writes))
+        progress.add(len(writes))
+
+    batches = (
+        (start, [(str(job['id']), job) for job in jobs])
+        for start, jobs in iter_batches(csv_file_path, encoding, batch_size, checkpoint.committed_rows)
+    )
+    failures = commit_concurrently(db, collection, batches, workers, on_committed)
+
+    print(progress.summary())
+    if failures:
+        start, error = min(failures, key=lambda failure: failure[0])
+        raise SystemExit(
+            f"第 {start + 1} 行起的批次提交失败: {error}\n"
+            f"已连续导入 {checkpoint.committed_rows} 行，重新运行将从检查点继续"
+        )
+    checkpoint.remove()
+
+
+def sync_jobs_from_csv(csv_file_path, batch_size=400, workers=8):
+    """增量同步：只写入变化的岗位，删除已下架的岗位，并更新目录版本"""
+    db = init_firestore()
+    collection = db.collection('jobs')
+    meta_ref = db.collection('catalog_meta').document('jobs')
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+
+    encoding = detect_encoding(csv_file_path)
+    print(f"检测到文件编码: {encoding}")
+
+    # 只读取内容哈希字段（按行号生成 ID 的旧文档没有哈希，会被当作已下架删除）
+    existing = {doc.id: (doc.to_dict() or {}).get('content_hash') for doc in collection.select(['content_hash']).stream()}
+    print(f"Firestore 中现有 {len(existing)} 个岗位")
+
+    report = Counter()
+    current = {}  # 文档 ID -> 内容哈希
+
+    def writes():
+        with open(csv_file_path, 'r', encoding=encoding, errors='replace', newline='') as file:
+            for row in csv.DictReader(file):
+                job = build_job(row)
+                doc_id = job_natural_id(job)
+                if doc_id in current:
+                    # 同一岗位在 CSV 中重复出现，保留第一行
+                    report['duplicates'] += 1
+                    continue
+                job['id'] = doc_id
+                job['content_hash'] = current[doc_id] = job_content_hash(job)
+                if existing.get(doc_id) == job['content_hash']:
+                    report['unchanged'] += 1
+                    continue
+                report['changed' if doc_id in existing else 'added'] += 1
+                yield doc_id, job
+        for doc_id in existing.keys() - current.keys():
+            report['deleted'] += 1
+            yield doc_id, None
+
+    progress = Progress()
+    failures = commit_concurrently(
+        db, collection, enumerate(chunked(writes(), batch_size)), workers,
+        lambda number, batch: progress.add(len(batch))
+    )
+
+    print(
+        f"新增 {report['added']}，更新 {report['changed']}，删除 {report['deleted']}，"
+        f"未变化跳过 {report['unchanged']}，重复行跳过 {report['duplicates']}"
+    )
+    print(progress.summary())
+    if failures:
+        raise SystemExit(f"批次提交失败: {failures[0][1]}\n未更新目录版本，重新运行即可继续同步")
+
+    version = catalog_version(current.items())
+    meta = meta_ref.get()
+    if meta.exists and (meta.to_dict() or {}).get('version') == version:
+        print(f"目录未变化，版本仍为 {version}")
+        return
+    meta_ref.set({
+        'version': version,
+        'jobs': len(current),
+        'added': report['added'],
+        'changed': report['changed'],
+        'deleted': report['deleted'],
+        'updated_at': firestore.SERVER_TIMESTAMP,
+    })
+    print(f"目录版本已更新为 {version}")
+
 
 if __name__ == '__main__':
-    # 安装chardet: pip install chardet
-    import_jobs_from_csv('job_info.csv')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='批量导入岗位数据到 Firestore')
+    parser.add_argument('csv_file', nargs='?', default='job_info.csv')
+    parser.add_argument('--batch-size', type=int, default=400, help=f'每批写入条数（不超过 {MAX_BATCH_SIZE}）')
+    parser.add_argument('--workers', type=int, default=8, help='并发提交的批次数')
+    parser.add_argument('--checkpoint', help='检查点文件路径（默认 <csv_file>.checkpoint.json）')
+    parser.add_argument('--restart', action='store_true', help='忽略已有检查点，从头导入')
+    parser.add_argument('--sync', action='store_true', help='增量同步：只写入变化的岗位并删除已下架的岗位')
+    args = parser.parse_args()
+    if args.sync:
+        sync_jobs_from_csv(args.csv_file, args.batch_size, args.workers)
+    else:
+        import_jobs_from_csv(args.csv_file, args.batch_size, args.workers, args.checkpoint, args.restart)
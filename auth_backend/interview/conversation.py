@@ -0,0 +1,136 @@
+"""
+Token-budgeted conversation history for interview question generation.
+
+Recent turns are sent verbatim; once the history exceeds the token budget, older
+turns are folded into a rolling summary in fixed-size chunks counted from the start
+of the interview. Every folded prefix is identified by a chained hash of its chunks,
+so the summary for a prefix is computed once and reused on every later turn
+(only the newest chunk is ever summarized). Budgets are configured in
+settings.INTERVIEW_CONTEXT.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.llm_client import chat_content
+from common.single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_SETTINGS = {
+    "HISTORY_TOKEN_BUDGET": 1500,
+    "RECENT_MESSAGES": 6,
+    "SUMMARY_CHUNK_MESSAGES": 6,
+    "SUMMARY_MAX_TOKENS": 300,
+    "SUMMARY_TTL": 24 * 60 * 60,
+}
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Total deadlines (including retries) of the DeepSeek calls of one interview turn, in seconds
+QUESTION_TIMEOUT = 60
+SUMMARY_TIMEOUT = 30
+
+SUMMARY_PROMPT = """
+You maintain the running notes of a mock job interview. Merge the previous notes and the new
+conversation turns into updated notes of at most 200 words. Keep: questions already asked,
+the key facts and claims from the candidate's answers, and weak spots worth probing further.
+Write in English, as plain text without headings.
+"""
+
+
+def context_setting(name):
+    return getattr(settings, 'INTERVIEW_CONTEXT', {}).get(name, DEFAULT_CONTEXT_SETTINGS[name])
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one token per CJK character, about four characters per token otherwise"""
+    wide = sum(1 for char in text if char >= '\u2e80')
+    return wide + (len(text) - wide + 3) // 4
+
+
+def message_tokens(messages: list) -> int:
+    return sum(estimate_tokens(str(m.get('content', ''))) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _chain_hash(previous: str, chunk: list) -> str:
+    encoded = json.dumps(chunk, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256((previous + encoded).encode('utf-8')).hexdigest()
+
+
+def _summary_key(prefix_hash: str) -> str:
+    return f"interview_summary_{prefix_hash}"
+
+
+def fold_count(history: list) -> int:
+    """Number of leading messages (a multiple of the chunk size) that must be folded into the summary"""
+    budget = context_setting("HISTORY_TOKEN_BUDGET")
+    chunk = context_setting("SUMMARY_CHUNK_MESSAGES")
+    max_fold = max(len(history) - context_setting("RECENT_MESSAGES"), 0) // chunk * chunk
+    folded = 0
+    while folded < max_fold and message_tokens(history[folded:]) > budget:
+        folded += chunk
+    return folded
+
+
+def build_summary_payload(previous_summary: str, turns: list) -> dict:
+    transcript = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in turns)
+    return {
+        "model": "deepseek-chat",
+        "messages": [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Previous notes:\n{previous_summary or 'None'}\n\nNew turns:\n{transcript}"},
+        ],
+        "max_tokens": context_setting("SUMMARY_MAX_TOKENS"),
+        "temperature": 0.2,
+    }
+
+
+def summarize_prefix(history: list, folded: int) -> str:
+    """Rolling summary of history[:folded], reusing the longest cached prefix"""
+    chunk = context_setting("SUMMARY_CHUNK_MESSAGES")
+    hashes, previous = [], ''
+    for start in range(0, folded, chunk):
+        previous = _chain_hash(previous, history[start:start + chunk])
+        hashes.append(previous)
+
+    cached = cache.get_many([_summary_key(h) for h in hashes])
+    summary, done = '', 0
+    for i in range(len(hashes) - 1, -1, -1):
+        if _summary_key(hashes[i]) in cached:
+            summary, done = cached[_summary_key(hashes[i])], i + 1
+            break
+
+    for i in range(done, len(hashes)):
+        turns = history[i * chunk:(i + 1) * chunk]
+        key = _summary_key(hashes[i])
+
+        def compute(previous_summary=summary, turns=turns, key=key):
+            result = chat_content(build_summary_payload(previous_summary, turns), timeout=SUMMARY_TIMEOUT,
+                                  endpoint='interview.summary').strip()
+            cache.set(key, result, timeout=context_setting("SUMMARY_TTL"))
+            return result
+
+        summary = single_flight(key, compute)
+    return summary
+
+
+def compact_history(history: list):
+    """
+    Split the history into (summary, recent messages) that fit the token budget.
+
+    summary is None when the full history fits. If summarization fails, the folded
+    turns are dropped instead so that question generation still succeeds.
+    """
+    folded = fold_count(history)
+    if not folded:
+        return None, history
+    try:
+        return summarize_prefix(history, folded), history[folded:]
+    except Exception as e:
+        logger.warning("Conversation summary failed, dropping %d old messages: %s", folded, e)
+        return None, history[folded:]
@@ -0,0 +1,280 @@
+"""
+PDF text extraction engine for uploaded resumes.
+
+pypdfium2 is the fast default. A page whose pdfium text looks unreliable (almost empty,
+or containing replacement/control characters, typical of unusual layouts and embedded
+fonts) is re-extracted with pdfplumber. Extraction runs in a process pool, so the
+CPU-heavy work does not run in the request thread; documents with several pages are
+split into page ranges processed in parallel. A per-document page limit and time limit
+apply; limits live in settings.PDF_EXTRACT.
+
+The source is either the PDF bytes or the path of an upload spool file; workers open
+spool files as read-only memory maps instead of receiving a copy of the bytes.
+
+extract_text_cached() caches the result by SHA-256 of the file bytes plus the extractor
+version, in a local LRU backed by Redis (settings.RESUME_TEXT_CACHE), so repeat uploads
+of the same file skip parsing entirely.
+"""
+import atexit
+import concurrent.futures
+import hashlib
+import io
+import logging
+import mmap
+import multiprocessing
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the extraction output changes, so cached texts from the old extractor are not reused
+EXTRACTOR_VERSION = "pdfium-1"
+
+DEFAULT_EXTRACT_SETTINGS = {
+    "MAX_PAGES": 10,
+    "TIMEOUT": 20,
+    "WORKERS": 2,
+    "PARALLEL_MIN_PAGES": 3,
+    "MIN_PAGE_CHARS": 20,
+}
+
+
+DEFAULT_TEXT_CACHE_SETTINGS = {
+    "LOCAL_MAX_ENTRIES": 256,
+    "TTL": 7 * 24 * 60 * 60,
+}
+
+
+class PDFExtractionError(Exception):
+    """The document could not be parsed within the configured limits"""
+
+
+def extract_setting(name):
+    return getattr(settings, 'PDF_EXTRACT', {}).get(name, DEFAULT_EXTRACT_SETTINGS[name])
+
+
+def _looks_unreliable(text, min_chars):
+    """Heuristic for pages pdfium could not lay out properly"""
+    stripped = text.strip()
+    if len(stripped) < min_chars:
+        return True
+    bad = sum(1 for char in stripped if char == '\ufffd' or (char < ' ' and char not in '\n\r\t'))
+    return bad / len(stripped) > 0.05
+
+
+@contextmanager
+def open_source(source):
+    """Yield the PDF as bytes, or as a memory map of the file at the given path"""
+    if isinstance(source, (bytes, bytearray)):
+        yield source
+        return
+    with open(source, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+class MappedReader:
+    """Binary reader over a memory map; pdfium pulls the blocks it needs through readinto()"""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+        self._position = 0
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._mapped)}[whence]
+        self._position = base + offset
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        end = len(self._mapped) if size is None or size < 0 else self._position + size
+        data = self._mapped[self._position:end]
+        self._position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        data = self.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+
+def _pdfium_document(data):
+    import pypdfium2 as pdfium
+
+    return pdfium.PdfDocument(MappedReader(data) if isinstance(data, mmap.mmap) else data)
+
+
+def _pdfplumber_pages(data, indexes):
+    import pdfplumber
+
+    stream = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    stream.seek(0)
+    with pdfplumber.open(stream, pages=[i + 1 for i in indexes]) as pdf:
+        return [page.extract_text() or '' for page in pdf.pages]
+
+
+def _pdfium_pages(data, start, stop):
+    pdf = _pdfium_document(data)
+    try:
+        texts = []
+        for index in range(start, stop):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            try:
+                texts.append(textpage.get_text_bounded().replace('\r\n', '\n'))
+            finally:
+                textpage.close()
+                page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def extract_page_range(source, start, stop, min_chars):
+    """Extract pages [start, stop); runs inside a pool worker"""
+    with open_source(source) as data:
+        texts = _pdfium_pages(data, start, stop)
+        fallback = [i for i, text in enumerate(texts) if _looks_unreliable(text, min_chars)]
+        if fallback:
+            for position, text in zip(fallback, _pdfplumber_pages(data, [start + p for p in fallback])):
+                if len(text.strip()) > len(texts[position].strip()):
+                    texts[position] = text
+    return texts
+
+
+def _pdfium_page_count(data):
+    pdf = _pdfium_document(data)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def page_count(source):
+    with open_source(source) as data:
+        return _pdfium_page_count(data)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool shared by the requests of this process (spawned, so no forked gRPC/thread state)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=extract_setting("WORKERS"),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _retire_pool(pool):
+    """
+    Stop sending work to a pool whose workers are stuck on a document that exceeded the time limit.
+
+    Later requests get a fresh pool; jobs of other requests already running on the old one are
+    left to finish, and its processes are killed once those jobs have reached their own time limit.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            # Already retired by another request that timed out on the same pool
+            return
+        _pool = None
+    # shutdown() drops the executor's references to its worker processes
+    processes = list((getattr(pool, '_processes', None) or {}).values())
+    pool.shutdown(wait=False)
+    timer = threading.Timer(extract_setting("TIMEOUT"), _terminate, args=(processes,))
+    timer.daemon = True
+    timer.start()
+
+
+def _terminate(processes):
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _page_ranges(pages, parts):
+    size = -(-pages // parts)
+    return [(start, min(start + size, pages)) for start in range(0, pages, size)]
+
+
+def extract_text(source) -> str:
+    """Extract the text of the first MAX_PAGES pages, one page per paragraph"""
+    try:
+        pages = min(page_count(source), extract_setting("MAX_PAGES"))
+    except Exception as e:
+        raise PDFExtractionError(f"invalid PDF: {e}") from e
+    if not pages:
+        return ""
+    min_chars = extract_setting("MIN_PAGE_CHARS")
+
+    parts = extract_setting("WORKERS") if pages >= extract_setting("PARALLEL_MIN_PAGES") else 1
+    pool = get_pool()
+    futures = [
+        pool.submit(extract_page_range, source, start, stop, min_chars)
+        for start, stop in _page_ranges(pages, parts)
+    ]
+    done, pending = concurrent.futures.wait(futures, timeout=extract_setting("TIMEOUT"))
+    if pending:
+        logger.warning("PDF extraction of %d pages timed out, replacing the pool", pages)
+        _retire_pool(pool)
+        raise PDFExtractionError(f"extraction exceeded {extract_setting('TIMEOUT')}s")
+    try:
+        texts = [text for future in futures for text in future.result()]
+    except concurrent.futures.process.BrokenProcessPool as e:
+        _retire_pool(pool)
+        raise PDFExtractionError("extraction worker crashed") from e
+
+    return "\n".join(text.strip() for text in texts if text.strip()) + "\n"
+
+
+def text_cache_setting(name):
+    return getattr(settings, 'RESUME_TEXT_CACHE', {}).get(name, DEFAULT_TEXT_CACHE_SETTINGS[name])
+
+
+def extractor_version():
+    """Version component of the cache key; the page limit changes the output too"""
+    return f"{EXTRACTOR_VERSION}-p{extract_setting('MAX_PAGES')}"
+
+
+_text_cache = None
+_text_cache_lock = threading.Lock()
+
+
+def get_text_cache():
+    # Created lazily: pool workers import this module without Django settings
+    global _text_cache
+    with _text_cache_lock:
+        if _text_cache is None:
+            from common.tiered_cache import TieredCache
+            _text_cache = TieredCache(
+                "resume_text",
+                max_entries=text_cache_setting("LOCAL_MAX_ENTRIES"),
+                timeout=text_cache_setting("TTL")
+            )
+        return _text_cache
+
+
+def extract_text_cached(source, digest=None) -> str:
+    """extract_text with a content-hash cache; pass the SHA-256 if it is already known"""
+    if digest is None:
+        with open_source(source) as data:
+            digest = hashlib.sha256(data).hexdigest()
+    key = f"{extractor_version()}_{digest}"
+    return get_text_cache().get_or_set(key, lambda: extract_text(source))
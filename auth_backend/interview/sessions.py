@@ -0,0 +1,134 @@
+"""
+Server-side interview sessions stored in Redis (CACHES["default"]).
+
+A session holds the prebuilt system prompt prefix (interview instructions + resume text)
+and the turn history, so follow-up calls only send the session id and the latest answer.
+Every save refreshes the TTL; a lock serializes turns of the same session. The lock carries an
+owner token and is released with a compare-and-delete (common.locks), and its timeout is derived
+from the DeepSeek deadlines of the turn, so it does not expire while the turn is still running.
+Settings: settings.INTERVIEW_SESSION.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from common.admission import admission_setting, endpoint_priority
+from common.locks import acquire_lock, new_token, release_lock
+from .conversation import QUESTION_TIMEOUT, SUMMARY_TIMEOUT, context_setting, fold_count
+
+DEFAULT_SESSION_SETTINGS = {
+    "TTL": 2 * 60 * 60,
+    "LOCK_MARGIN": 10,
+    "MAX_ANSWER_CHARS": 4000,
+}
+
+
+class SessionNotFound(Exception):
+    """The session does not exist or has expired"""
+
+
+class SessionBusy(Exception):
+    """Another turn of the same session is still being generated"""
+
+
+def session_setting(name):
+    return getattr(settings, 'INTERVIEW_SESSION', {}).get(name, DEFAULT_SESSION_SETTINGS[name])
+
+
+def _session_key(session_id):
+    return f"interview_session_{session_id}"
+
+
+def _lock_key(session_id):
+    return f"interview_session_lock_{session_id}"
+
+
+def wants_session(request):
+    """Whether the upload should create a server-side session (?session=1)"""
+    flag = request.query_params.get('session') or request.data.get('session')
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+
+def create_session(prefix):
+    """Create a session from the prebuilt prompt prefix and return it"""
+    now = time.time()
+    session = {
+        "id": uuid.uuid4().hex,
+        "prefix": prefix,
+        "history": [],
+        "created_at": now,
+        "updated_at": now,
+    }
+    save_session(session)
+    return session
+
+
+def get_session(session_id):
+    return cache.get(_session_key(session_id))
+
+
+def save_session(session):
+    session['updated_at'] = time.time()
+    cache.set(_session_key(session['id']), session, timeout=session_setting("TTL"))
+
+
+def delete_session(session_id):
+    cache.delete(_session_key(session_id))
+
+
+def _call_budget(endpoint, timeout):
+    """Longest time one DeepSeek call may take: its total deadline plus the admission wait"""
+    return timeout + admission_setting("PRIORITIES")[endpoint_priority(endpoint)]["MAX_WAIT"]
+
+
+def lock_timeout(history):
+    """
+    How long one turn may hold the session lock: one summary call per chunk that may still need
+    folding once the next answer is added, then the question call.
+    """
+    answer = {"role": "user", "content": "x" * session_setting("MAX_ANSWER_CHARS")}
+    chunks = fold_count(history + [answer]) // context_setting("SUMMARY_CHUNK_MESSAGES")
+    return (chunks * _call_budget('interview.summary', SUMMARY_TIMEOUT)
+            + _call_budget('interview.question', QUESTION_TIMEOUT)
+            + session_setting("LOCK_MARGIN"))
+
+
+def acquire_session(session_id):
+    """Lock the session for one turn and return (session, lock token); pair with release_session()"""
+    key, token = _lock_key(session_id), new_token()
+    if not acquire_lock(key, token, lock_timeout([])):
+        raise SessionBusy(session_id)
+    session = get_session(session_id)
+    if session is None:
+        release_session(session_id, token)
+        raise SessionNotFound(session_id)
+    # Long sessions may need summary calls before the question: extend the lock to cover them
+    cache.touch(key, lock_timeout(session['history']))
+    return session, token
+
+
+def release_session(session_id, token):
+    """Release the lock if this turn still owns it (it may have expired and been taken by another turn)"""
+    release_lock(_lock_key(session_id), token)
+
+
+def add_answer(session, answer):
+    """Append the candidate's latest answer (ignored for the opening question)"""
+    answer = (answer or '').strip()
+    if answer:
+        session['history'].append({"role": "user", "content": answer[:session_setting("MAX_ANSWER_CHARS")]})
+
+
+def add_question(session, question):
+    session['history'].append({"role": "assistant", "content": question})
+
+
+def session_info(session):
+    """Public representation of a session"""
+    return {
+        "session_id": session['id'],
+        "turns": sum(1 for m in session['history'] if m['role'] == 'assistant'),
+        "expires_in": session_setting("TTL"),
+    }
@@ -1,3 +1,155 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from . import pdf_extract
+from .pdf_extract import _looks_unreliable, _page_ranges, _retire_pool
+from .conversation import QUESTION_TIMEOUT, SUMMARY_TIMEOUT
+from .sessions import SessionBusy, _lock_key, acquire_session, create_session, lock_timeout, release_session
+from .views import build_prompt_prefix
+
+
+class PageRangesTests(SimpleTestCase):
+    """Page ranges handed to the pool workers cover every page exactly once"""
+
+    def test_even_split(self):
+        self.assertEqual(_page_ranges(4, 2), [(0, 2), (2, 4)])
+
+    def test_last_range_is_shorter(self):
+        self.assertEqual(_page_ranges(5, 2), [(0, 3), (3, 5)])
+        self.assertEqual(_page_ranges(7, 3), [(0, 3), (3, 6), (6, 7)])
+
+    def test_more_parts_than_pages(self):
+        self.assertEqual(_page_ranges(2, 4), [(0, 1), (1, 2)])
+
+    def test_single_part(self):
+        self.assertEqual(_page_ranges(10, 1), [(0, 10)])
+
+    def test_ranges_are_contiguous(self):
+        for pages in range(1, 12):
+            for parts in range(1, 5):
+                with self.subTest(pages=pages, parts=parts):
+                    ranges = _page_ranges(pages, parts)
+                    self.assertLessEqual(len(ranges), parts)
+                    self.assertEqual([i for start, stop in ranges for i in range(start, stop)], list(range(pages)))
+
+
+class LooksUnreliableTests(SimpleTestCase):
+    """Which pdfium pages are re-extracted with pdfplumber"""
+
+    def test_regular_text_is_reliable(self):
+        self.assertFalse(_looks_unreliable("Alice Smith\nSoftware engineer, 5 years of Python", 20))
+
+    def test_short_text_is_unreliable(self):
+        self.assertTrue(_looks_unreliable("  Page 1  \n", 20))
+        self.assertTrue(_looks_unreliable("", 20))
+
+    def test_whitespace_does_not_count(self):
+        self.assertTrue(_looks_unreliable(" " * 50 + "short", 20))
+
+    def test_replacement_characters(self):
+        self.assertTrue(_looks_unreliable("Alice \ufffd\ufffd\ufffd Smith engineer", 20))
+        # A stray replacement character in a long page is tolerated
+        self.assertFalse(_looks_unreliable("Alice Smith, software engineer at Example Corp \ufffd", 20))
+
+    def test_control_characters(self):
+        self.assertTrue(_looks_unreliable("Alice\x01\x02\x03 Smith engineer", 20))
+        self.assertFalse(_looks_unreliable("Alice Smith\tengineer\r\nPython, Django", 20))
+
+
+@override_settings(PDF_EXTRACT={"TIMEOUT": 0.05})
+class RetirePoolTests(SimpleTestCase):
+    """A timed-out document must not kill the jobs of other requests running on the shared pool"""
+
+    def setUp(self):
+        self.process = mock.Mock(**{'is_alive.return_value': True})
+        self.pool = mock.Mock(_processes={1: self.process})
+        patcher = mock.patch.object(pdf_extract, '_pool', self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pool_is_replaced_and_killed_after_the_time_limit(self):
+        _retire_pool(self.pool)
+        self.assertIsNone(pdf_extract._pool)
+        self.pool.shutdown.assert_called_once_with(wait=False)
+        self.process.terminate.assert_not_called()
+        time.sleep(0.2)
+        self.process.terminate.assert_called_once_with()
+
+    def test_pool_is_retired_once(self):
+        _retire_pool(self.pool)
+        replacement = pdf_extract._pool = mock.Mock()
+        _retire_pool(self.pool)
+        self.assertIs(pdf_extract._pool, replacement)
+        self.pool.shutdown.assert_called_once_with(wait=False)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "interview"}},
+)
+class SessionStreamTests(SimpleTestCase):
+    """Streaming a session turn holds the session lock until the response is closed"""
+
+    def setUp(self):
+        cache.clear()
+        self.session = create_session(build_prompt_prefix('Resume text'))
+
+    def stream_turn(self):
+        return self.client.post('/api/generate-question?stream=1', {'session_id': self.session['id']},
+                                content_type='application/json')
+
+    def test_lock_is_held_while_streaming(self):
+        response = self.stream_turn()
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        with self.assertRaises(SessionBusy):
+            acquire_session(self.session['id'])
+        response.close()
+
+    def test_disconnect_before_first_event_releases_lock(self):
+        # The event generator never starts, so only the response closer can release the lock
+        self.stream_turn().close()
+        _, token = acquire_session(self.session['id'])
+        release_session(self.session['id'], token)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "interview"}},
+    INTERVIEW_SESSION={"LOCK_MARGIN": 10, "MAX_ANSWER_CHARS": 4000},
+    INTERVIEW_CONTEXT={"HISTORY_TOKEN_BUDGET": 1500, "RECENT_MESSAGES": 6, "SUMMARY_CHUNK_MESSAGES": 6},
+    LLM_ADMISSION={"PRIORITIES": {"high": {"SHARE": 1.0, "MAX_WAIT": 10, "MAX_QUEUE": 200},
+                                  "low": {"SHARE": 0.5, "MAX_WAIT": 0, "MAX_QUEUE": 0}},
+                   "ENDPOINTS": {"interview.question": "high", "interview.summary": "low"}},
+)
+class SessionLockTests(SimpleTestCase):
+    """The session lock belongs to one turn and outlives the turn's DeepSeek deadlines"""
+
+    def setUp(self):
+        cache.clear()
+        self.session = create_session(build_prompt_prefix('Resume text'))
+
+    def test_stale_turn_does_not_release_the_next_turns_lock(self):
+        _, first = acquire_session(self.session['id'])
+        # The first turn overran its lock, which expired and was taken by the next turn
+        cache.delete(_lock_key(self.session['id']))
+        _, second = acquire_session(self.session['id'])
+        release_session(self.session['id'], first)
+        with self.assertRaises(SessionBusy):
+            acquire_session(self.session['id'])
+        release_session(self.session['id'], second)
+        acquire_session(self.session['id'])
+
+    def test_short_history_only_needs_the_question_call(self):
+        self.assertEqual(lock_timeout([]), QUESTION_TIMEOUT + 10 + 10)
+
+    def test_long_history_adds_the_summary_calls(self):
+        history = [{"role": "user", "content": "x" * 2000}] * 18
+        self.assertEqual(lock_timeout(history), 2 * SUMMARY_TIMEOUT + QUESTION_TIMEOUT + 10 + 10)
+
+    def test_lock_is_extended_for_long_sessions(self):
+        self.session['history'] = [{"role": "user", "content": "x" * 2000}] * 18
+        cache.set(f"interview_session_{self.session['id']}", self.session)
+        with mock.patch.object(cache, 'touch') as touch:
+            acquire_session(self.session['id'])
+        touch.assert_called_once_with(_lock_key(self.session['id']), lock_timeout(self.session['history']))
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import UploadResumeView, GenerateQuestionView, health_check
+from .views import UploadResumeView, GenerateQuestionView, InterviewSessionView, health_check
 
 urlpatterns = [
     path('upload-resume', UploadResumeView.as_view(), name='upload_resume'),
     path('generate-question', GenerateQuestionView.as_view(), name='generate_question'),
+    path('interview-sessions/<str:session_id>', InterviewSessionView.as_view(), name='interview_session'),
     path('health', health_check, name='health_check'),
 ]
\ No newline at end of file
@@ -1,17 +1,30 @@
-import os
-import io
-import requests
-import pdfplumber
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, JSONParser
 from rest_framework.response import Response
-
-# 从环境变量获取 API 密钥
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-3f843c1b731642809c76190689ba9892")
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
+from common.admission import AdmissionRejected
+from common.resilience import breaker_states
+from common.llm_cache import cached_chat_content, cached_stream_chat_content
+from common.sse import event_stream_response, sse_event, wants_event_stream
+from common.uploads import UploadTooLarge, get_uploaded_file, limit_uploads, upload_setting
+from .conversation import QUESTION_TIMEOUT, compact_history
+from .pdf_extract import extract_text_cached
+from .sessions import (
+    SessionBusy,
+    SessionNotFound,
+    acquire_session,
+    add_answer,
+    add_question,
+    create_session,
+    delete_session,
+    get_session,
+    release_session,
+    save_session,
+    session_info,
+    wants_session,
+)
 
 SYSTEM_PROMPT = """
 You are a professional interviewer conducting a mock interview for a job candidate. The user has uploaded their resume. You must:
@@ -27,104 +40,227 @@ You are a professional interviewer conducting a mock interview for a job candida
 You must conduct the entire interview in English.
 """
 
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extract text from PDF file"""
+def extract_text_from_upload(uploaded) -> str:
+    """Extract text from a PDF upload spooled to disk (workers memory-map the spool file)"""
     try:
-        text = ""
-        with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text
+        return extract_text_cached(uploaded.temporary_file_path(), digest=uploaded.sha256)
     except Exception as e:
         raise Exception(f"PDF parsing failed: {str(e)}")
 
-def generate_question(resume_text: str, conversation_history: list) -> str:
-    """Generate interview question using DeepSeek API"""
-    try:
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+def build_prompt_prefix(resume_text: str) -> list:
+    """System messages shared by every turn of an interview"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    if resume_text:
+        messages.append({
+            "role": "system",
+            "content": f"Candidate's resume content:\n{resume_text[:3000]}"
+        })
+    return messages
+
 
-        if resume_text:
-            messages.append({
-                "role": "system",
-                "content": f"Candidate's resume content:\n{resume_text[:3000]}"
-            })
+def build_question_payload(resume_text: str, conversation_history: list, prefix: list = None) -> dict:
+    """Build the DeepSeek request payload for the next interview question"""
+    messages = list(prefix) if prefix is not None else build_prompt_prefix(resume_text)
 
-        messages.extend(conversation_history)
+    # Older turns are folded into a cached rolling summary to keep the prompt size bounded
+    summary, recent_history = compact_history(conversation_history)
+    if summary:
         messages.append({
-            "role": "user",
-            "content": "Generate the next interview question in English based on the resume and conversation history. Ask only one question."
+            "role": "system",
+            "content": f"Summary of the interview so far:\n{summary}"
         })
+    messages.extend(recent_history)
+    messages.append({
+        "role": "user",
+        "content": "Generate the next interview question in English based on the resume and conversation history. Ask only one question."
+    })
 
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": "deepseek-chat",
-            "messages": messages,
-            "max_tokens": 512,
-            "temperature": 0.7,
-            "top_p": 0.9,
-            "frequency_penalty": 0.1,
-            "presence_penalty": 0.1
-        }
-
-        response = requests.post(
-            DEEPSEEK_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
+    return {
+        "model": "deepseek-chat",
+        "messages": messages,
+        "max_tokens": 512,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "frequency_penalty": 0.1,
+        "presence_penalty": 0.1
+    }
 
-        if response.status_code != 200:
-            raise Exception(
-                f"DeepSeek API request failed: {response.status_code} - {response.text}"
-            )
 
-        data = response.json()
-        return data["choices"][0]["message"]["content"].strip()
+def generate_question(resume_text: str, conversation_history: list, prefix: list = None) -> str:
+    """Generate interview question using DeepSeek API"""
+    try:
+        payload = build_question_payload(resume_text, conversation_history, prefix)
+        # Only the opening question is cacheable; follow-ups depend on the candidate's answers
+        content = cached_chat_content(
+            payload, 'interview.question', timeout=QUESTION_TIMEOUT, bypass=bool(conversation_history)
+        )
+        return content.strip()
 
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise Exception(f"Question generation failed: {str(e)}")
 
 
+def stream_question_events(resume_text: str, conversation_history: list, prefix: list = None, on_complete=None):
+    """Stream the next interview question as SSE events (delta ... done | error)"""
+    deltas = None
+    parts = []
+    try:
+        payload = build_question_payload(resume_text, conversation_history, prefix)
+        deltas = cached_stream_chat_content(
+            payload, 'interview.question', timeout=QUESTION_TIMEOUT, bypass=bool(conversation_history)
+        )
+        for delta in deltas:
+            parts.append(delta)
+            yield sse_event({"delta": delta})
+        question = "".join(parts).strip()
+        if not question:
+            raise ValueError("Empty response from DeepSeek")
+        done = {"message": question}
+        if on_complete is not None:
+            done.update(on_complete(question))
+        yield sse_event(done, event="done")
+    except AdmissionRejected as e:
+        yield sse_event({"message": "", **e.response_data()}, event="error")
+    except Exception as e:
+        yield sse_event({"error": f"Question generation failed: {str(e)}"}, event="error")
+    finally:
+        # Client disconnected or finished: close the upstream DeepSeek stream
+        if deltas is not None:
+            deltas.close()
+
+
+def complete_session_turn(session, question: str) -> dict:
+    """Record the generated question in the session and return the session fields of the response"""
+    add_question(session, question)
+    save_session(session)
+    return session_info(session)
+
+
+def stream_session_question_events(session):
+    """stream_question_events for a session; the caller releases the session lock when the response closes"""
+    return stream_question_events(
+        '', session['history'], session['prefix'],
+        on_complete=lambda question: complete_session_turn(session, question)
+    )
+
+
+def session_error_response(error):
+    if isinstance(error, SessionBusy):
+        return Response({"message": "", "error": "A question is already being generated for this session"},
+                        status=409)
+    return Response({"message": "", "error": "Interview session not found or expired"}, status=404)
+
+
+def admission_rejected_response(error):
+    return Response({"message": "", **error.response_data()}, status=error.status_code, headers=error.headers())
+
+
+def upload_resume_text(file, session=False):
+    """Extract the text of an uploaded PDF resume; with session=True the text is kept in a new server-side session"""
+    if file is None:
+        return Response({"error": "No file provided"}, status=400)
+
+    if not file.name.endswith('.pdf'):
+        return Response({"error": "Only PDF files are supported"}, status=400)
+
+    try:
+        resume_text = extract_text_from_upload(file)
+        if session:
+            # Keep the text server-side; follow-up calls only send the session id
+            session = create_session(build_prompt_prefix(resume_text))
+            return Response({**session_info(session), "resume_chars": len(resume_text)})
+        return Response({"message": resume_text})
+    except Exception as e:
+        return Response({"error": str(e)}, status=500)
+
+
+def next_question(request):
+    """Generate the next interview question for a request"""
+    session_id = request.data.get('session_id')
+    if session_id:
+        return session_question(request, session_id)
+
+    try:
+        resume_text = request.data.get('resume_text', '')
+        conversation = request.data.get('conversation', [])
+
+        if wants_event_stream(request):
+            return event_stream_response(request, stream_question_events(resume_text, conversation))
+
+        question = generate_question(resume_text, conversation)
+        return Response({"message": question})
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except Exception as e:
+        return Response({"message": "", "error": str(e)}, status=500)
+
+
+def session_question(request, session_id):
+    """Next question of a server-side session: the request only carries the latest answer"""
+    try:
+        session, token = acquire_session(session_id)
+    except (SessionNotFound, SessionBusy) as e:
+        return session_error_response(e)
+
+    add_answer(session, request.data.get('answer'))
+    if wants_event_stream(request):
+        # The lock is held until the response closes, even if the client disconnects before the first event
+        return event_stream_response(
+            request, stream_session_question_events(session),
+            on_close=lambda: release_session(session_id, token)
+        )
+
+    try:
+        question = generate_question('', session['history'], session['prefix'])
+        return Response({"message": question, **complete_session_turn(session, question)})
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except Exception as e:
+        return Response({"message": "", "error": str(e)}, status=500)
+    finally:
+        release_session(session_id, token)
+
+
 class UploadResumeView(APIView):
     parser_classes = [MultiPartParser]
 
     @csrf_exempt
     def post(self, request):
-        if 'file' not in request.FILES:
-            return Response({"error": "No file provided"}, status=400)
-
-        file = request.FILES['file']
-        if not file.name.endswith('.pdf'):
-            return Response({"error": "Only PDF files are supported"}, status=400)
-
+        # Stream the upload to a size-capped, hashed spool file instead of memory
         try:
-            content = file.read()
-            resume_text = extract_text_from_pdf(content)
-            return Response({"message": resume_text})
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            handler = limit_uploads(request, upload_setting("RESUME_PDF_MAX_BYTES"))
+            file = get_uploaded_file(request, handler)
+        except UploadTooLarge as e:
+            return Response({"error": str(e)}, status=413)
+
+        return upload_resume_text(file, wants_session(request))
 
 
 class GenerateQuestionView(APIView):
     parser_classes = [JSONParser]
 
     def post(self, request):
-        try:
-            resume_text = request.data.get('resume_text', '')
-            conversation = request.data.get('conversation', [])
+        return next_question(request)
+
+class InterviewSessionView(APIView):
+    """Inspect or end a server-side interview session"""
+
+    def get(self, request, session_id):
+        session = get_session(session_id)
+        if session is None:
+            return session_error_response(SessionNotFound(session_id))
+        return Response({**session_info(session), "history": session['history']})
 
-            question = generate_question(resume_text, conversation)
-            return Response({"message": question})
-        except Exception as e:
-            return Response({"message": "", "error": str(e)}, status=500)
+    def delete(self, request, session_id):
+        delete_session(session_id)
+        return Response(status=204)
 
 
 def health_check(request):
-    """Health check endpoint"""
-    return JsonResponse({"status": "healthy"})
\ No newline at end of file
+    """Health check endpoint; reports "degraded" while a DeepSeek circuit breaker of this process is not closed"""
+    breakers = breaker_states()
+    healthy = all(breaker["state"] == "closed" for breaker in breakers.values())
+    return JsonResponse({"status": "healthy" if healthy else "degraded", "circuit_breakers": breakers})
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+岗位粗排：在调用 DeepSeek 之前，用 NumPy 对整个岗位目录打分，只把前 K 个岗位交给大模型精排。
+
+打分维度（权重见 settings.JOB_RANKING["WEIGHTS"]）：
+- skills: 简历技能与岗位 skills 的重合度（熟练技能权重高于了解技能）
+- education: 简历最高学历是否满足岗位学历要求
+- experience: 简历工作年限是否满足岗位经验要求
+- location: 期望地点是否出现在岗位地点中
+"""
+import re
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .skill_index import SkillIndex, skill_tokens
+
+DEFAULT_RANKING_SETTINGS = {
+    "TOP_K": 30,
+    "FAMILIAR_SKILL_WEIGHT": 0.6,
+    "WEIGHTS": {
+        "skills": 0.5,
+        "experience": 0.2,
+        "education": 0.2,
+        "location": 0.1,
+    },
+}
+
+# 学历等级：0 表示不限
+EDUCATION_LEVELS = (
+    (4, ('博士', 'phd', 'doctor')),
+    (3, ('硕士', '研究生', 'master', 'msc', 'mba')),
+    (2, ('本科', '学士', 'bachelor', 'undergraduate')),
+    (1, ('大专', '专科', 'associate', 'college', 'diploma')),
+)
+
+YEAR_RANGE_RE = re.compile(r'(\d+)\s*(?:-\s*\d+\s*)?年')
+YEAR_RE = re.compile(r'(19|20)\d{2}')
+
+
+def ranking_setting(name):
+    return getattr(settings, 'JOB_RANKING', {}).get(name, DEFAULT_RANKING_SETTINGS[name])
+
+
+def education_level(text):
+    """将学历描述映射为等级，无法识别时返回 0"""
+    text = str(text or '').casefold()
+    for level, keywords in EDUCATION_LEVELS:
+        if any(keyword in text for keyword in keywords):
+            return level
+    return 0
+
+
+def required_years(text):
+    """解析岗位经验要求的最低年限，如 “3-5年” -> 3，“经验不限”/“在校/应届” -> 0"""
+    text = str(text or '')
+    match = YEAR_RANGE_RE.search(text)
+    if not match or '以内' in text:
+        return 0
+    return int(match.group(1))
+
+
+def resume_skill_weights(resume_data):
+    """简历技能 -> 权重，熟练为 1，了解为 FAMILIAR_SKILL_WEIGHT"""
+    skills = resume_data.get('skills') or {}
+    if isinstance(skills, dict):
+        proficient = skills.get('proficient', [])
+        familiar = skills.get('familiar', [])
+    else:
+        proficient, familiar = skills, []
+    weights = {}
+    for skill in familiar:
+        for token in skill_tokens(skill):
+            weights[token] = ranking_setting("FAMILIAR_SKILL_WEIGHT")
+    for skill in proficient:
+        for token in skill_tokens(skill):
+            weights[token] = 1.0
+    return weights
+
+
+def resume_education_level(resume_data):
+    degrees = [(resume_data.get('personal') or {}).get('degree', '')]
+    education = resume_data.get('education') or []
+    if isinstance(education, list):
+        degrees.extend(edu.get('degree', '') for edu in education if isinstance(edu, dict))
+    else:
+        degrees.append(education)
+    return max(education_level(degree) for degree in degrees)
+
+
+def resume_years(resume_data):
+    """根据经历的起止年份估算工作年限"""
+    total = 0
+    for exp in resume_data.get('experiences') or []:
+        if not isinstance(exp, dict):
+            continue
+        years = [int(m.group(0)) for m in YEAR_RE.finditer(str(exp.get('period', '')))]
+        if years:
+            total += max(years) - min(years)
+    return total
+
+
+def resume_location(resume_data):
+    preferred = str(resume_data.get('preferred_location') or '').strip().casefold()
+    return '' if preferred == 'not specified' else preferred
+
+
+def ranking_profile(resume_data):
+    """粗排实际使用的简历特征，用于推荐缓存指纹"""
+    resume_data = resume_data or {}
+    return {
+        "skills": sorted(resume_skill_weights(resume_data).items()),
+        "education": resume_education_level(resume_data),
+        "years": resume_years(resume_data),
+        "location": resume_location(resume_data),
+        "top_k": ranking_setting("TOP_K"),
+    }
+
+
+class JobRanker:
+    """基于某一版本岗位目录预计算的特征矩阵"""
+
+    def __init__(self, jobs):
+        self.jobs = tuple(jobs)
+        self.index = SkillIndex(self.jobs)
+        self.education = np.array([education_level(job.get('education')) for job in self.jobs], dtype=np.int8)
+        self.experience = np.array([required_years(job.get('experience')) for job in self.jobs], dtype=np.float32)
+        self.locations = np.array([str(job.get('location', '')).casefold() for job in self.jobs], dtype=str)
+
+    def score(self, resume_data, positions=None):
+        """返回岗位的综合得分（0-1）；positions 为空时对整个目录打分"""
+        weights = ranking_setting("WEIGHTS")
+        matched, _ = self.index.weighted_matches(resume_skill_weights(resume_data))
+        return self._combine(resume_data, matched, slice(None) if positions is None else positions, weights)
+
+    def _combine(self, resume_data, matched, positions, weights):
+        skills = matched[positions] / np.maximum(self.index.skill_counts[positions], 1)
+
+        level = resume_education_level(resume_data)
+        education = np.clip(1.0 - 0.5 * (self.education[positions] - level), 0.0, 1.0)
+
+        years = resume_years(resume_data)
+        required = self.experience[positions]
+        experience = np.clip(1.0 - (required - years) / np.maximum(required, 1), 0.0, 1.0)
+
+        preferred = resume_location(resume_data)
+        if preferred:
+            location = (np.char.find(self.locations[positions], preferred) >= 0).astype(np.float32)
+        else:
+            location = np.ones(len(skills), dtype=np.float32)
+
+        return (weights["skills"] * skills
+                + weights["education"] * education
+                + weights["experience"] * experience
+                + weights["location"] * location)
+
+    def top_k(self, resume_data, k=None):
+        """返回得分最高的 K 个岗位（按得分降序），结果与对整个目录打分一致
+
+        候选集先由技能倒排索引生成（命中任一技能的岗位）。未命中技能的岗位技能得分为 0，
+        最高只能得到其余维度的权重之和；候选中第 K 名的得分高于这个上界时，候选的前 K 个就是
+        整个目录的前 K 个。否则（包括候选不足 K 个，或候选已覆盖大半个目录、整体向量运算更快时）
+        对整个目录打分。
+        """
+        k = k or ranking_setting("TOP_K")
+        weights = ranking_setting("WEIGHTS")
+        matched, positions = self.index.weighted_matches(resume_skill_weights(resume_data))
+        if k <= len(positions) and len(positions) * 2 <= len(self.jobs):
+            scores = self._combine(resume_data, matched, positions, weights)
+            best = np.argpartition(-scores, k - 1)[:k]
+            unmatched_bound = sum(weight for name, weight in weights.items() if name != "skills")
+            if scores[best].min() > unmatched_bound:
+                return self._ordered(positions, scores, best)
+
+        positions = np.arange(len(self.jobs))
+        scores = self._combine(resume_data, matched, slice(None), weights)
+        best = np.argpartition(-scores, k - 1)[:k] if len(positions) > k else positions
+        return self._ordered(positions, scores, best)
+
+    def _ordered(self, positions, scores, best):
+        order = best[np.argsort(-scores[best], kind='stable')]
+        return [self.jobs[i] for i in positions[order]]
+
+
+_rankers = {}
+_rankers_lock = threading.Lock()
+
+
+def get_ranker(catalog):
+    """按目录版本复用特征矩阵，目录更新后重新构建"""
+    ranker = _rankers.get(catalog.version)
+    if ranker is None:
+        ranker = JobRanker(catalog.jobs)
+        with _rankers_lock:
+            _rankers.clear()
+            _rankers[catalog.version] = ranker
+    return ranker
+
+
+def rank_jobs(catalog, resume_data, k=None):
+    """对岗位目录粗排，返回前 K 个候选岗位"""
+    return get_ranker(catalog).top_k(resume_data, k)
+
+
+def get_skill_index(catalog):
+    """当前目录版本的技能倒排索引，供候选集生成/检索使用"""
+    return get_ranker(catalog).index
@@ -0,0 +1,475 @@
+"""
+岗位推荐、技能检索和 JD 分析的业务逻辑。
+
+recommend_jobs / search_jobs / analyze_job 接收用户 ID 和请求数据，返回 DRF Response，
+由视图和后台任务（common.tasks）共用，不依赖请求对象。
+"""
+import json
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from common.admission import AdmissionRejected
+from common.job_catalog import get_job_catalog
+from common.llm_cache import cached_chat_content
+from common.recommendation_cache import (
+    build_resume_info,
+    get_recommendations,
+    get_user_fingerprint,
+    remember_resume,
+    set_recommendations,
+)
+from resume.repository import get_resume
+from .ranking import get_skill_index, rank_jobs
+from .skill_index import normalize_skills
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+def recommend_jobs(user_id, data=None):
+    """为用户推荐岗位：推荐缓存 → 本地粗排 → DeepSeek 精排"""
+    try:
+        catalog = get_job_catalog().snapshot()
+        if not catalog.jobs:
+            return Response(
+                {"error": "No jobs available for recommendation"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # 检查缓存：已知简历指纹时无需读取 Firestore
+        fingerprint = get_user_fingerprint(user_id)
+        cached_result = get_recommendations(fingerprint, catalog.version)
+        if cached_result is not None:
+            return Response(cached_result)
+
+        # 获取用户简历
+        resume_data = get_resume(user_id)
+        if not resume_data:
+            return Response({'error': 'Resume data not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # 内容相同的简历共享缓存
+        fingerprint = remember_resume(user_id, resume_data)
+        cached_result = get_recommendations(fingerprint, catalog.version)
+        if cached_result is not None:
+            return Response(cached_result)
+
+        # 并发的相同请求（重复点击、前端重试）生成相同的提示，DeepSeek 调用由 cached_chat_content 合并为一次
+        recommended_jobs = compute_recommendations(resume_data, catalog, fingerprint)
+
+        return Response(recommended_jobs)
+
+    except AdmissionRejected as e:
+        return Response(e.response_data(), status=e.status_code, headers=e.headers())
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def compute_recommendations(resume_data, catalog, fingerprint):
+    """粗排 + DeepSeek 精排，结果写入推荐缓存"""
+    # 本地粗排，只把前 K 个岗位交给大模型
+    jobs = rank_jobs(catalog, resume_data)
+
+    # 构建提示
+    prompt = build_recommendation_prompt(resume_data, jobs)
+
+    # 调用DeepSeek API
+    recommendations = call_recommendation_api(prompt)
+
+    # 处理推荐结果
+    recommended_jobs = process_recommendations(recommendations, jobs)
+
+    # 将结果存入缓存（键包含目录版本，岗位更新后自动失效）
+    set_recommendations(fingerprint, catalog.version, recommended_jobs)
+    return recommended_jobs
+
+
+def build_recommendation_prompt(resume_data, jobs):
+    """构建DeepSeek提示"""
+    # 提取简历关键信息（与缓存指纹使用同一组字段）
+    resume_info = build_resume_info(resume_data)
+
+    # 格式化简历信息
+    resume_str = json.dumps(resume_info, indent=2, ensure_ascii=False)
+
+    # 格式化岗位信息
+    jobs_str = "[\n"
+    for job in jobs:
+        job_info = {
+            "id": job['id'],
+            "title": job.get('title', ''),
+            "company": job.get('company', ''),
+            "location": job.get('location', ''),
+            "salary": job.get('salary', ''),
+            "required_skills": job.get('skills', []),
+            "required_experience": job.get('experience', ''),
+            "required_education": job.get('education', ''),
+            "description": job.get('description', '')
+        }
+        jobs_str += f"  {json.dumps(job_info, ensure_ascii=False)},\n"
+    jobs_str = jobs_str.rstrip(",\n") + "\n]"
+
+    # 构建完整提示
+    prompt = f"""
+    你是一个专业的职业顾问，需要根据用户的简历信息，从可用岗位中推荐最匹配的3-5个岗位。
+    请仔细分析用户的技能、经验和教育背景，找出最符合的岗位。
+
+    ===== 用户简历信息 =====
+    {resume_str}
+
+    ===== 可用岗位列表 =====
+    {jobs_str}
+
+    ===== 任务要求 =====
+    1. 请推荐3-5个最匹配的岗位
+    2. 为每个推荐岗位提供:
+       - id: 岗位ID (字符串)
+       - matchScore: 匹配度评分 (0-100的整数)
+       - reason: 推荐理由 (1-2句话)
+    3. 匹配度评分应基于技能匹配度、经验匹配度、教育匹配度和地点匹配度
+    4. 推荐理由应简洁明了，说明为什么这个岗位适合用户
+
+    ===== 输出格式 =====
+    请严格返回JSON格式的数组，每个元素是一个对象，包含以下字段:
+    [
+      {{
+        "id": "岗位ID",
+        "matchScore": 85,
+        "reason": "您的Java技能与岗位要求高度匹配，且工作经验符合要求"
+      }},
+      {{
+        "id": "岗位ID",
+        "matchScore": 78,
+        "reason": "您的教育背景与岗位要求一致，技能部分匹配"
+      }}
+    ]
+
+    重要提示:
+    1. 只返回JSON数组，不要包含任何其他内容
+    2. 确保JSON格式完全正确
+    3. 岗位ID必须与输入中的完全一致
+    """
+    # 构建完整英文提示
+    prompt = f"""
+    You are a professional career advisor. Your task is to recommend 3-5 most suitable jobs from the available positions based on the user's resume. 
+    Please carefully analyze the user's skills, experience and education background to find the best matches.
+
+    ===== User Resume Information =====
+    {resume_str}
+
+    ===== Available Job Positions =====
+    {jobs_str}
+
+    ===== Task Requirements =====
+    1. Recommend 3-5 most suitable jobs
+    2. For each recommended job, provide:
+       - id: Job ID (string)
+       - matchScore: Matching score (integer between 0-100)
+       - reason: Recommendation reason (1-2 sentences in English)
+    3. The matching score should be based on:
+       - Skills match (40%)
+       - Experience match (30%)
+       - Education match (30%)
+    4. The recommendation reason should be concise and explain why this job is suitable for the user
+
+    ===== Output Format =====
+    Return ONLY a JSON array with the following structure:
+    [
+      {{
+        "id": "job_id_1",
+        "matchScore": 85,
+        "reason": "Your Java skills perfectly match the job requirements and your experience aligns with the position."
+      }},
+      {{
+        "id": "job_id_2",
+        "matchScore": 78,
+        "reason": "Your educational background is ideal for this role and your skills are a strong match."
+      }}
+    ]
+
+    Important Notes:
+    1. Return ONLY the JSON array, no other content
+    2. Ensure the JSON format is strictly correct
+    3. Job IDs must match exactly with the input data
+    4. Reason must be in English
+    """
+
+    return prompt.strip()
+
+
+def build_recommendation_payload(prompt):
+    """构建DeepSeek请求体（全英文）"""
+    return {
+        "model": "deepseek-chat",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a professional career advisor. Think and respond in English."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.4,  # 降低随机性，提高准确性
+        "max_tokens": 3000,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def call_recommendation_api(prompt):
+    """调用DeepSeek API获取推荐（全英文）"""
+    content = cached_chat_content(build_recommendation_payload(prompt), 'jobs.recommend', timeout=60)
+    return parse_deepseek_content(content)
+
+
+def process_recommendations(recommendations, all_jobs):
+    """处理推荐结果，构建最终响应（全英文）"""
+    # 创建ID到岗位的映射
+    job_map = {job['id']: job for job in all_jobs}
+
+    recommended_jobs = []
+
+    # 确保recommendations是列表
+    if not isinstance(recommendations, list):
+        recommendations = []
+
+    for rec in recommendations:
+        if not isinstance(rec, dict):
+            continue
+
+        job_id = rec.get('id')
+        match_score = rec.get('matchScore', 0)
+        reason = rec.get('reason', '')
+
+        if not job_id:
+            continue
+
+        job = job_map.get(job_id)
+        if not job:
+            continue
+
+        # 构建响应对象（符合接口要求）
+        job_rec = {
+            **job_fields(job),
+            "matchScore": match_score,
+            "reason": reason,  # 英文理由
+        }
+
+        recommended_jobs.append(job_rec)
+
+    # 按匹配度排序
+    recommended_jobs.sort(key=lambda x: x['matchScore'], reverse=True)
+
+    return recommended_jobs
+
+
+def job_fields(job):
+    """岗位对外返回的字段"""
+    return {
+        "id": job['id'],  # 保持字符串ID
+        "title": job.get('title', ''),
+        "company": job.get('company', ''),
+        "location": job.get('location', ''),
+        "salary": job.get('salary', ''),
+        "tags": job.get('skills', []),
+        "description": job.get('description', '')
+    }
+
+
+def search_jobs(user_id, data):
+    """
+    按技能检索岗位：match="all"（默认）取各技能 posting list 的交集，match="any" 取并集，
+    可选按地点过滤；结果按命中的技能数降序，同分时保持目录顺序。
+    """
+    skills = data.get('skills') or []
+    if isinstance(skills, str):
+        skills = [skills]
+    match = data.get('match') or 'all'
+    if not skills or match not in ('all', 'any'):
+        return Response(
+            {"error": "Provide skills and match=all|any"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(max(int(data.get('limit') or SEARCH_DEFAULT_LIMIT), 1), SEARCH_MAX_LIMIT)
+    except (TypeError, ValueError):
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    catalog = get_job_catalog().snapshot()
+    index = get_skill_index(catalog)
+    positions = index.intersection(skills) if match == 'all' else index.union(skills)
+
+    location = str(data.get('location') or '').strip().casefold()
+    if location:
+        positions = [i for i in positions if location in str(catalog.jobs[i].get('location', '')).casefold()]
+
+    if match == 'any' and len(positions):
+        # 命中技能数 = 各技能 posting list 中出现的次数
+        matched, _ = index.weighted_matches({token: 1.0 for token in normalize_skills(skills)})
+        positions = sorted(positions, key=lambda i: -matched[i])
+
+    return Response({
+        "total": len(positions),
+        "jobs": [job_fields(catalog.jobs[i]) for i in positions[:limit]],
+    })
+
+
+def analyze_job(user_id, data):
+    """分析简历与 JD（data["jobDescription"]）的匹配度"""
+    try:
+        # 获取JD文本
+        job_description = data.get('jobDescription')
+
+        if not job_description:
+            return Response(
+                {"error": "Missing job_description in request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # 获取用户简历
+        resume_data = get_resume(user_id)
+
+        # 构建全英文提示
+        prompt = build_analysis_prompt(resume_data, job_description)
+
+        # 调用DeepSeek API
+        analysis_result = call_analysis_api(prompt)
+
+        # 处理分析结果
+        report = process_analysis_result(analysis_result)
+
+        return Response(report)
+
+    except AdmissionRejected as e:
+        return Response(e.response_data(), status=e.status_code, headers=e.headers())
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def build_analysis_prompt(resume_data, job_description):
+    """构建全英文提示"""
+    # 提取简历关键信息（英文）
+    resume_info = {
+        "skills": resume_data.get("skills", []),
+        "experience": resume_data.get("experience", "Not specified"),
+        "education": resume_data.get("education", "Not specified"),
+        "honors": resume_data.get("honors", "Not specified"),
+        "projects": resume_data.get("projects", []),
+        "summary": resume_data.get("summary", "")
+    }
+
+    # 构建完整英文提示
+    prompt = f"""
+    You are a professional career advisor. Your task is to analyze how well a candidate's resume matches a given job description (JD). 
+    Please carefully compare the resume information with the job requirements and provide a detailed matching analysis.
+
+    ===== Job Description =====
+    {job_description}
+
+    ===== Candidate Resume Information =====
+    {json.dumps(resume_info, indent=2, ensure_ascii=False)}
+
+    ===== Task Requirements =====
+    1. Provide an overall match score (0-100) based on how well the resume matches the JD requirements.
+    2. Clearly list the strengths - areas where the resume matches the JD requirements (skills, experience, etc.).
+    3. Clearly list the gaps - areas where the resume is missing or weak compared to the JD requirements.
+    4. For each gap, provide practical suggestions on how to improve the resume.
+    5. Provide a brief summary of the analysis.
+
+    ===== Output Format =====
+    Return ONLY a JSON object with the following structure:
+    {{
+      "matchScore": 85,
+      "summary": "Overall, the candidate has strong technical skills but lacks specific industry experience.",
+      "strengths": [
+        "5+ years of Python development experience matches the required seniority level",
+        "Experience with Django and Flask frameworks aligns with backend requirements"
+      ],
+      "gaps": [
+        "Lacks AWS cloud experience - suggested adding AWS certification or project experience",
+        "No experience with microservices architecture - suggested highlighting relevant distributed systems projects"
+      ]
+    }}
+
+    Important Notes:
+    1. Return ONLY the JSON object, no other content
+    2. Ensure the JSON format is strictly correct
+    3. Match score should be an integer between 0-100
+    4. Strengths and gaps should be concise bullet points
+    5. Suggestions should be actionable and practical
+    """
+
+    return prompt.strip()
+
+
+def build_analysis_payload(prompt):
+    """构建DeepSeek请求体（全英文）"""
+    return {
+        "model": "deepseek-chat",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a professional career advisor specializing in resume-JD matching analysis. Think and respond in English."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.3,  # 降低随机性，提高准确性
+        "max_tokens": 2000,
+        "response_format": {"type": "json_object"}
+    }
+
+
+def call_analysis_api(prompt):
+    """调用DeepSeek API获取分析报告（全英文）"""
+    content = cached_chat_content(build_analysis_payload(prompt), 'jobs.analyze', timeout=60)
+    return parse_deepseek_content(content, '{}')
+
+
+def process_analysis_result(analysis_result):
+    """处理分析结果，构建最终响应"""
+    # 确保分析结果包含所有必需字段
+    match_score = analysis_result.get('matchScore', 0)
+    summary = analysis_result.get('summary', 'No summary provided')
+    strengths = analysis_result.get('strengths', [])
+    gaps = analysis_result.get('gaps', [])
+
+    # 构建响应对象
+    report = {
+        "matchScore": match_score,
+        "summary": summary,
+        "strengths": strengths,
+        "gaps": gaps
+    }
+
+    return report
+
+
+def parse_deepseek_content(content, brackets='[]'):
+    """解析DeepSeek返回的JSON内容（brackets 为期望的顶层结构：数组 '[]' 或对象 '{}'）"""
+    # 尝试解析JSON内容
+    try:
+        # 直接尝试解析
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        # 尝试提取JSON部分
+        start_idx = content.find(brackets[0])
+        end_idx = content.rfind(brackets[1]) + 1
+        if start_idx != -1 and end_idx != -1:
+            json_str = content[start_idx:end_idx]
+            try:
+                return json.loads(json_str)
+            except json.JSONDecodeError:
+                pass
+
+        # 如果所有尝试都失败，记录完整响应
+        raise ValueError("Failed to parse DeepSeek JSON response")
@@ -0,0 +1,122 @@
+"""
+岗位技能倒排索引：规范化技能词 -> 岗位位置（有序 int32 数组）。
+
+规范化规则：
+- 大小写折叠，去掉空白、连字符、下划线（"Spring Cloud" / "spring-cloud" -> "springcloud"）；
+- "MySQL/Redis/MongoDB" 这类组合条目按分隔符拆成多个技能词；
+- 通过别名表归并同义写法（"Golang" -> "go"，"K8s" -> "kubernetes"）；
+- 丢弃 CSV 中连续逗号产生的空词。
+"""
+import re
+from functools import reduce
+
+import numpy as np
+from django.conf import settings
+
+SKILL_SEPARATORS_RE = re.compile(r'[/,，、;；|]+')
+SKILL_NOISE_RE = re.compile(r'[\s\-_]+')
+
+# 规范化后的写法 -> 统一技能词
+DEFAULT_SKILL_ALIASES = {
+    'golang': 'go',
+    'go语言': 'go',
+    'k8s': 'kubernetes',
+    'js': 'javascript',
+    'ts': 'typescript',
+    'postgres': 'postgresql',
+    'pgsql': 'postgresql',
+    'es': 'elasticsearch',
+    'mssql': 'sqlserver',
+    'dotnet': '.net',
+    'csharp': 'c#',
+    'cpp': 'c++',
+    'vuejs': 'vue',
+    'reactjs': 'react',
+    'nodejs': 'node.js',
+    'node': 'node.js',
+    'springboot2': 'springboot',
+    'qt5': 'qt',
+}
+
+
+def _aliases():
+    aliases = dict(DEFAULT_SKILL_ALIASES)
+    for alias, canonical in getattr(settings, 'JOB_SKILL_ALIASES', {}).items():
+        aliases[_compact(alias)] = _compact(canonical)
+    return aliases
+
+
+def _compact(token):
+    return SKILL_NOISE_RE.sub('', str(token).casefold())
+
+
+def skill_tokens(skill, aliases=None):
+    """将一条技能描述拆分并规范化为技能词列表（可能为空）"""
+    aliases = _aliases() if aliases is None else aliases
+    tokens = []
+    for part in SKILL_SEPARATORS_RE.split(str(skill or '')):
+        token = _compact(part)
+        if token:
+            tokens.append(aliases.get(token, token))
+    return tokens
+
+
+def normalize_skills(skills, aliases=None):
+    """规范化一组技能，返回去重后的技能词集合"""
+    aliases = _aliases() if aliases is None else aliases
+    return {token for skill in skills or () for token in skill_tokens(skill, aliases)}
+
+
+class SkillIndex:
+    """技能倒排索引，posting list 为岗位在目录中的位置"""
+
+    def __init__(self, jobs):
+        self.job_ids = tuple(job['id'] for job in jobs)
+        aliases = _aliases()
+        postings = {}
+        counts = np.zeros(len(self.job_ids), dtype=np.float32)
+        for position, job in enumerate(jobs):
+            tokens = normalize_skills(job.get('skills', ()), aliases)
+            counts[position] = len(tokens)
+            for token in tokens:
+                postings.setdefault(token, []).append(position)
+        # 按位置顺序追加，数组天然有序
+        self.postings = {token: np.asarray(positions, dtype=np.int32) for token, positions in postings.items()}
+        self.skill_counts = counts
+        self._empty = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.postings)
+
+    def lookup(self, skill):
+        """单个技能描述的 posting list（组合条目取并集）"""
+        tokens = skill_tokens(skill)
+        return self.union(tokens) if len(tokens) != 1 else self.postings.get(tokens[0], self._empty)
+
+    def union(self, skills):
+        """包含任一技能的岗位位置（有序）"""
+        lists = [self.postings[t] for t in normalize_skills(skills) if t in self.postings]
+        if not lists:
+            return self._empty
+        return np.unique(np.concatenate(lists))
+
+    def intersection(self, skills):
+        """同时包含所有技能的岗位位置（有序，从最短的 posting list 开始求交）"""
+        tokens = normalize_skills(skills)
+        if not tokens or any(t not in self.postings for t in tokens):
+            return self._empty
+        lists = sorted((self.postings[t] for t in tokens), key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists)
+
+    def ids(self, positions):
+        """岗位位置 -> 岗位ID"""
+        return [self.job_ids[i] for i in positions]
+
+    def weighted_matches(self, skill_weights):
+        """按技能权重累加每个岗位命中的技能，返回 (得分数组, 候选位置)"""
+        scores = np.zeros(len(self.job_ids), dtype=np.float32)
+        for token, weight in skill_weights.items():
+            positions = self.postings.get(token)
+            if positions is not None and weight > 0:
+                scores[positions] += weight
+        return scores, np.flatnonzero(scores).astype(np.int32)
@@ -1,3 +1,332 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from common.single_flight import _lock_key, _result_key, single_flight
+from .ranking import JobRanker, education_level, required_years, resume_years
+from .services import search_jobs
+from .skill_index import SkillIndex, normalize_skills, skill_tokens
+
+
+class SkillTokensTests(SimpleTestCase):
+    """技能词规范化：大小写、分隔符、别名"""
+
+    def assertSameToken(self, spellings, expected):
+        for spelling in spellings:
+            with self.subTest(spelling=spelling):
+                self.assertEqual(skill_tokens(spelling), [expected])
+
+    def test_case_whitespace_and_separators_fold(self):
+        self.assertSameToken(['Spring Cloud', 'spring-cloud', 'SPRING_CLOUD', ' springcloud '], 'springcloud')
+
+    def test_node_spellings_fold_to_one_token(self):
+        self.assertSameToken(['Node.js', 'node.js', 'NodeJS', 'nodejs', 'Node', 'node-js'], 'node.js')
+
+    def test_short_aliases(self):
+        self.assertSameToken(['ts', 'TS', 'TypeScript'], 'typescript')
+        self.assertSameToken(['js', 'JavaScript'], 'javascript')
+        self.assertSameToken(['Golang', 'go语言', 'Go'], 'go')
+        self.assertSameToken(['K8s', 'kubernetes'], 'kubernetes')
+
+    def test_symbols_are_kept(self):
+        self.assertEqual(skill_tokens('C++'), ['c++'])
+        self.assertEqual(skill_tokens('C#'), ['c#'])
+        self.assertEqual(skill_tokens('cpp'), ['c++'])
+        self.assertEqual(skill_tokens('.NET'), ['.net'])
+
+    def test_combined_entries_are_split(self):
+        self.assertEqual(skill_tokens('MySQL/Redis、MongoDB；Kafka'), ['mysql', 'redis', 'mongodb', 'kafka'])
+
+    def test_empty_parts_are_dropped(self):
+        self.assertEqual(skill_tokens('Java,,  ,Python'), ['java', 'python'])
+        self.assertEqual(skill_tokens(''), [])
+        self.assertEqual(skill_tokens(None), [])
+
+    def test_normalize_skills_deduplicates(self):
+        self.assertEqual(normalize_skills(['Node.js', 'nodejs', 'TS', 'TypeScript']), {'node.js', 'typescript'})
+        self.assertEqual(normalize_skills(None), set())
+
+    @override_settings(JOB_SKILL_ALIASES={'Vue 3': 'Vue', 'py': 'python'})
+    def test_aliases_from_settings_are_normalized(self):
+        self.assertEqual(skill_tokens('vue3'), ['vue'])
+        self.assertEqual(skill_tokens('PY'), ['python'])
+        # 内置别名仍然生效
+        self.assertEqual(skill_tokens('golang'), ['go'])
+
+
+class SkillIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = SkillIndex([
+            {'id': 'a', 'skills': ['Node.js', 'TypeScript', 'MySQL/Redis']},
+            {'id': 'b', 'skills': ['nodejs', 'Golang']},
+            {'id': 'c', 'skills': ['Java', 'Spring Cloud']},
+            {'id': 'd', 'skills': []},
+        ])
+
+    def test_postings_use_normalized_tokens(self):
+        self.assertEqual(self.index.postings['node.js'].tolist(), [0, 1])
+        self.assertEqual(self.index.postings['springcloud'].tolist(), [2])
+        self.assertNotIn('nodejs', self.index.postings)
+        self.assertEqual(self.index.skill_counts.tolist(), [4, 2, 2, 0])
+
+    def test_weighted_matches(self):
+        scores, positions = self.index.weighted_matches({'node.js': 1.0, 'typescript': 0.5, 'go': 0.6})
+        np.testing.assert_allclose(scores, [1.5, 1.6, 0.0, 0.0])
+        self.assertEqual(positions.tolist(), [0, 1])
+
+    def test_weighted_matches_ignores_unknown_and_zero_weights(self):
+        scores, positions = self.index.weighted_matches({'rust': 1.0, 'java': 0})
+        self.assertFalse(scores.any())
+        self.assertEqual(positions.tolist(), [])
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup('NodeJS').tolist(), [0, 1])
+        # 组合条目取并集
+        self.assertEqual(self.index.lookup('Golang/Java').tolist(), [1, 2])
+        self.assertEqual(self.index.lookup('rust').tolist(), [])
+
+    def test_union(self):
+        self.assertEqual(self.index.union(['typescript', 'go', 'java']).tolist(), [0, 1, 2])
+        self.assertEqual(self.index.union(['rust']).tolist(), [])
+
+    def test_intersection(self):
+        self.assertEqual(self.index.intersection(['Node.js', 'golang']).tolist(), [1])
+        self.assertEqual(self.index.intersection(['node', 'redis', 'ts']).tolist(), [0])
+        # 任一技能没有岗位时交集为空
+        self.assertEqual(self.index.intersection(['node.js', 'rust']).tolist(), [])
+        self.assertEqual(self.index.intersection([]).tolist(), [])
+
+    def test_ids(self):
+        self.assertEqual(self.index.ids(self.index.lookup('node.js')), ['a', 'b'])
+
+
+class RankingFeatureTests(SimpleTestCase):
+    """粗排特征：学历等级、经验要求和简历工作年限的解析"""
+
+    def test_education_level(self):
+        self.assertEqual(education_level('博士'), 4)
+        self.assertEqual(education_level('硕士及以上'), 3)
+        self.assertEqual(education_level('Bachelor of Science'), 2)
+        self.assertEqual(education_level('大专'), 1)
+        self.assertEqual(education_level('学历不限'), 0)
+        self.assertEqual(education_level(None), 0)
+
+    def test_required_years(self):
+        self.assertEqual(required_years('3-5年'), 3)
+        self.assertEqual(required_years('10年以上'), 10)
+        self.assertEqual(required_years('1年以内'), 0)
+        self.assertEqual(required_years('经验不限'), 0)
+        self.assertEqual(required_years('在校/应届'), 0)
+        self.assertEqual(required_years(None), 0)
+
+    def test_resume_years(self):
+        resume = {'experiences': [
+            {'period': '2018-2021'},
+            {'period': '2021.07 - 2024.03'},
+            {'period': '至今'},
+            'not a dict',
+        ]}
+        self.assertEqual(resume_years(resume), 6)
+        self.assertEqual(resume_years({}), 0)
+
+
+class TopKTests(SimpleTestCase):
+    """粗排前 K：倒排索引候选集的结果与对整个目录打分一致"""
+
+    RESUME = {
+        'personal': {'degree': '本科'},
+        'skills': {'proficient': ['Python'], 'familiar': ['Redis']},
+        'experiences': [{'period': '2020-2024'}],
+        'preferred_location': '上海',
+    }
+
+    def make_jobs(self, matching, unmatched):
+        # 命中技能的岗位学历、经验和地点都不满足；未命中的岗位其余维度全部满足
+        jobs = [{'id': f'm{i}', 'skills': ('Python', 'Go', 'Java', 'C++', 'Rust', 'Kafka', 'Vue'),
+                 'education': '博士', 'experience': '10年以上', 'location': '北京'} for i in range(matching)]
+        jobs += [{'id': f'u{i}', 'skills': ('Swift',), 'education': '本科',
+                  'experience': '1-3年', 'location': '上海'} for i in range(unmatched)]
+        return jobs
+
+    def full_ranking(self, ranker, k):
+        scores = ranker.score(self.RESUME)
+        order = np.argsort(-scores, kind='stable')[:k]
+        return sorted(round(float(scores[i]), 6) for i in order)
+
+    def scores_of(self, ranker, jobs):
+        scores = ranker.score(self.RESUME)
+        index = {job['id']: i for i, job in enumerate(ranker.jobs)}
+        return sorted(round(float(scores[index[job['id']]]), 6) for job in jobs)
+
+    def test_unmatched_jobs_above_the_candidates_are_included(self):
+        ranker = JobRanker(self.make_jobs(matching=3, unmatched=10))
+        top = ranker.top_k(self.RESUME, k=3)
+        # 命中技能的候选得分 < 0.5，未命中技能但其余维度满分的岗位得分为 0.5
+        self.assertEqual([job['id'][0] for job in top], ['u', 'u', 'u'])
+        self.assertEqual(self.scores_of(ranker, top), self.full_ranking(ranker, 3))
+
+    def test_candidates_above_the_bound_skip_the_full_scan(self):
+        jobs = [{'id': f'm{i}', 'skills': ('Python', 'Redis'), 'education': '本科',
+                 'experience': '1-3年', 'location': '上海'} for i in range(3)]
+        jobs += self.make_jobs(matching=0, unmatched=10)
+        ranker = JobRanker(jobs)
+        with mock.patch.object(ranker, '_combine', wraps=ranker._combine) as combine:
+            top = ranker.top_k(self.RESUME, k=3)
+        self.assertEqual([job['id'] for job in top], ['m0', 'm1', 'm2'])
+        self.assertEqual(combine.call_count, 1)
+        self.assertEqual(len(combine.call_args.args[2]), 3)
+
+    def test_orders_by_score(self):
+        ranker = JobRanker(self.make_jobs(matching=2, unmatched=2))
+        top = ranker.top_k(self.RESUME, k=4)
+        scores = ranker.score(self.RESUME)
+        index = {job['id']: i for i, job in enumerate(ranker.jobs)}
+        ranked = [float(scores[index[job['id']]]) for job in top]
+        self.assertEqual(ranked, sorted(ranked, reverse=True))
+
+    def test_fewer_jobs_than_k(self):
+        ranker = JobRanker(self.make_jobs(matching=1, unmatched=1))
+        self.assertEqual(len(ranker.top_k(self.RESUME, k=5)), 2)
+        self.assertEqual(JobRanker([]).top_k(self.RESUME, k=5), [])
+
+
+class JobSearchTests(SimpleTestCase):
+    """技能检索：交集/并集候选集、地点过滤、排序和分页"""
+
+    JOBS = (
+        {'id': 'a', 'title': 'Backend', 'location': '上海', 'skills': ('Python', 'Django', 'Redis')},
+        {'id': 'b', 'title': 'Data', 'location': '北京', 'skills': ('Python', 'Spark')},
+        {'id': 'c', 'title': 'Web', 'location': '上海浦东', 'skills': ('Django', 'Vue')},
+        {'id': 'd', 'title': 'Ops', 'location': '深圳', 'skills': ('K8s', 'Go')},
+    )
+
+    def setUp(self):
+        catalog = mock.Mock(version='search-test', jobs=self.JOBS)
+        patcher = mock.patch('jobcenter.services.get_job_catalog', return_value=mock.Mock(snapshot=lambda: catalog))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def search(self, **data):
+        response = search_jobs('uid', data)
+        return response.status_code, response.data
+
+    def ids(self, data):
+        return [job['id'] for job in data['jobs']]
+
+    def test_all_skills_intersect(self):
+        status_code, data = self.search(skills=['python', 'DJANGO'])
+        self.assertEqual(status_code, 200)
+        self.assertEqual(self.ids(data), ['a'])
+        self.assertEqual(data['total'], 1)
+
+    def test_any_skill_unions_and_ranks_by_matches(self):
+        _, data = self.search(skills=['django', 'python', 'vue'], match='any')
+        self.assertEqual(self.ids(data), ['a', 'c', 'b'])
+
+    def test_comma_separated_skills(self):
+        _, data = self.search(skills='Python,Django')
+        self.assertEqual(self.ids(data), ['a'])
+
+    def test_location_filter(self):
+        _, data = self.search(skills=['django'], location='上海')
+        self.assertEqual(self.ids(data), ['a', 'c'])
+        _, data = self.search(skills=['python'], match='any', location='深圳')
+        self.assertEqual(data, {'total': 0, 'jobs': []})
+
+    def test_limit(self):
+        _, data = self.search(skills=['python', 'django'], match='any', limit='1')
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(self.ids(data), ['a'])
+
+    def test_response_fields(self):
+        _, data = self.search(skills=['kubernetes'])
+        self.assertEqual(data['jobs'][0]['id'], 'd')
+        self.assertEqual(data['jobs'][0]['tags'], ('K8s', 'Go'))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.search()[0], 400)
+        self.assertEqual(self.search(skills=['python'], match='most')[0], 400)
+        self.assertEqual(self.search(skills=['python'], limit='ten')[0], 400)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "single-flight"}},
+    SINGLE_FLIGHT={"POLL_INTERVAL": 0.01, "WAIT_TIMEOUT": 5},
+)
+class SingleFlightTests(SimpleTestCase):
+    """DeepSeek 调用的并发去重（推荐、JD 分析等都经过 cached_chat_content 的 single_flight）"""
+
+    def setUp(self):
+        cache.clear()
+
+    def run_leader_and_waiter(self, leader_compute, waiter_compute):
+        """领头请求先拿到锁，等待者在领头请求计算期间进入"""
+        results = {}
+
+        def run(name, compute):
+            try:
+                results[name] = single_flight('k', compute)
+            except Exception as e:
+                results[name] = e
+
+        leader = threading.Thread(target=run, args=('leader', leader_compute))
+        leader.start()
+        self.leader_started.wait(5)
+        waiter = threading.Thread(target=run, args=('waiter', waiter_compute))
+        waiter.start()
+        leader.join(5)
+        waiter.join(5)
+        return results
+
+    def test_concurrent_callers_share_one_computation(self):
+        self.leader_started = threading.Event()
+        calls = []
+
+        def leader_compute():
+            calls.append('leader')
+            self.leader_started.set()
+            time.sleep(0.1)
+            return {'jobs': [1]}
+
+        results = self.run_leader_and_waiter(leader_compute, lambda: calls.append('waiter'))
+        self.assertEqual(results, {'leader': {'jobs': [1]}, 'waiter': {'jobs': [1]}})
+        self.assertEqual(calls, ['leader'])
+
+    def test_waiter_takes_over_when_leader_fails(self):
+        self.leader_started = threading.Event()
+
+        def leader_compute():
+            self.leader_started.set()
+            time.sleep(0.1)
+            raise RuntimeError('upstream failed')
+
+        results = self.run_leader_and_waiter(leader_compute, lambda: 'recovered')
+        self.assertIsInstance(results['leader'], RuntimeError)
+        self.assertEqual(results['waiter'], 'recovered')
+        # 失败的领头请求释放了锁，且没有留下结果
+        self.assertIsNone(cache.get(_lock_key('k')))
+        self.assertEqual(cache.get(_result_key('k')), ('recovered',))
+
+    def test_none_result_is_shared(self):
+        self.leader_started = threading.Event()
+
+        def leader_compute():
+            self.leader_started.set()
+            time.sleep(0.1)
+
+        results = self.run_leader_and_waiter(leader_compute, lambda: 'recomputed')
+        self.assertEqual(results, {'leader': None, 'waiter': None})
+
+    def test_leader_keeps_a_lock_taken_over_after_expiry(self):
+        def compute():
+            # 领头请求超过锁超时，锁过期后被其他请求抢占
+            cache.set(_lock_key('k'), 42)
+            return 'done'
+
+        self.assertEqual(single_flight('k', compute), 'done')
+        self.assertEqual(cache.get(_lock_key('k')), 42)
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import JobRecommendationAPIView,JobAnalysisAPIView
+from .views import JobRecommendationAPIView,JobAnalysisAPIView,JobSearchAPIView
 urlpatterns = [
     path('recommend', JobRecommendationAPIView.as_view(), name='recommend-job'),
     path('analyze', JobAnalysisAPIView.as_view(), name='analyze-job'),
+    path('search', JobSearchAPIView.as_view(), name='search-job'),
 ]
\ No newline at end of file
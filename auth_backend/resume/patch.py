@@ -0,0 +1,151 @@
+"""
+简历的字段级修改（JSON Patch）。
+
+补丁在简历副本上整体应用，之后只校验被修改的部分：
+- 列表字段（education / experiences / honors）中被修改或新增的元素，用对应的子序列化器单独校验；
+- 其余字段（personal / skills / selfEvaluation），以及整体替换的列表字段，按整个字段校验。
+返回需要写回 Firestore 的顶层字段。
+"""
+import copy
+
+from common.json_patch import JSONPatchError, JSONPatchTestFailed, apply_operation, list_index, parse_pointer
+from .serializers import RESUME_SECTION_SERIALIZERS, validate_resume_item, validate_resume_section
+
+# 单个补丁的最大操作数
+MAX_PATCH_OPERATIONS = 100
+
+
+class ResumePatchError(Exception):
+    """补丁无法应用或修改后的内容校验失败"""
+
+    def __init__(self, message, details=None, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.details = details
+        self.status_code = status_code
+
+    def response_data(self):
+        data = {'error': self.message}
+        if self.details is not None:
+            data['details'] = self.details
+        return data
+
+
+def _section(tokens):
+    if not tokens or tokens[0] not in RESUME_SECTION_SERIALIZERS:
+        raise JSONPatchError(f"path must start with one of: /{', /'.join(RESUME_SECTION_SERIALIZERS)}")
+    return tokens[0]
+
+
+def _is_list_section(section):
+    return RESUME_SECTION_SERIALIZERS[section][1]
+
+
+def _item(document, section, token):
+    """列表字段中路径片段指向的元素（'-' 表示最后一个）"""
+    items = document.get(section)
+    if not isinstance(items, list):
+        raise JSONPatchError(f"/{section} is not a list")
+    if token == '-':
+        if not items:
+            raise JSONPatchError(f"/{section} is empty")
+        return items[-1]
+    return items[list_index(items, token)]
+
+
+class _PatchTracker:
+    """记录补丁修改了哪些字段、哪些列表元素"""
+
+    def __init__(self):
+        self.touched = []  # 需要写回的顶层字段
+        self.sections = set()  # 需要整体校验的字段
+        self.items = []  # 需要单独校验的列表元素：(字段, 元素)
+
+    def touch(self, section):
+        if section not in self.touched:
+            self.touched.append(section)
+
+    def before(self, document, op, tokens, from_tokens):
+        """操作执行前：记录会被原地修改的元素（元素对象在操作前后不变）"""
+        paths = [(tokens, op == 'remove')]
+        if op == 'move':
+            # move 会从原位置删除；copy 只读取来源
+            paths.append((from_tokens, True))
+        elif op == 'copy':
+            _section(from_tokens)
+        for path, removing in paths:
+            section = _section(path)
+            self.touch(section)
+            if len(path) == 1:
+                if removing:
+                    raise JSONPatchError(f"cannot remove /{section}")
+                self.sections.add(section)
+            elif not _is_list_section(section):
+                self.sections.add(section)
+            elif len(path) > 2:
+                self.items.append((section, _item(document, section, path[1])))
+
+    def after(self, document, op, tokens):
+        """操作执行后：记录新增或替换的元素"""
+        section = tokens[0]
+        if len(tokens) == 2 and _is_list_section(section) and op in ('add', 'replace', 'move', 'copy'):
+            index = len(document[section]) - 1 if tokens[1] == '-' else int(tokens[1])
+            self.items.append((section, document[section][index]))
+
+
+def apply_resume_patch(resume_data, operations):
+    """
+    在简历副本上应用补丁，返回 {顶层字段: 新值}（只包含被修改的字段）。
+
+    补丁格式错误、路径不存在或修改后的内容校验失败时抛出 ResumePatchError，
+    test 操作不通过时状态码为 409。
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ResumePatchError('Expected a non-empty JSON array of patch operations')
+    if len(operations) > MAX_PATCH_OPERATIONS:
+        raise ResumePatchError(f'At most {MAX_PATCH_OPERATIONS} operations per patch')
+
+    document = copy.deepcopy(resume_data)
+    tracker = _PatchTracker()
+    for position, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict):
+                raise JSONPatchError('operation must be an object')
+            op = operation.get('op')
+            tokens = parse_pointer(operation.get('path'))
+            from_tokens = parse_pointer(operation.get('from')) if op in ('move', 'copy') else None
+            if op == 'test':
+                _section(tokens)
+            else:
+                tracker.before(document, op, tokens, from_tokens)
+            apply_operation(document, operation)
+            if op != 'test':
+                tracker.after(document, op, tokens)
+        except JSONPatchTestFailed as e:
+            raise ResumePatchError(str(e), {'operation': position}, status_code=409)
+        except JSONPatchError as e:
+            raise ResumePatchError(f'Invalid patch operation: {e}', {'operation': position})
+
+    errors = {}
+    for section in tracker.sections:
+        validated, section_errors = validate_resume_section(section, document.get(section))
+        if section_errors:
+            errors[f'/{section}'] = section_errors
+        else:
+            document[section] = validated
+    for section, item in tracker.items:
+        if section in tracker.sections:
+            continue
+        # 元素可能已被之后的操作删除；按对象身份查找当前位置
+        index = next((i for i, current in enumerate(document[section]) if current is item), None)
+        if index is None:
+            continue
+        validated, item_errors = validate_resume_item(section, item)
+        if item_errors:
+            errors[f'/{section}/{index}'] = item_errors
+        else:
+            document[section][index] = validated
+    if errors:
+        raise ResumePatchError('Invalid resume data', errors)
+
+    return {section: document[section] for section in tracker.touched}
@@ -0,0 +1,184 @@
+"""
+简历文档的读写入口：Firestore + CACHES["default"]（Redis）读穿透缓存，按用户 ID 缓存整份简历。
+
+- 读取先查缓存，未命中时读 Firestore 并回填；不存在的简历也缓存一个短期的“空”标记；
+- 保存（整份覆盖）时直接写入缓存；局部更新后删除缓存，下次读取时重新加载
+  （并发的局部更新各自只知道自己的改动，合并结果可能不是 Firestore 中的最终内容）；
+- 删除后缓存“空”标记；
+- 回填使用 cache.add，不会覆盖写路径刚写入的值；其余的并发窗口由 TTL 兜底；
+- 与文档一起缓存其内容哈希（ETag），条件请求只读取这个短键，不读取整份简历；
+- 命中/未命中次数记录在缓存计数器中，由 /api/metrics 暴露。
+
+字段级修改（patch_resume）在 Firestore 事务中读取、修改并写回，完成后同样使缓存失效。
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+
+from common.counters import incr_counter
+from common.firebase_utils import db, get_resume_collection
+
+DEFAULT_RESUME_CACHE_SETTINGS = {
+    "ENABLED": True,
+    "TTL": 60 * 10,
+    "MISSING_TTL": 60,
+}
+
+# 不存在的简历的缓存标记
+MISSING = "__missing__"
+
+COUNTER_EVENTS = ('hits', 'misses')
+
+# 不返回给前端、不参与 ETag 计算的内部字段
+INTERNAL_FIELDS = ('user_id', 'updated_at')
+
+
+def resume_cache_setting(name):
+    return getattr(settings, 'RESUME_CACHE', {}).get(name, DEFAULT_RESUME_CACHE_SETTINGS[name])
+
+
+def resume_key(user_id):
+    return f"resume_doc_{user_id}"
+
+
+def etag_key(user_id):
+    return f"resume_etag_{user_id}"
+
+
+def resume_etag(resume_data):
+    """简历内容的强 ETag（对外字段规范化 JSON 的 SHA-256）"""
+    public = {k: v for k, v in resume_data.items() if k not in INTERNAL_FIELDS}
+    canonical = json.dumps(public, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return f'"{hashlib.sha256(canonical.encode("utf-8")).hexdigest()}"'
+
+
+def _counter_key(event):
+    return f"resume_cache_{event}"
+
+
+def _count(event):
+    incr_counter(_counter_key(event))
+
+
+def _from_cache(value):
+    return None if value == MISSING else value
+
+
+def _to_cache(user_id, resume_data):
+    """返回 (要写入的键值, 超时)；简历不存在时只有“空”标记"""
+    if resume_data is None:
+        return {resume_key(user_id): MISSING}, resume_cache_setting("MISSING_TTL")
+    return {
+        resume_key(user_id): resume_data,
+        etag_key(user_id): resume_etag(resume_data),
+    }, resume_cache_setting("TTL")
+
+
+def _fill(user_id, resume_data):
+    """回填读取结果（文档键已存在时不写入，ETag 键同样只在不存在时写入）"""
+    values, timeout = _to_cache(user_id, resume_data)
+    if cache.add(resume_key(user_id), values.pop(resume_key(user_id)), timeout=timeout):
+        for key, value in values.items():
+            cache.add(key, value, timeout=timeout)
+
+
+def _saved_document(resume_data, write_result):
+    """整份写入后 Firestore 中的文档内容（服务端时间戳取本次写入的提交时间）"""
+    document = dict(resume_data)
+    if 'updated_at' in document:
+        document['updated_at'] = write_result.update_time
+    return document
+
+
+def get_resume(user_id):
+    """读取用户简历，不存在时返回 None"""
+    if not resume_cache_setting("ENABLED"):
+        doc = get_resume_collection().document(user_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    key = resume_key(user_id)
+    cached = cache.get(key)
+    if cached is not None:
+        _count('hits')
+        return _from_cache(cached)
+
+    _count('misses')
+    doc = get_resume_collection().document(user_id).get()
+    resume_data = doc.to_dict() if doc.exists else None
+    _fill(user_id, resume_data)
+    return resume_data
+
+
+def get_resume_etag(user_id):
+    """缓存中当前简历的 ETag（未缓存或简历不存在时返回 None）"""
+    if not resume_cache_setting("ENABLED"):
+        return None
+    return cache.get(etag_key(user_id))
+
+
+def save_resume(user_id, resume_data):
+    """整份保存简历，并写入缓存"""
+    write_result = get_resume_collection().document(user_id).set(resume_data)
+    if resume_cache_setting("ENABLED"):
+        values, timeout = _to_cache(user_id, _saved_document(resume_data, write_result))
+        cache.set_many(values, timeout=timeout)
+
+
+def update_resume(user_id, fields):
+    """局部更新简历并使缓存失效；简历已不存在时返回 False"""
+    try:
+        get_resume_collection().document(user_id).update(fields)
+    except NotFound:
+        return False
+    finally:
+        invalidate_resume(user_id)
+    return True
+
+
+def patch_resume(user_id, apply):
+    """
+    在事务中读取简历，由 apply(resume_data) 返回要更新的顶层字段并写回，返回更新后的简历；
+    简历不存在时返回 None。事务冲突时 Firestore 会重试，apply 可能被调用多次，不能有副作用。
+    """
+    doc_ref = get_resume_collection().document(user_id)
+
+    @firestore.transactional
+    def run(transaction):
+        snapshot = doc_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            return None
+        resume_data = snapshot.to_dict()
+        updates = apply(resume_data)
+        transaction.update(doc_ref, {**updates, "updated_at": firestore.SERVER_TIMESTAMP})
+        return {**resume_data, **updates}
+
+    try:
+        return run(db.transaction())
+    finally:
+        invalidate_resume(user_id)
+
+
+def delete_resume(user_id):
+    """删除简历，并缓存“空”标记"""
+    get_resume_collection().document(user_id).delete()
+    if resume_cache_setting("ENABLED"):
+        values, timeout = _to_cache(user_id, None)
+        cache.set_many(values, timeout=timeout)
+        cache.delete(etag_key(user_id))
+
+
+def invalidate_resume(user_id):
+    cache.delete_many([resume_key(user_id), etag_key(user_id)])
+
+
+def resume_cache_stats():
+    """简历缓存命中统计"""
+    values = cache.get_many([_counter_key(event) for event in COUNTER_EVENTS])
+    stats = {event: values.get(_counter_key(event), 0) for event in COUNTER_EVENTS}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+    return stats
@@ -39,4 +39,37 @@ class ResumeSerializer(serializers.Serializer):
     education = EducationSerializer(many=True)
     experiences = ExperienceSerializer(many=True)
     honors = HonorSerializer(many=True)
-    selfEvaluation = serializers.CharField()
\ No newline at end of file
+    selfEvaluation = serializers.CharField()
+
+# 简历各顶层字段对应的子序列化器（many=True 表示该字段是列表）
+RESUME_SECTION_SERIALIZERS = {
+    'personal': (PersonalSerializer, False),
+    'skills': (SkillsSerializer, False),
+    'education': (EducationSerializer, True),
+    'experiences': (ExperienceSerializer, True),
+    'honors': (HonorSerializer, True),
+    'selfEvaluation': (serializers.CharField, False),
+}
+
+
+def validate_resume_section(section, value):
+    """单独校验简历的一个顶层字段，返回 (validated_data, errors)"""
+    serializer_class, many = RESUME_SECTION_SERIALIZERS[section]
+    if issubclass(serializer_class, serializers.Serializer):
+        serializer = serializer_class(data=value, many=many)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, serializer.errors
+    try:
+        return serializer_class().run_validation(value), None
+    except serializers.ValidationError as e:
+        return None, e.detail
+
+
+def validate_resume_item(section, value):
+    """单独校验列表字段（education / experiences / honors）中的一个元素，返回 (validated_data, errors)"""
+    serializer_class, _ = RESUME_SECTION_SERIALIZERS[section]
+    serializer = serializer_class(data=value)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
@@ -0,0 +1,554 @@
+"""
+简历接口的业务逻辑。
+
+各函数接收用户 ID 和请求数据，返回响应（DRF Response 或 HttpResponse），
+由视图和后台任务（common.tasks）共用，不依赖请求对象。
+"""
+import json
+import os
+import re
+
+import httpx
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from firebase_admin import firestore
+from firebase_admin.exceptions import FirebaseError
+from google.api_core.exceptions import GoogleAPIError
+from rest_framework import status
+from rest_framework.response import Response
+
+from common.admission import AdmissionRejected
+from common.json_stream import TopLevelMemberParser
+from common.llm_cache import cached_chat_content, cached_stream_chat_content
+from common.recommendation_cache import forget_resume, remember_resume
+from common.sse import event_stream_response, sse_event, wants_event_stream
+from common.uploads import mapped_file, sniff_image_type
+from .patch import ResumePatchError, apply_resume_patch
+from .repository import delete_resume, get_resume, get_resume_etag, patch_resume, resume_etag, save_resume, update_resume
+from .serializers import RESUME_SECTION_SERIALIZERS, ResumeSerializer, validate_resume_section
+
+SM_MS_API_URL = "https://sm.ms/api/v2/upload"
+SM_MS_TOKEN = os.environ.get('SM_MS_TOKEN', 'IFBldSrcoBITPadg7v6HSJfw3RekT6Am')
+
+RESUME_FIELDS = ['personal', 'skills', 'education', 'experiences', 'honors', 'selfEvaluation']
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 请求头是否与 ETag 匹配（按弱比较，忽略 W/ 前缀）"""
+    if not if_none_match or not etag:
+        return False
+    tags = parse_etags(if_none_match)
+    return '*' in tags or etag in {tag.removeprefix('W/') for tag in tags}
+
+
+def set_etag_headers(response, etag):
+    """简历按用户区分，浏览器可以缓存但每次都需要重新验证"""
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def not_modified_response(etag):
+    return set_etag_headers(HttpResponseNotModified(), etag)
+
+
+def save_user_resume(user_id, data):
+    """保存简历（创建或更新）"""
+    # 准备简历数据
+    resume_data = {
+        "user_id": user_id,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+        "personal": data.get('personal', {}),
+        "skills": data.get('skills', {}),
+        "education": data.get('education', []),
+        "experiences": data.get('experiences', []),
+        "honors": data.get('honors', []),
+        "selfEvaluation": data.get('selfEvaluation', '')
+    }
+
+    # 验证数据
+    serializer = ResumeSerializer(data=resume_data)
+    if serializer.is_valid():
+        try:
+            # 保存或更新简历
+            save_resume(user_id, serializer.validated_data)
+            remember_resume(user_id, serializer.validated_data)
+            return Response({'message': '简历保存成功'}, status=status.HTTP_200_OK)
+        except FirebaseError as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def get_user_resume(user_id, if_none_match=None):
+    """获取简历；if_none_match 为请求的 If-None-Match 头，匹配时返回 304"""
+    try:
+        # 条件请求：先只读取缓存中的 ETag，匹配时不读取简历
+        if if_none_match:
+            etag = get_resume_etag(user_id)
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
+
+        resume_data = get_resume(user_id)
+
+        if resume_data:
+            etag = resume_etag(resume_data)
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
+            # 移除内部字段
+            resume_data.pop('user_id', None)
+            resume_data.pop('updated_at', None)
+            return set_etag_headers(Response({
+                "status": "success",
+                "code": status.HTTP_200_OK,
+                "data": resume_data
+            }), etag)
+        return Response({'message': '未找到简历'}, status=status.HTTP_404_NOT_FOUND)
+    except FirebaseError as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def update_user_resume(user_id, data):
+    """更新简历的顶层字段（PUT）"""
+    # 检查简历是否存在
+    existing = get_resume(user_id)
+    if not existing:
+        return Response({'error': '请先创建简历'}, status=status.HTTP_404_NOT_FOUND)
+
+    # 准备更新数据
+    update_data = {
+        "updated_at": firestore.SERVER_TIMESTAMP
+    }
+
+    # 只更新提供的字段
+    for field in RESUME_FIELDS:
+        if field in data:
+            update_data[field] = data[field]
+
+    try:
+        # 执行更新（简历在读取后被删除时返回 404）
+        if not update_resume(user_id, update_data):
+            return Response({'error': '请先创建简历'}, status=status.HTTP_404_NOT_FOUND)
+        remember_resume(user_id, {**existing, **update_data})
+        return Response({'message': '简历更新成功'})
+    except FirebaseError as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def patch_user_resume(user_id, operations):
+    """按 JSON Patch 操作数组修改简历（PATCH），只校验被修改的部分，在事务中写回"""
+    try:
+        resume_data = patch_resume(user_id, lambda data: apply_resume_patch(data, operations))
+    except ResumePatchError as e:
+        return Response(e.response_data(), status=e.status_code)
+    except (FirebaseError, GoogleAPIError, ValueError) as e:
+        # Firestore 调用失败；事务多次冲突后放弃时抛出 ValueError
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if resume_data is None:
+        return Response({'error': '请先创建简历'}, status=status.HTTP_404_NOT_FOUND)
+
+    remember_resume(user_id, resume_data)
+    return set_etag_headers(Response({'message': '简历更新成功'}), resume_etag(resume_data))
+
+
+def delete_user_resume(user_id):
+    """删除用户的简历"""
+    try:
+        # 检查文档是否存在
+        if get_resume(user_id) is None:
+            return Response({'message': '简历不存在'}, status=status.HTTP_404_NOT_FOUND)
+
+        # 删除文档
+        delete_resume(user_id)
+        forget_resume(user_id)
+        return Response({
+            'status': 'success',
+            'message': '简历删除成功',
+            'code': status.HTTP_200_OK
+        })
+
+    except FirebaseError as e:
+        return Response({
+            'status': 'error',
+            'message': f'删除失败: {str(e)}',
+            'code': status.HTTP_500_INTERNAL_SERVER_ERROR
+        })
+
+
+def upload_resume_photo(image_file):
+    """把已落盘的图片上传到 SM.MS 图床；image_file 为 None 表示请求中没有图片"""
+    # 检查文件是否存在
+    if image_file is None:
+        return Response(
+            {'error': 'No image file provided'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        with mapped_file(image_file) as image:
+            content_type = sniff_image_type(image)
+            if content_type is None:
+                return Response({'error': 'Unsupported image format'}, status=status.HTTP_400_BAD_REQUEST)
+            # 从内存映射的临时文件分块发送到SM.MS图床
+            response = httpx.post(
+                SM_MS_API_URL,
+                files={'smfile': (image_file.name, image, content_type)},
+                headers={'Authorization': SM_MS_TOKEN},
+                timeout=60
+            )
+        return sm_ms_response(response)
+
+    except httpx.HTTPError as e:
+        return Response(
+            {'error': f'Network error: {str(e)}'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    except ValueError as e:  # JSON解析错误
+        return Response(
+            {'error': f'Invalid response from SM.MS: {str(e)}'},
+            status=status.HTTP_502_BAD_GATEWAY
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Server error: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def parse_sm_ms_response(response):
+    """解析SM.MS返回结果，返回 (数据, 状态码)"""
+    response_data = response.json()
+
+    # 检查图床返回结果
+    if response.status_code == 200:
+        if response_data.get('success'):
+            return {'url': response_data['data']['url']}, status.HTTP_200_OK
+
+        # 处理图片已存在的情况
+        if response_data.get('code') == 'image_repeated':
+            # 从错误消息中提取存在的URL
+            image_url = response_data['images']
+            if image_url:
+                return {'url': image_url}, status.HTTP_200_OK
+
+    # 处理SM.MS错误响应
+    error_msg = response_data.get('message', 'Unknown error from SM.MS')
+    return {'error': f'SM.MS upload failed: {error_msg}'}, status.HTTP_400_BAD_REQUEST
+
+
+def sm_ms_response(response):
+    data, status_code = parse_sm_ms_response(response)
+    return Response(data, status=status_code)
+
+
+def optimize_resume(user_id, data=None, request=None):
+    """
+    使用DeepSeek大模型API优化用户的简历（英语）。
+
+    传入 request 且请求要求流式返回时，返回逐个字段推送的 text/event-stream 响应；后台任务不传 request。
+    """
+    try:
+        # 1. 获取用户简历数据
+        resume_data = get_resume(user_id)
+
+        if not resume_data:
+            return Response({'error': 'Resume data not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # 2. 准备英语优化提示词
+        prompt = build_optimization_prompt(resume_data)
+
+        # 流式模式：每生成完一个顶层字段就校验并推送
+        if request is not None and wants_event_stream(request):
+            return event_stream_response(request, stream_optimized_sections(prompt))
+
+        # 3. 调用DeepSeek API进行优化
+        optimized_content = call_optimization_api(prompt)
+
+        # 4. 解析优化结果
+        optimized_resume = parse_optimized_resume(optimized_content, resume_data)
+
+        # 5. 验证优化后的数据
+        serializer = ResumeSerializer(data=optimized_resume)
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Optimized resume format is invalid',
+                'details': serializer.errors
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # 6. 返回优化后的简历给前端
+        return Response({
+            'status': 'success',
+            'message': 'Resume optimized successfully',
+            'data': serializer.validated_data
+        })
+
+    except AdmissionRejected as e:
+        return Response(e.response_data(), status=e.status_code, headers=e.headers())
+    except httpx.HTTPError as e:
+        return Response({
+            'error': f'Failed to connect to DeepSeek API: {str(e)}'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except FirebaseError as e:
+        return Response({
+            'error': f'Database error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except ValueError as e:
+        return Response({
+            'error': f'Failed to parse optimized resume: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except Exception as e:
+        return Response({
+            'error': f'Internal server error: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def build_optimization_prompt(resume_data):
+    """创建英语优化提示词"""
+    # 提取简历各部分内容
+    personal = resume_data.get("personal", {})
+    skills = resume_data.get("skills", {})
+    education = resume_data.get("education", [])
+    experiences = resume_data.get("experiences", [])
+    honors = resume_data.get("honors", [])
+    self_eval = resume_data.get("selfEvaluation", "")
+
+    # 构建英语提示词
+    prompt = f"""
+    You are a professional resume optimization expert. Please optimize the following resume information in English:
+
+    === Personal Information ===
+    Name: {personal.get('name', '')}
+    Gender: {personal.get('gender', '')}
+    Age: {personal.get('age', '')}
+    Degree: {personal.get('degree', '')}
+    Phone: {personal.get('phone', '')}
+    Email: {personal.get('email', '')}
+    Photo: {personal.get('photo', '')} 
+
+
+    === Skills ===
+    Proficient: {', '.join(skills.get('proficient', []))}
+    Familiar: {', '.join(skills.get('familiar', []))}
+
+    === Education ===
+    {_format_education_english(education)}
+
+    === Work/Project Experience ===
+    {_format_experiences_english(experiences)}
+
+    === Honors & Awards ===
+    {_format_honors_english(honors)}
+
+    === Self-Evaluation ===
+    {self_eval}
+
+    Optimization Requirements:
+    1. Keep the original JSON structure and field names
+    2. Optimize all content in professional English
+    3. Use industry-standard terminology and action verbs
+    4. Quantify achievements where possible (e.g., "increased efficiency by 20%")
+    5. Apply STAR method (Situation, Task, Action, Result) to work experiences
+    6. Keep self-evaluation concise (max 150 words), highlighting core competencies
+    7. Maintain original proper nouns (names, universities, companies) but translate descriptions
+    8. Ensure all dates and numbers follow international standards (e.g., "May 2022", not "2022.05")
+
+
+    Important: Return only a valid JSON object with the following exact structure:
+{{
+    "personal": {{
+        "name": "string",
+        "gender": "string",
+        "age": "string",
+        "degree": "string",
+        "phone": "string",
+        "email": "string",
+        "photo": "string"
+    }},
+    "skills": {{
+        "proficient": ["string", "..."],
+        "familiar": ["string", "..."]
+    }},
+    "education": [
+        {{
+            "school": "string",
+            "major": "string",
+            "degree": "string",
+            "score": "string"
+        }},
+        ...
+    ],
+    "experiences": [
+        {{
+            "type": "string",
+            "name": "string",
+            "company": "string",
+            "period": "string",
+            "content": "string",
+            "result": "string"
+        }},
+        ...
+    ],
+    "honors": [
+        {{
+            "type": "string",
+            "title": "string",
+            "date": "string",
+            "description": "string"
+        }},
+        ...
+    ],
+    "selfEvaluation": "string"
+}}
+
+Do not include any additional text, explanations, or markdown formatting. 
+Only return the pure JSON object.
+    """
+
+    return prompt
+
+
+def _format_education_english(education_list):
+    """格式化教育背景（英语）"""
+    formatted = []
+    for edu in education_list:
+        formatted.append(
+            f"School: {edu.get('school', '')}, Major: {edu.get('major', '')}, "
+            f"Degree: {edu.get('degree', '')}, GPA/Score: {edu.get('score', '')}"
+        )
+    return "\n".join(formatted) if formatted else "None"
+
+
+def _format_experiences_english(experiences):
+    """格式化工作经历（英语）"""
+    formatted = []
+    for exp in experiences:
+        formatted.append(
+            f"Type: {exp.get('type', '')}, Position: {exp.get('name', '')}, "
+            f"Company: {exp.get('company', '')}, Period: {exp.get('period', '')}\n"
+            f"Responsibilities: {exp.get('content', '')}\n"
+            f"Achievements: {exp.get('result', '')}"
+        )
+    return "\n\n".join(formatted) if formatted else "None"
+
+
+def _format_honors_english(honors):
+    """格式化荣誉奖项（英语）"""
+    formatted = []
+    for honor in honors:
+        formatted.append(
+            f"Type: {honor.get('type', '')}, Award: {honor.get('title', '')}, "
+            f"Date: {honor.get('date', '')}, Description: {honor.get('description', '')}"
+        )
+    return "\n".join(formatted) if formatted else "None"
+
+
+def build_optimization_payload(prompt):
+    """构建DeepSeek请求体（英语优化）"""
+    return {
+        "model": "deepseek-chat",
+        "messages": [
+            {"role": "system", "content": "You are a professional resume optimization expert. Optimize resumes in professional English while maintaining the original JSON structure."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 4000,
+        "top_p": 0.9
+    }
+
+
+def call_optimization_api(prompt):
+    """调用DeepSeek API（英语优化）"""
+    payload = build_optimization_payload(prompt)
+
+    # 非 200 响应抛出 LLMAPIError（ValueError 子类）
+    return cached_chat_content(payload, 'resume.optimize', timeout=60)  # 设置较长超时时间
+
+
+def stream_optimized_sections(prompt):
+    """
+    流式优化：增量解析模型输出，每完成一个顶层字段就用对应的子序列化器校验并推送。
+
+    事件：section（校验通过的字段）、section_error（校验失败）、done（全部完成）、error
+    """
+    deltas = cached_stream_chat_content(build_optimization_payload(prompt), 'resume.optimize', timeout=60)
+    parser = TopLevelMemberParser()
+    sections = {}
+    try:
+        for delta in deltas:
+            for section, value in parser.feed(delta):
+                if section not in RESUME_SECTION_SERIALIZERS:
+                    continue
+                validated, errors = validate_resume_section(section, value)
+                if errors is not None:
+                    yield sse_event({'section': section, 'errors': errors}, event='section_error')
+                    continue
+                sections[section] = validated
+                yield sse_event({'section': section, 'data': validated}, event='section')
+
+        missing = [s for s in RESUME_SECTION_SERIALIZERS if s not in sections]
+        if missing:
+            yield sse_event({
+                'error': 'Optimized resume format is invalid',
+                'missing': missing
+            }, event='error')
+            return
+        yield sse_event({
+            'status': 'success',
+            'message': 'Resume optimized successfully',
+            'data': sections
+        }, event='done')
+    except AdmissionRejected as e:
+        yield sse_event(e.response_data(), event='error')
+    except httpx.HTTPError as e:
+        yield sse_event({'error': f'Failed to connect to DeepSeek API: {str(e)}'}, event='error')
+    except ValueError as e:
+        yield sse_event({'error': f'Failed to parse optimized resume: {str(e)}'}, event='error')
+    except Exception as e:
+        yield sse_event({'error': f'Internal server error: {str(e)}'}, event='error')
+    finally:
+        # 客户端断开或已完成：关闭到 DeepSeek 的流
+        deltas.close()
+
+
+def parse_optimized_resume(content, original_resume):
+    """
+    解析优化后的简历内容
+    注意：由于大模型可能返回非纯JSON内容，我们需要提取JSON部分
+    """
+    try:
+        # 尝试直接解析为JSON
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # 如果直接解析失败，尝试提取JSON部分
+        start_idx = content.find('{')
+        end_idx = content.rfind('}') + 1
+
+        if start_idx == -1 or end_idx == 0:
+            raise ValueError("Unable to extract JSON data from response")
+
+        try:
+            return json.loads(content[start_idx:end_idx])
+        except json.JSONDecodeError:
+            # 作为最后手段，尝试修复常见问题
+            fixed_content = _fix_json_issues(content[start_idx:end_idx])
+            try:
+                return json.loads(fixed_content)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"JSON parsing failed: {str(e)}")
+
+
+def _fix_json_issues(json_str):
+    """尝试修复常见的JSON格式问题"""
+    # 修复单引号问题
+    json_str = json_str.replace("'", '"')
+
+    # 修复缺少引号的字段名
+    json_str = re.sub(r'([{,]\s*)(\w+)(\s*:)', r'\1"\2"\3', json_str)
+
+    # 修复尾随逗号
+    json_str = re.sub(r',\s*([}\]])', r'\1', json_str)
+
+    # 修复布尔值问题
+    json_str = json_str.replace(": true", ': "true"').replace(": false", ': "false"')
+
+    return json_str
@@ -1,3 +1,461 @@
-from django.test import TestCase
+import copy
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from google.api_core.exceptions import Aborted, NotFound
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from common.json_patch import JSONPatchError, apply_operation, parse_pointer
+from common.json_stream import TopLevelMemberParser
+from . import repository
+from .patch import ResumePatchError, apply_resume_patch
+from .repository import (
+    MISSING,
+    delete_resume,
+    etag_key,
+    get_resume,
+    get_resume_etag,
+    patch_resume,
+    resume_cache_stats,
+    resume_etag,
+    resume_key,
+    save_resume,
+    update_resume,
+)
+from .services import patch_user_resume
+from .views import GetResumeView, SimpleUser
+
+
+def feed_in_chunks(text, size):
+    parser = TopLevelMemberParser()
+    members = []
+    for start in range(0, len(text), size):
+        members.extend(parser.feed(text[start:start + size]))
+    return parser, members
+
+
+class TopLevelMemberParserTests(SimpleTestCase):
+    """流式输出被切成任意大小的块时，解析结果与整体解析一致"""
+
+    DOCUMENT = json.dumps({
+        "personal": {"name": "Ann \"Nan\" Lee", "bio": "likes {braces}, [brackets] and, commas"},
+        "skills": {"proficient": ["C++", "Node.js"], "familiar": []},
+        "path": "C:\\temp\\new",
+        "unicode": "\u4e2d\u6587 \\u0041 \u00e9",
+        "nested": {"a": [{"b": [1, 2, {"c": "}"}]}, []]},
+        "score": 3.5,
+        "active": True,
+        "missing": None,
+        "empty": "",
+    }, ensure_ascii=False)
+
+    def test_every_chunk_size_matches_full_parse(self):
+        expected = list(json.loads(self.DOCUMENT).items())
+        for size in (1, 2, 3, 5, 7, 64, len(self.DOCUMENT)):
+            with self.subTest(size=size):
+                parser, members = feed_in_chunks(self.DOCUMENT, size)
+                self.assertEqual(members, expected)
+                self.assertTrue(parser.finished)
+
+    def test_ascii_escaped_document(self):
+        document = json.dumps({"name": "\u4e2d\u6587\n\t\"q\"", "x": "\\"})
+        _, members = feed_in_chunks(document, 1)
+        self.assertEqual(members, list(json.loads(document).items()))
+
+    def test_escape_split_across_chunks(self):
+        parser = TopLevelMemberParser()
+        self.assertEqual(parser.feed('{"a": "x\\'), [])
+        self.assertEqual(parser.feed('"}", "b": 1'), [('a', 'x"}')])
+        self.assertEqual(parser.feed('}'), [('b', 1)])
+
+    def test_container_member_is_emitted_when_it_closes(self):
+        parser = TopLevelMemberParser()
+        self.assertEqual(parser.feed('{"personal": {"name": "A"'), [])
+        self.assertEqual(parser.feed('}'), [('personal', {'name': 'A'})])
+        self.assertEqual(parser.feed(', "skills": ["x"]'), [('skills', ['x'])])
+        self.assertEqual(parser.feed('}'), [])
+        self.assertTrue(parser.finished)
+
+    def test_scalar_member_waits_for_separator(self):
+        parser = TopLevelMemberParser()
+        self.assertEqual(parser.feed('{"score": 12'), [])
+        self.assertEqual(parser.feed('3,'), [('score', 123)])
+
+    def test_text_around_the_object_is_ignored(self):
+        text = 'Here you go:\n```json\n{"a": {"b": 1}, "c": "d"}\n```\nextra {"ignored": true}'
+        parser, members = feed_in_chunks(text, 1)
+        self.assertEqual(members, [('a', {'b': 1}), ('c', 'd')])
+        self.assertTrue(parser.finished)
+
+    def test_invalid_member_raises_value_error(self):
+        parser = TopLevelMemberParser()
+        with self.assertRaises(ValueError):
+            parser.feed('{"a": tru, "b": 1}')
+
+
+def experience(name, **fields):
+    return {'type': 'work', 'name': name, 'company': 'ACME', 'period': '2020-2021',
+            'content': 'Built APIs', 'result': 'Shipped', **fields}
+
+
+class JSONPatchTests(SimpleTestCase):
+    """common.json_patch 的指针解析和 test 操作"""
+
+    def test_pointer_escaping(self):
+        self.assertEqual(parse_pointer('/a~1b/c~0d/~01'), ['a/b', 'c~d', '~1'])
+        self.assertEqual(parse_pointer(''), [])
+        with self.assertRaises(JSONPatchError):
+            parse_pointer('a/b')
+
+    def test_escaped_keys_are_patched(self):
+        document = {'skills': {'ci/cd': 1, 'a~b': 2}}
+        apply_operation(document, {'op': 'replace', 'path': '/skills/ci~1cd', 'value': 3})
+        apply_operation(document, {'op': 'remove', 'path': '/skills/a~0b'})
+        self.assertEqual(document, {'skills': {'ci/cd': 3}})
+
+    def test_test_is_type_strict(self):
+        document = {'flag': True, 'count': 1, 'items': [0], 'name': None}
+        for path, value in (('/flag', 1), ('/count', True), ('/items', [False]), ('/name', 0), ('/count', '1')):
+            with self.subTest(path=path, value=value):
+                with self.assertRaises(JSONPatchError):
+                    apply_operation(document, {'op': 'test', 'path': path, 'value': value})
+        for path, value in (('/flag', True), ('/count', 1.0), ('/items', [0]), ('/name', None)):
+            with self.subTest(path=path, value=value):
+                apply_operation(document, {'op': 'test', 'path': path, 'value': value})
+
+
+class ApplyResumePatchTests(SimpleTestCase):
+    """简历补丁：原子性，以及只校验被修改的部分"""
+
+    def setUp(self):
+        self.resume = {
+            'personal': {'name': 'Ann', 'gender': 'F', 'age': '30', 'degree': 'BSc', 'phone': '123',
+                         'email': 'ann@example.com', 'photo': ''},
+            'skills': {'proficient': ['Python'], 'familiar': []},
+            'education': [],
+            # 第一条经历缺少必填字段：不修改它时不应被校验
+            'experiences': [{'name': 'legacy'}, experience('one'), experience('two')],
+            'honors': [],
+            'selfEvaluation': 'Hard working',
+        }
+        self.original = copy.deepcopy(self.resume)
+
+    def patch(self, *operations):
+        return apply_resume_patch(self.resume, list(operations))
+
+    def assertPatchError(self, status_code, *operations):
+        with self.assertRaises(ResumePatchError) as raised:
+            self.patch(*operations)
+        self.assertEqual(raised.exception.status_code, status_code)
+        self.assertEqual(self.resume, self.original)
+        return raised.exception
+
+    def test_only_touched_items_are_validated(self):
+        updates = self.patch({'op': 'replace', 'path': '/experiences/2/result', 'value': 'Doubled sales'})
+        self.assertEqual(updates['experiences'][2]['result'], 'Doubled sales')
+        self.assertEqual(updates['experiences'][0], {'name': 'legacy'})
+        self.assertEqual(list(updates), ['experiences'])
+
+    def test_invalid_touched_item_is_reported_by_position(self):
+        error = self.assertPatchError(400, {'op': 'replace', 'path': '/experiences/1/result', 'value': ''})
+        self.assertEqual(list(error.details), ['/experiences/1'])
+
+    def test_append_with_dash(self):
+        updates = self.patch(
+            {'op': 'add', 'path': '/experiences/-', 'value': experience('three')},
+            {'op': 'add', 'path': '/skills/familiar/-', 'value': 'Go'},
+        )
+        self.assertEqual([item['name'] for item in updates['experiences']], ['legacy', 'one', 'two', 'three'])
+        self.assertEqual(updates['skills']['familiar'], ['Go'])
+
+    def test_appended_item_is_validated(self):
+        error = self.assertPatchError(400, {'op': 'add', 'path': '/experiences/-', 'value': {'name': 'x'}})
+        self.assertEqual(list(error.details), ['/experiences/3'])
+
+    def test_move_into_own_child_is_rejected(self):
+        error = self.assertPatchError(
+            400, {'op': 'move', 'from': '/experiences/1', 'path': '/experiences/1/previous'}
+        )
+        self.assertEqual(error.details, {'operation': 0})
+
+    def test_move_within_list(self):
+        updates = self.patch({'op': 'move', 'from': '/experiences/1', 'path': '/experiences/-'})
+        self.assertEqual([item['name'] for item in updates['experiences']], ['legacy', 'two', 'one'])
+
+    def test_failed_test_rolls_back_earlier_operations(self):
+        error = self.assertPatchError(
+            409,
+            {'op': 'replace', 'path': '/selfEvaluation', 'value': 'Changed'},
+            {'op': 'remove', 'path': '/experiences/2'},
+            {'op': 'test', 'path': '/personal/name', 'value': 'Bob'},
+        )
+        self.assertEqual(error.details, {'operation': 2})
+
+    def test_passing_test_applies_the_patch(self):
+        updates = self.patch(
+            {'op': 'test', 'path': '/personal/name', 'value': 'Ann'},
+            {'op': 'replace', 'path': '/selfEvaluation', 'value': 'Changed'},
+        )
+        self.assertEqual(updates, {'selfEvaluation': 'Changed'})
+
+
+class PatchUserResumeTests(SimpleTestCase):
+    """PATCH 接口的错误响应"""
+
+    OPERATIONS = [{'op': 'replace', 'path': '/selfEvaluation', 'value': 'Changed'}]
+
+    def test_transaction_failure_returns_error_response(self):
+        for error in (ValueError('Failed to commit transaction in 5 attempts.'), Aborted('contention')):
+            with self.subTest(error=type(error).__name__):
+                with mock.patch('resume.services.patch_resume', side_effect=error):
+                    response = patch_user_resume('u1', self.OPERATIONS)
+                self.assertEqual(response.status_code, 500)
+                self.assertIn('error', response.data)
+
+    def test_missing_resume(self):
+        with mock.patch('resume.services.patch_resume', return_value=None):
+            response = patch_user_resume('u1', self.OPERATIONS)
+        self.assertEqual(response.status_code, 404)
+
+
+SERVER_TIMESTAMP = object()
+
+
+class FakeResumeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        self.collection.reads += 1
+        data = self.collection.docs.get(self.id)
+        return mock.Mock(exists=data is not None, to_dict=lambda: copy.deepcopy(data))
+
+    def set(self, data):
+        self.collection.docs[self.id] = {k: ('commit-time' if v is SERVER_TIMESTAMP else v) for k, v in data.items()}
+        return mock.Mock(update_time='commit-time')
+
+    def update(self, fields):
+        if self.id not in self.collection.docs:
+            raise NotFound(self.id)
+        self.collection.docs[self.id].update(fields)
+
+    def delete(self):
+        self.collection.docs.pop(self.id, None)
+
+
+class FakeResumeCollection:
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    def document(self, doc_id):
+        return FakeResumeDocument(self, doc_id)
+
+
+RESUME = {
+    'user_id': 'u1',
+    'updated_at': 'yesterday',
+    'personal': {'name': 'Ann'},
+    'skills': {'proficient': ['Python'], 'familiar': []},
+    'selfEvaluation': 'Curious',
+}
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "resume-tests"}},
+    RESUME_CACHE={"ENABLED": True, "TTL": 600, "MISSING_TTL": 60},
+)
+class ResumeRepositoryTestCase(SimpleTestCase):
+    """Firestore 替换为内存中的集合，缓存为 LocMemCache"""
+
+    def setUp(self):
+        cache.clear()
+        self.resumes = FakeResumeCollection()
+        transaction_firestore = mock.Mock(transactional=lambda func: func, SERVER_TIMESTAMP=SERVER_TIMESTAMP)
+        for target, value in (('get_resume_collection', lambda: self.resumes),
+                              ('firestore', transaction_firestore),
+                              ('db', mock.Mock())):
+            patcher = mock.patch.object(repository, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # 事务中的写入直接作用于内存集合
+        repository.db.transaction.return_value.update.side_effect = lambda ref, fields: ref.update(fields)
+
+    def store(self, user_id='u1', resume_data=RESUME):
+        self.resumes.docs[user_id] = copy.deepcopy(resume_data)
+
+
+class ResumeCacheTests(ResumeRepositoryTestCase):
+    """读穿透缓存：回填、空标记、写入和失效"""
+
+    def test_miss_fills_the_cache_and_later_reads_hit(self):
+        self.store()
+        self.assertEqual(get_resume('u1'), RESUME)
+        self.assertEqual(cache.get(resume_key('u1')), RESUME)
+        self.assertEqual(get_resume('u1'), RESUME)
+        self.assertEqual(self.resumes.reads, 1)
+        self.assertEqual(resume_cache_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_fill_does_not_overwrite_a_concurrent_write(self):
+        self.store()
+        newer = {**RESUME, 'selfEvaluation': 'Newer'}
+        original_get = FakeResumeDocument.get
+
+        def get_then_save(document, transaction=None):
+            snapshot = original_get(document, transaction)
+            # 读取 Firestore 之后、回填之前，另一个请求保存了新内容
+            save_resume('u1', newer)
+            return snapshot
+
+        with mock.patch.object(FakeResumeDocument, 'get', get_then_save):
+            self.assertEqual(get_resume('u1')['selfEvaluation'], 'Curious')
+        self.assertEqual(cache.get(resume_key('u1'))['selfEvaluation'], 'Newer')
+        self.assertEqual(cache.get(etag_key('u1')), resume_etag(newer))
+
+    def test_missing_resume_is_cached_as_a_marker(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.assertIsNone(get_resume('u1'))
+        add.assert_any_call(resume_key('u1'), MISSING, timeout=60)
+        self.assertIsNone(get_resume('u1'))
+        self.assertEqual(self.resumes.reads, 1)
+        self.assertIsNone(cache.get(etag_key('u1')))
+
+    def test_save_writes_through(self):
+        save_resume('u1', {**RESUME, 'updated_at': SERVER_TIMESTAMP})
+        # 服务端时间戳取写入结果中的提交时间
+        self.assertEqual(get_resume('u1'), {**RESUME, 'updated_at': 'commit-time'})
+        self.assertEqual(self.resumes.reads, 0)
+
+    def test_save_replaces_the_missing_marker(self):
+        self.assertIsNone(get_resume('u1'))
+        save_resume('u1', RESUME)
+        self.assertEqual(get_resume('u1')['selfEvaluation'], 'Curious')
+
+    def test_update_invalidates(self):
+        self.store()
+        get_resume('u1')
+        self.assertTrue(update_resume('u1', {'selfEvaluation': 'Updated'}))
+        self.assertIsNone(cache.get(resume_key('u1')))
+        self.assertIsNone(cache.get(etag_key('u1')))
+        self.assertEqual(get_resume('u1')['selfEvaluation'], 'Updated')
+
+    def test_update_of_a_deleted_resume_invalidates(self):
+        cache.set(resume_key('u1'), RESUME)
+        self.assertFalse(update_resume('u1', {'selfEvaluation': 'Updated'}))
+        self.assertIsNone(cache.get(resume_key('u1')))
+
+    def test_patch_invalidates(self):
+        self.store()
+        get_resume('u1')
+        patched = patch_resume('u1', lambda data: {'selfEvaluation': data['selfEvaluation'] + '!'})
+        self.assertEqual(patched['selfEvaluation'], 'Curious!')
+        self.assertIsNone(cache.get(resume_key('u1')))
+        self.assertIsNone(cache.get(etag_key('u1')))
+        self.assertEqual(get_resume('u1')['selfEvaluation'], 'Curious!')
+
+    def test_failed_patch_invalidates(self):
+        self.store()
+        get_resume('u1')
+        with self.assertRaises(ResumePatchError):
+            patch_resume('u1', mock.Mock(side_effect=ResumePatchError('invalid')))
+        self.assertIsNone(cache.get(resume_key('u1')))
+
+    def test_delete_caches_the_missing_marker(self):
+        self.store()
+        get_resume('u1')
+        delete_resume('u1')
+        self.assertEqual(cache.get(resume_key('u1')), MISSING)
+        self.assertIsNone(cache.get(etag_key('u1')))
+        self.assertIsNone(get_resume('u1'))
+        self.assertEqual(self.resumes.reads, 1)
+
+    @override_settings(RESUME_CACHE={"ENABLED": False})
+    def test_disabled_cache_reads_firestore(self):
+        self.store()
+        get_resume('u1')
+        get_resume('u1')
+        self.assertEqual(self.resumes.reads, 2)
+        self.assertIsNone(cache.get(resume_key('u1')))
+        self.assertIsNone(get_resume_etag('u1'))
+
+
+class ResumeETagTests(ResumeRepositoryTestCase):
+    """ETag 与条件请求：匹配时返回 304 且不读取简历，内容变化后旧 ETag 失效"""
+
+    def get(self, if_none_match=None):
+        headers = {'HTTP_IF_NONE_MATCH': if_none_match} if if_none_match else {}
+        request = APIRequestFactory().get('/api/resume/get', **headers)
+        force_authenticate(request, user=SimpleUser('u1'))
+        return GetResumeView.as_view()(request)
+
+    def test_etag_ignores_internal_fields(self):
+        self.assertEqual(resume_etag(RESUME), resume_etag({**RESUME, 'user_id': 'x', 'updated_at': 'now'}))
+        self.assertNotEqual(resume_etag(RESUME), resume_etag({**RESUME, 'selfEvaluation': 'Other'}))
+
+    def test_fill_stores_the_etag_key(self):
+        self.store()
+        get_resume('u1')
+        self.assertEqual(cache.get(etag_key('u1')), resume_etag(RESUME))
+        self.assertEqual(get_resume_etag('u1'), resume_etag(RESUME))
+
+    def test_response_carries_the_etag(self):
+        self.store()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], resume_etag(RESUME))
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', response['Vary'])
+        self.assertNotIn('user_id', response.data['data'])
+
+    def test_matching_if_none_match_returns_304_without_reading_the_resume(self):
+        self.store()
+        etag = self.get()['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(header=header):
+                with mock.patch('resume.services.get_resume') as read:
+                    response = self.get(header)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+                read.assert_not_called()
+        self.assertEqual(self.resumes.reads, 1)
+
+    def test_stale_etag_returns_the_resume(self):
+        self.store()
+        response = self.get('"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], resume_etag(RESUME))
+
+    def test_matching_etag_without_a_cached_etag_is_checked_against_the_document(self):
+        self.store()
+        etag = self.get()['ETag']
+        cache.delete_many([resume_key('u1'), etag_key('u1')])
+        self.assertEqual(self.get(etag).status_code, 304)
+        self.assertEqual(self.resumes.reads, 2)
+
+    def test_save_changes_the_etag(self):
+        self.store()
+        old = self.get()['ETag']
+        save_resume('u1', {**RESUME, 'selfEvaluation': 'Saved'})
+        response = self.get(old)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], resume_etag({**RESUME, 'selfEvaluation': 'Saved'}))
+        self.assertEqual(response.data['data']['selfEvaluation'], 'Saved')
+
+    def test_patch_response_etag_matches_the_next_read(self):
+        self.store()
+        old = self.get()['ETag']
+        patched = patch_user_resume('u1', [{'op': 'replace', 'path': '/selfEvaluation', 'value': 'Patched'}])
+        self.assertEqual(patched.status_code, 200)
+        self.assertNotEqual(patched['ETag'], old)
+        self.assertIsNone(cache.get(etag_key('u1')))
+        self.assertEqual(self.get(old).status_code, 200)
+        self.assertEqual(self.get(patched['ETag']).status_code, 304)
+
+    def test_deleted_resume_no_longer_matches(self):
+        self.store()
+        old = self.get()['ETag']
+        delete_resume('u1')
+        self.assertEqual(self.get(old).status_code, 404)
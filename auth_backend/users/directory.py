@@ -0,0 +1,118 @@
+"""
+用户目录：按邮箱查找用户。
+
+user_emails 集合以规范化邮箱的哈希为文档 ID，内容为 {user_id, email}：
+- 注册时在同一个批量写入中 create 索引文档和用户文档，索引已存在则整批失败，
+  并发注册同一邮箱时只有一个能成功；
+- 登录时按邮箱哈希读取索引文档，再按 user_id 读取用户文档，都是单文档读取，不再查询。
+
+历史用户的索引由 manage.py backfill_email_index 补建。补建完成前保持
+USER_DIRECTORY["LEGACY_FALLBACK"] 开启：找不到索引时退回按 email 字段查询（并顺带补建索引），
+注册时也会检查没有索引的历史用户——历史用户的 email 字段按原样保存，规范化后与注册邮箱相同的
+（如 Foo@X.com 与 foo@x.com）都视为已注册，否则新用户占用索引后历史用户将无法登录。
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from google.api_core.exceptions import AlreadyExists
+from google.cloud.firestore_v1 import FieldFilter
+
+from common.firebase_utils import db, get_user_emails_collection, get_users_collection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_DIRECTORY_SETTINGS = {
+    "LEGACY_FALLBACK": True,
+}
+
+
+class EmailAlreadyExists(Exception):
+    """邮箱已被注册"""
+
+
+def directory_setting(name):
+    return getattr(settings, 'USER_DIRECTORY', {}).get(name, DEFAULT_USER_DIRECTORY_SETTINGS[name])
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def email_key(email):
+    """邮箱索引的文档 ID（邮箱可能包含 Firestore 文档 ID 不允许的字符，且不宜明文作为 ID）"""
+    return hashlib.sha256(normalize_email(email).encode('utf-8')).hexdigest()
+
+
+def _legacy_find(email):
+    """
+    按 email 字段查询（索引补建前的旧方式）。
+
+    历史用户的 email 字段按注册时的原样保存，同时查询原样和规范化后的邮箱。
+    """
+    forms = list(dict.fromkeys([email, normalize_email(email)]))
+    docs = get_users_collection().where(filter=FieldFilter("email", "in", forms)).limit(1).get()
+    return docs[0] if docs else None
+
+
+def _legacy_conflict(email):
+    """
+    是否有历史用户的邮箱规范化后与 email 相同。
+
+    Firestore 不支持大小写不敏感的查询，先按原样/规范化邮箱查询，查不到时只投影 email 字段
+    遍历用户集合比较。注册频率低，且补建完成、关闭 LEGACY_FALLBACK 后不再执行。
+    """
+    if _legacy_find(email) is not None:
+        return True
+    key = normalize_email(email)
+    return any(normalize_email((doc.to_dict() or {}).get("email")) == key
+               for doc in get_users_collection().select(["email"]).stream())
+
+
+def create_email_index(email, user_id):
+    """为已有用户创建索引；索引已存在时返回其中的 user_id，否则返回 None"""
+    index_ref = get_user_emails_collection().document(email_key(email))
+    try:
+        index_ref.create({"user_id": user_id, "email": normalize_email(email)})
+        return None
+    except AlreadyExists:
+        snapshot = index_ref.get()
+        return (snapshot.to_dict() or {}).get("user_id") if snapshot.exists else None
+
+
+def register_user(user_data):
+    """创建用户和邮箱索引，返回新用户 ID；邮箱已存在时抛出 EmailAlreadyExists"""
+    email = user_data['email']
+    if directory_setting("LEGACY_FALLBACK") and _legacy_conflict(email):
+        raise EmailAlreadyExists(email)
+
+    user_ref = get_users_collection().document()
+    batch = db.batch()
+    batch.create(get_user_emails_collection().document(email_key(email)),
+                 {"user_id": user_ref.id, "email": normalize_email(email)})
+    batch.create(user_ref, user_data)
+    try:
+        batch.commit()
+    except AlreadyExists:
+        raise EmailAlreadyExists(email)
+    return user_ref.id
+
+
+def find_user_by_email(email):
+    """按邮箱查找用户，返回 (user_id, 用户数据)，不存在时返回 (None, None)"""
+    index = get_user_emails_collection().document(email_key(email)).get()
+    if index.exists:
+        user_id = index.to_dict()["user_id"]
+        user = get_users_collection().document(user_id).get()
+        if user.exists:
+            return user_id, user.to_dict()
+        logger.warning("邮箱索引指向不存在的用户: %s", user_id)
+        return None, None
+
+    if not directory_setting("LEGACY_FALLBACK"):
+        return None, None
+    user = _legacy_find(email)
+    if user is None:
+        return None, None
+    create_email_index(email, user.id)
+    return user.id, user.to_dict()
@@ -0,0 +1,62 @@
+"""
+为 users 集合中的历史用户补建 user_emails 邮箱索引。
+
+可重复运行：已有索引的用户会被跳过。同一邮箱对应多个用户（旧注册流程的竞态导致）时，
+索引保留最先写入的用户，其余的作为冲突列出，需要人工处理。
+补建完成且没有冲突后，可以关闭 USER_DIRECTORY["LEGACY_FALLBACK"]。
+
+用法:
+    python manage.py backfill_email_index --dry-run
+    python manage.py backfill_email_index --workers 16
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from common.firebase_utils import get_user_emails_collection, get_users_collection
+from users.directory import create_email_index, email_key
+
+
+class Command(BaseCommand):
+    help = '为历史用户补建 user_emails 邮箱索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不写入')
+        parser.add_argument('--workers', type=int, default=8, help='并发写入数')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        def backfill(doc):
+            email = (doc.to_dict() or {}).get('email')
+            if not email:
+                return 'no_email', doc.id, None
+            if dry_run:
+                index = get_user_emails_collection().document(email_key(email)).get()
+                owner = (index.to_dict() or {}).get('user_id') if index.exists else None
+                if owner is None:
+                    return 'created', doc.id, email
+            else:
+                owner = create_email_index(email, doc.id)
+                if owner is None:
+                    return 'created', doc.id, email
+            return ('existing' if owner == doc.id else 'conflict'), doc.id, (email, owner)
+
+        counts = Counter()
+        users = get_users_collection().select(['email']).stream()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for result, user_id, detail in pool.map(backfill, users):
+                counts[result] += 1
+                if result == 'conflict':
+                    email, owner = detail
+                    self.stdout.write(self.style.WARNING(
+                        f"邮箱冲突: {email} 已索引到用户 {owner}，用户 {user_id} 未建立索引"
+                    ))
+                elif result == 'no_email':
+                    self.stdout.write(self.style.WARNING(f"用户 {user_id} 没有邮箱，已跳过"))
+
+        action = '待创建' if dry_run else '新建'
+        summary = (f"{action}索引 {counts['created']}，已有索引 {counts['existing']}，"
+                   f"冲突 {counts['conflict']}，无邮箱 {counts['no_email']}")
+        self.stdout.write(self.style.SUCCESS(summary) if not counts['conflict'] else self.style.WARNING(summary))
@@ -0,0 +1,92 @@
+"""
+用户公开资料（用户名、邮箱）的批量读取和缓存。
+
+- 先用一次 get_many 查 CACHES["default"]（Redis），未命中的 ID 用一次 db.get_all 批量读取，
+  只取公开字段；
+- 不存在的用户缓存一个短期的“空”标记，避免反复读取；
+- 资料缓存时间较短（settings.USER_PROFILE_CACHE），注册和资料修改时调用 invalidate_profile。
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from common.firebase_utils import db, get_users_collection
+
+DEFAULT_PROFILE_CACHE_SETTINGS = {
+    "TTL": 60,
+    "MISSING_TTL": 30,
+    "MAX_BATCH": 100,
+}
+
+PROFILE_FIELDS = ('username', 'email')
+
+# 不存在的用户的缓存标记
+MISSING = "__missing__"
+
+
+def profile_setting(name):
+    return getattr(settings, 'USER_PROFILE_CACHE', {}).get(name, DEFAULT_PROFILE_CACHE_SETTINGS[name])
+
+
+def profile_key(user_id):
+    return f"user_profile_{user_id}"
+
+
+# Firestore 文档 ID 的长度上限（UTF-8 字节）
+MAX_ID_BYTES = 1500
+
+
+def _valid_id(user_id):
+    # Firestore 文档 ID 不能为空、包含 '/'、为 '.' / '..'、形如 __.*__，或超过 1500 字节；
+    # 这样的 ID 不会存在，直接作为不存在的用户返回，不让整个批量读取失败
+    if not isinstance(user_id, str) or not user_id or '/' in user_id or user_id in ('.', '..'):
+        return False
+    if user_id.startswith('__') and user_id.endswith('__') and len(user_id) >= 4:
+        return False
+    try:
+        return len(user_id.encode('utf-8')) <= MAX_ID_BYTES
+    except UnicodeEncodeError:
+        # 单独的代理字符等无法编码为 UTF-8
+        return False
+
+
+def get_profiles(user_ids):
+    """批量读取用户资料，返回 {user_id: 资料或 None}（保持传入顺序，去重）"""
+    user_ids = list(dict.fromkeys(user_ids))
+    profiles = {user_id: None for user_id in user_ids}
+    valid_ids = [user_id for user_id in user_ids if _valid_id(user_id)]
+
+    cached = cache.get_many([profile_key(user_id) for user_id in valid_ids])
+    pending = []
+    for user_id in valid_ids:
+        value = cached.get(profile_key(user_id))
+        if value is None:
+            pending.append(user_id)
+        elif value != MISSING:
+            profiles[user_id] = value
+    if not pending:
+        return profiles
+
+    users = get_users_collection()
+    snapshots = db.get_all([users.document(user_id) for user_id in pending], field_paths=list(PROFILE_FIELDS))
+    found = {}
+    for snapshot in snapshots:
+        if snapshot.exists:
+            data = snapshot.to_dict() or {}
+            found[snapshot.id] = {field: data.get(field) for field in PROFILE_FIELDS}
+    profiles.update(found)
+
+    if found:
+        cache.set_many({profile_key(user_id): profile for user_id, profile in found.items()},
+                       timeout=profile_setting("TTL"))
+    missing = [user_id for user_id in pending if user_id not in found]
+    if missing:
+        cache.set_many({profile_key(user_id): MISSING for user_id in missing}, timeout=profile_setting("MISSING_TTL"))
+    return profiles
+
+
+def get_profile(user_id):
+    return get_profiles([user_id]).get(user_id)
+
+
+def invalidate_profile(user_id):
+    cache.delete(profile_key(user_id))
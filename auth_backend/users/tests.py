@@ -1,3 +1,184 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from google.api_core.exceptions import AlreadyExists
+
+from .directory import EmailAlreadyExists, email_key, find_user_by_email, register_user
+from .profiles import _valid_id, get_profiles
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self):
+        return FakeSnapshot(self.id, self.collection.docs.get(self.id))
+
+    def create(self, data):
+        if self.id in self.collection.docs:
+            raise AlreadyExists(self.id)
+        self.collection.docs[self.id] = dict(data)
+
+
+class FakeQuery:
+    def __init__(self, collection, field_filter):
+        self.collection = collection
+        self.field_filter = field_filter
+
+    def limit(self, count):
+        return self
+
+    def get(self):
+        field, op, value = self.field_filter.field_path, self.field_filter.op_string, self.field_filter.value
+        values = value if op == 'in' else [value]
+        return [FakeSnapshot(doc_id, data) for doc_id, data in self.collection.docs.items()
+                if data.get(field) in values][:1]
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = dict(docs or {})
+        self.next_id = 0
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.next_id += 1
+            doc_id = f'generated{self.next_id}'
+        return FakeDocument(self, doc_id)
+
+    def where(self, filter):
+        return FakeQuery(self, filter)
+
+    def select(self, field_paths):
+        return self
+
+    def stream(self):
+        return [FakeSnapshot(doc_id, data) for doc_id, data in self.docs.items()]
+
+
+class FakeBatch:
+    """批量写入：任一 create 失败时整批都不写入"""
+
+    def __init__(self):
+        self.writes = []
+
+    def create(self, ref, data):
+        self.writes.append((ref, data))
+
+    def commit(self):
+        if any(ref.id in ref.collection.docs for ref, _ in self.writes):
+            raise AlreadyExists('batch')
+        for ref, data in self.writes:
+            ref.create(data)
+
+
+class UserDirectoryTests(SimpleTestCase):
+    """邮箱索引：注册冲突和历史用户的回退查找"""
+
+    def setUp(self):
+        self.users = FakeCollection({'legacy': {'email': 'Legacy@Example.com', 'username': 'old'}})
+        self.emails = FakeCollection()
+        db = mock.Mock(**{'batch.side_effect': FakeBatch})
+        for name, value in (('get_users_collection', lambda: self.users),
+                            ('get_user_emails_collection', lambda: self.emails), ('db', db)):
+            patcher = mock.patch(f'users.directory.{name}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_register_creates_user_and_index(self):
+        user_id = register_user({'email': 'New@Example.com ', 'username': 'new'})
+        self.assertEqual(self.users.docs[user_id]['username'], 'new')
+        self.assertEqual(self.emails.docs[email_key('new@example.com')],
+                         {'user_id': user_id, 'email': 'new@example.com'})
+        self.assertEqual(find_user_by_email('NEW@example.com')[0], user_id)
+
+    def test_register_conflicts_with_indexed_email(self):
+        register_user({'email': 'ann@example.com'})
+        with self.assertRaises(EmailAlreadyExists):
+            register_user({'email': ' Ann@Example.com'})
+        # 失败的注册没有留下用户文档
+        self.assertEqual(len(self.users.docs), 2)
+
+    def test_register_conflicts_with_legacy_user(self):
+        with self.assertRaises(EmailAlreadyExists):
+            register_user({'email': 'Legacy@Example.com'})
+        self.assertEqual(self.emails.docs, {})
+
+    def test_register_conflicts_with_legacy_user_in_another_case(self):
+        # 历史用户按原样保存 Legacy@Example.com，注册 legacy@example.com 不能占用其索引
+        for email in ('legacy@example.com', 'LEGACY@example.COM'):
+            with self.assertRaises(EmailAlreadyExists):
+                register_user({'email': email})
+        self.assertEqual(self.emails.docs, {})
+        self.assertEqual(find_user_by_email('Legacy@Example.com')[0], 'legacy')
+
+    @override_settings(USER_DIRECTORY={'LEGACY_FALLBACK': False})
+    def test_backfilled_directory_skips_the_legacy_scan(self):
+        with mock.patch('users.directory._legacy_conflict') as legacy_conflict:
+            register_user({'email': 'new@example.com'})
+        legacy_conflict.assert_not_called()
+
+    def test_legacy_user_is_found_and_backfilled(self):
+        user_id, user = find_user_by_email('Legacy@Example.com')
+        self.assertEqual((user_id, user['username']), ('legacy', 'old'))
+        self.assertEqual(self.emails.docs[email_key('legacy@example.com')]['user_id'], 'legacy')
+
+        # 之后按索引查找，大小写不同也能找到
+        with mock.patch('users.directory._legacy_find') as legacy_find:
+            self.assertEqual(find_user_by_email('LEGACY@example.com')[0], 'legacy')
+        legacy_find.assert_not_called()
+
+    def test_legacy_lookup_uses_normalized_email(self):
+        self.users.docs['lower'] = {'email': 'bob@example.com'}
+        self.assertEqual(find_user_by_email(' Bob@Example.com')[0], 'lower')
+
+    def test_unknown_email(self):
+        self.assertEqual(find_user_by_email('nobody@example.com'), (None, None))
+        self.assertEqual(self.emails.docs, {})
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "profiles"}},
+)
+class ProfileIdTests(SimpleTestCase):
+    """不可能是 Firestore 文档 ID 的 user_id 不读取 Firestore，作为不存在的用户返回"""
+
+    INVALID_IDS = ['__name__', '__x__', 'a/b', '.', '..', 'x' * 1501, '\u4e2d' * 501, '\ud800']
+
+    def test_valid_id(self):
+        for user_id in self.INVALID_IDS + ['', None, 42]:
+            with self.subTest(user_id=user_id):
+                self.assertFalse(_valid_id(user_id))
+        for user_id in ['abc', '___', '__x', 'x__', '_x_', 'x' * 1500, '\u4e2d' * 500]:
+            with self.subTest(user_id=user_id):
+                self.assertTrue(_valid_id(user_id))
+
+    def test_invalid_ids_are_reported_missing(self):
+        found = mock.Mock(id='u1', exists=True, **{'to_dict.return_value': {'username': 'ann', 'email': 'a@b.co'}})
+        with mock.patch('users.profiles.db') as db, \
+                mock.patch('users.profiles.get_users_collection', return_value=FakeCollection()):
+            db.get_all.return_value = [found]
+            response = self.client.get('/users/profiles/', {'user_ids': ','.join(['u1'] + self.INVALID_IDS[:5])})
+
+        requested = [ref.id for ref in db.get_all.call_args.args[0]]
+        self.assertEqual(requested, ['u1'])
+        self.assertEqual(response.json(), {
+            'profiles': {'u1': {'username': 'ann', 'email': 'a@b.co'}},
+            'missing': self.INVALID_IDS[:5],
+        })
+
+    def test_batch_of_only_invalid_ids_skips_firestore(self):
+        with mock.patch('users.profiles.db') as db:
+            self.assertEqual(get_profiles(['__name__', 'x' * 1501]), {'__name__': None, 'x' * 1501: None})
+        db.get_all.assert_not_called()
@@ -5,16 +5,17 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 # from .firebase_config import db
-from common.firebase_utils import get_users_collection
+from .directory import EmailAlreadyExists, find_user_by_email, register_user
+from .profiles import get_profile, get_profiles, invalidate_profile, profile_setting
 from .serializers import UserSerializer
 import jwt
 import datetime
+import hmac
 from django.conf import settings
 # accounts/views.py
 from django.contrib.auth.hashers import make_password
 # from .forms import RegistrationForm
 from django.conf import settings
-from google.cloud.firestore_v1 import FieldFilter
 from google.cloud import firestore
 import google.auth
 
@@ -28,22 +29,17 @@ class RegisterView(APIView):
         if serializer.is_valid():
             data = serializer.validated_data
 
-            # 检查邮箱是否已存在
-            users_ref = get_users_collection()
-            query = users_ref.where(
-                filter=FieldFilter("email", "==", data['email'])
-            ).limit(1).get()
-            #query = users_ref.where('email', '==', data['email']).limit(1).get()
-            if query:
-                return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 创建新用户
+            # 创建新用户（邮箱索引与用户文档一起写入，邮箱已存在时整体失败）
             user_data = {
                 'email': data['email'],
                 'username': data['username'],
                 'password': data['password']
             }
-            users_ref.add(user_data)
+            try:
+                user_id = register_user(user_data)
+            except EmailAlreadyExists:
+                return Response({'error': 'Email already exists'}, status=status.HTTP_400_BAD_REQUEST)
+            invalidate_profile(user_id)
 
             return Response({'message': 'User created successfully'}, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -55,28 +51,23 @@ class LoginView(APIView):
 
         if not email or not password:
             return Response({'error': 'Email and password required'}, status=status.HTTP_400_BAD_REQUEST)
-        users_ref = get_users_collection()
 
         try:
-            # 更新后的查询方式
-            query = users_ref.where(
-                filter=FieldFilter("email", "==", email)
-            ).where(
-                filter=FieldFilter("password", "==", password)
-            ).limit(1).get()
-            if not query:
+            # 按邮箱索引读取用户，再校验密码
+            user_id, user = find_user_by_email(email)
+            if user is None or not hmac.compare_digest(
+                    str(user.get('password', '')).encode('utf-8'), str(password).encode('utf-8')):
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
             # 生成 JWT 令牌
-            user = query[0].to_dict()
             payload = {
-                'user_id': query[0].id,
+                'user_id': user_id,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7)
             }
             token = jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
             return Response({
                 'token': token,
-                'user_id': query[0].id,
+                'user_id': user_id,
                 'username': user['username']
             })
         except Exception as e:
@@ -86,13 +77,31 @@ class LoginView(APIView):
 class ProfileView(APIView):
     def get(self, request):
         user_id = request.query_params.get('user_id')
-        user_ref = get_users_collection().document(user_id).get()
+        profile = get_profile(user_id) if user_id else None
 
-        if not user_ref.exists:
+        if profile is None:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        user_data = user_ref.to_dict()
         return Response({
-            'username': user_data['username'],
-            'email': user_data['email']
+            'username': profile['username'],
+            'email': profile['email']
+        })
+
+
+class BatchProfileView(APIView):
+    """批量获取用户资料：GET ?user_ids=id1,id2,...（缓存未命中的部分只读取一次 Firestore）"""
+
+    def get(self, request):
+        user_ids = [user_id.strip() for user_id in request.query_params.get('user_ids', '').split(',')
+                    if user_id.strip()]
+        if not user_ids:
+            return Response({'error': 'user_ids required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > profile_setting("MAX_BATCH"):
+            return Response({'error': f'At most {profile_setting("MAX_BATCH")} user_ids per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        profiles = get_profiles(user_ids)
+        return Response({
+            'profiles': {user_id: profile for user_id, profile in profiles.items() if profile is not None},
+            'missing': [user_id for user_id, profile in profiles.items() if profile is None]
         })
\ No newline at end of file